@@ -0,0 +1,119 @@
+import queue
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict
+
+
+class AnalyticsWorker:
+    """
+    Runs per-frame analytics on its own thread, off the GStreamer streaming thread.
+
+    The pad probe hands over a small snapshot per buffer with ``submit``, which
+    never blocks. The queue is bounded and keeps the newest items: when it is
+    full the oldest snapshot is dropped, so a slow frame costs the worker a
+    frame rather than stalling the pipeline.
+    """
+
+    def __init__(self, handler: Callable[[Any], None], max_queue_size: int = 2,
+                 stats_interval: float = 60.0, name: str = 'analytics'):
+        self._handler = handler
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stats_interval = stats_interval
+        self._stop_event = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'submitted': 0,
+            'processed': 0,
+            'dropped': 0,
+            'errors': 0,
+            'max_queue_depth': 0,
+            'probe_calls': 0,
+            'total_probe_us': 0.0,
+            'max_probe_us': 0.0,
+            'total_handler_ms': 0.0,
+            'max_handler_ms': 0.0,
+        }
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> bool:
+        """Queue an item for the worker. Never blocks.
+
+        Returns False if older items had to be dropped to make room.
+        """
+        dropped = 0
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                break
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    dropped += 1
+                except queue.Empty:
+                    pass
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            self._stats['submitted'] += 1
+            self._stats['dropped'] += dropped
+            self._stats['max_queue_depth'] = max(self._stats['max_queue_depth'], depth)
+        return dropped == 0
+
+    def record_probe_time(self, seconds: float) -> None:
+        """Record how long the streaming thread spent in the probe for one buffer."""
+        probe_us = seconds * 1e6
+        with self._stats_lock:
+            self._stats['probe_calls'] += 1
+            self._stats['total_probe_us'] += probe_us
+            self._stats['max_probe_us'] = max(self._stats['max_probe_us'], probe_us)
+
+    def _run(self) -> None:
+        next_report = time.monotonic() + self._stats_interval
+        # After close() the worker finishes what is queued, then exits
+        while not (self._stop_event.is_set() and self._queue.empty()):
+            try:
+                item = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                item = None
+
+            if item is not None:
+                start = time.perf_counter()
+                try:
+                    self._handler(item)
+                except Exception:
+                    with self._stats_lock:
+                        self._stats['errors'] += 1
+                    print("Analytics worker error:")
+                    traceback.print_exc()
+                handler_ms = (time.perf_counter() - start) * 1000
+                with self._stats_lock:
+                    self._stats['processed'] += 1
+                    self._stats['total_handler_ms'] += handler_ms
+                    self._stats['max_handler_ms'] = max(self._stats['max_handler_ms'], handler_ms)
+
+            if self._stats_interval and time.monotonic() >= next_report:
+                next_report = time.monotonic() + self._stats_interval
+                stats = self.get_stats()
+                print(
+                    f"Analytics: queue {stats['queue_depth']} (max {stats['max_queue_depth']}), "
+                    f"processed {stats['processed']}, dropped {stats['dropped']}, "
+                    f"probe {stats['avg_probe_us']:.0f}us avg / {stats['max_probe_us']:.0f}us max, "
+                    f"analysis {stats['avg_handler_ms']:.1f}ms avg"
+                )
+
+    def get_stats(self) -> Dict[str, float]:
+        """Return worker counters: queue depth, drops, probe and analysis times."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['avg_probe_us'] = stats['total_probe_us'] / stats['probe_calls'] if stats['probe_calls'] else 0.0
+        stats['avg_handler_ms'] = stats['total_handler_ms'] / stats['processed'] if stats['processed'] else 0.0
+        return stats
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Process whatever is still queued, then stop the worker thread."""
+        self._stop_event.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            print(f"Analytics worker did not finish within {timeout}s, {self._queue.qsize()} frames pending")
@@ -0,0 +1,92 @@
+"""
+Per-frame cost of VehicleTracker at different object counts.
+
+Simulates boxes drifting across a 640x640 frame, with a few dropping out and
+appearing each frame, and times the assignment tracker against the old greedy
+nested-loop matcher. Runs without the Hailo stack:
+
+    python basic_pipelines/benchmark_tracker.py
+    python basic_pipelines/benchmark_tracker.py --counts 5 50 200 --frames 500 --metric iou
+"""
+import argparse
+import time
+
+import numpy as np
+
+import vehicle_tracking
+from vehicle_tracking import VehicleTracker
+
+
+class GreedyTracker:
+    """The previous tracker's matching loop, kept here as a baseline."""
+
+    def __init__(self, max_frames_to_track=30, distance_threshold=50):
+        self.tracks = {}
+        self.next_id = 0
+        self.max_frames_to_track = max_frames_to_track
+        self.distance_threshold = distance_threshold
+
+    def update_from_arrays(self, current_frame_count, boxes):
+        detections = [
+            (x1 + (x2 - x1) // 2, y1 + (y2 - y1) // 2) for x1, y1, x2, y2 in boxes.tolist()
+        ]
+        matched = set()
+        for track_id, (center, last_seen) in list(self.tracks.items()):
+            if current_frame_count - last_seen > self.max_frames_to_track:
+                del self.tracks[track_id]
+                continue
+            min_dist, closest = float('inf'), None
+            for i, detection in enumerate(detections):
+                if i in matched:
+                    continue
+                dist = ((center[0] - detection[0]) ** 2 + (center[1] - detection[1]) ** 2) ** 0.5
+                if dist < min_dist and dist < self.distance_threshold:
+                    min_dist, closest = dist, i
+            if closest is not None:
+                self.tracks[track_id] = (detections[closest], current_frame_count)
+                matched.add(closest)
+        for i, detection in enumerate(detections):
+            if i not in matched:
+                self.tracks[self.next_id] = (detection, current_frame_count)
+                self.next_id += 1
+
+
+def simulate(count, frames, seed=0):
+    """Per-frame (N, 4) box arrays for ``count`` objects moving a few pixels a frame."""
+    rng = np.random.default_rng(seed)
+    positions = rng.uniform(0, 600, size=(count, 2))
+    velocities = rng.uniform(-4, 4, size=(count, 2))
+    sizes = rng.uniform(20, 40, size=(count, 2))
+    for _ in range(frames):
+        positions = (positions + velocities) % 600
+        visible = rng.random(count) > 0.05
+        top_left = positions[visible]
+        yield np.hstack((top_left, top_left + sizes[visible])).astype(np.int64)
+
+
+def time_tracker(tracker, boxes_per_frame):
+    start = time.perf_counter()
+    for frame, boxes in enumerate(boxes_per_frame):
+        tracker.update_from_arrays(frame, boxes)
+    return (time.perf_counter() - start) * 1000 / len(boxes_per_frame)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark VehicleTracker per-frame cost")
+    parser.add_argument("--counts", type=int, nargs="+", default=[5, 50, 200], help="Objects per frame")
+    parser.add_argument("--frames", type=int, default=100, help="Frames simulated per count")
+    parser.add_argument("--metric", choices=["distance", "iou"], default="distance", help="Tracker cost metric")
+    args = parser.parse_args()
+
+    solver = "scipy" if vehicle_tracking.linear_sum_assignment is not None else "numpy"
+    print(f"Assignment solver: {solver}, metric: {args.metric}, {args.frames} frames per run")
+    print(f"{'objects':>8} {'assignment ms/frame':>20} {'greedy ms/frame':>16}")
+    for count in args.counts:
+        boxes_per_frame = list(simulate(count, args.frames))
+        assignment_ms = time_tracker(VehicleTracker(metric=args.metric), boxes_per_frame)
+        greedy_ms = time_tracker(GreedyTracker(), boxes_per_frame)
+        print(f"{count:>8} {assignment_ms:>20.3f} {greedy_ms:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,5 +6,51 @@ DEFAULT_ZONES = {
 }
 
 OUTPUT_DIR = "red_light_runners"
+# Evidence kept on disk; past any of these limits the oldest images are deleted
 MAX_SAVED_IMAGES = 200
-ZONE_UPDATE_INTERVAL = 500  # frames
\ No newline at end of file
+EVIDENCE_MAX_BYTES = 512 * 1024 * 1024  # images and thumbnails together
+EVIDENCE_MAX_AGE_DAYS = 30
+# Violation images are written by a background thread, see evidence_writer.py
+EVIDENCE_THUMBNAIL_WIDTH = 320  # pixels, thumbnails go to OUTPUT_DIR/thumbnails
+EVIDENCE_JPEG_QUALITY = 90
+EVIDENCE_QUEUE_SIZE = 8  # images waiting to be written, more are dropped and retried
+EVIDENCE_FSYNC_BATCH = 4  # images per fsync
+EVIDENCE_FSYNC_INTERVAL = 5.0  # seconds, a partial batch is synced after this long
+ZONE_UPDATE_INTERVAL = 500  # frames
+
+# Database retention
+RETENTION_RAW_DAYS = 30  # raw events kept in vehicle_tracking
+RETENTION_MINUTE_ROLLUP_DAYS = 30
+RETENTION_PARTITION_MONTHS = 12  # monthly partitions kept before archiving
+RETENTION_ARCHIVE_DIR = "archive"
+RETENTION_INTERVAL = 3600  # seconds
+
+# Change-gated frame publishing
+PUBLISH_CHANGE_THRESHOLD = 2.0  # mean grey-level difference of the thumbnail, None disables gating
+PUBLISH_KEYFRAME_INTERVAL = 10.0  # seconds, a full frame is sent at least this often
+PUBLISH_HEARTBEAT_INTERVAL = 1.0  # seconds between metadata-only heartbeats while static
+
+# Frame transport to the API: "shm" (shared-memory ring, same host) or "tcp" (port 5555)
+FRAME_TRANSPORT = "shm"
+FRAME_RING_SLOTS = 16
+FRAME_RING_SLOT_SIZE = 512 * 1024  # bytes, larger frames are sent inline
+
+# Stream frames without burned-in zones, boxes and stats; the web client
+# draws them from the frame metadata instead
+STREAM_CLEAN_FRAMES = False
+
+# Traffic light state, read from the pixels inside traffic_zone
+LIGHT_RED_HSV_RANGES = [
+    ((0, 150, 150), (5, 255, 255)),
+    ((175, 150, 150), (180, 255, 255)),  # red wraps around H=180
+]
+LIGHT_RED_ON_PIXELS = 1  # red pixels needed to read the light as red
+LIGHT_RED_OFF_PIXELS = 0  # at most this many to read it as green, in between keeps the state
+LIGHT_DEBOUNCE_FRAMES = 1  # consecutive readings needed to change state, 1 flips on the first
+
+# Where per-frame analytics run: "inline" on the GStreamer streaming thread, or
+# "worker" on a separate thread fed by a bounded queue (the pad probe then only
+# copies out the frame and its detections). Worker mode is opt-in.
+ANALYTICS_MODE = "inline"
+ANALYTICS_QUEUE_SIZE = 2  # frames waiting for the worker, the oldest is dropped when full
+ANALYTICS_STATS_INTERVAL = 60  # seconds between worker stats printouts, 0 disables
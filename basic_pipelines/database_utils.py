@@ -1,40 +1,648 @@
+import asyncio
+import os
+import queue
+import re
 import sqlite3
-from typing import Union
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
 from pathlib import Path
 
-class DatabaseManager:
-    """Handles all database operations for vehicle tracking."""
-    
-    def __init__(self, db_path: Union[str, Path] = 'traffic.db'):
-        self.db_path = str(db_path)
-        self._init_db()
-    
-    def _init_db(self) -> None:
-        """Initialize the database with required tables if they don't exist."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS vehicle_tracking (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                vehicle_count INTEGER,
-                is_red_light_runner BOOLEAN
+# Schema versions, tracked in PRAGMA user_version:
+#   1 - vehicle_tracking.timestamp holds local-time text, unindexed
+#   2 - vehicle_tracking.ts holds the UTC epoch for every row and is indexed
+SCHEMA_VERSION = 2
+
+# Rollup tiers, keyed by granularity. Each table holds one row per local-time
+# bucket, keyed by the bucket's start as a unix epoch.
+ROLLUP_TABLES = {
+    'minute': 'vehicle_rollup_minute',
+    'hour': 'vehicle_rollup_hour',
+    'day': 'vehicle_rollup_day',
+}
+
+# Older raw events are moved into one table per local month, named
+# vehicle_tracking_YYYY_MM, with the same columns as vehicle_tracking
+PARTITION_PREFIX = 'vehicle_tracking_'
+_PARTITION_RE = re.compile(r'^vehicle_tracking_\d{4}_\d{2}$')
+
+
+class EvidenceRecord(NamedTuple):
+    """One saved violation image, see evidence_writer.py. Paths are as written."""
+    ts: int
+    track_id: int
+    image_path: str
+    image_bytes: int
+    thumbnail_path: str
+    thumbnail_bytes: int
+    width: int
+    height: int
+
+
+class EvidenceDeletion(NamedTuple):
+    """violation_evidence rows to drop after their files were evicted."""
+    image_paths: Tuple[str, ...]
+
+# Local time of an event, preferring the epoch column over legacy text rows
+_LOCAL_TIME_SQL = "COALESCE(datetime(ts, 'unixepoch', 'localtime'), timestamp)"
+
+# SQLite expressions that truncate an event's local time to each tier
+_ROLLUP_TRUNCATE_SQL = {
+    'minute': f"strftime('%Y-%m-%d %H:%M:00', {_LOCAL_TIME_SQL})",
+    'hour': f"strftime('%Y-%m-%d %H:00:00', {_LOCAL_TIME_SQL})",
+    'day': f"strftime('%Y-%m-%d 00:00:00', {_LOCAL_TIME_SQL})",
+}
+
+
+def bucket_start(moment: datetime, granularity: str) -> int:
+    """Return the epoch of the local-time bucket containing ``moment``."""
+    if granularity == 'minute':
+        moment = moment.replace(second=0, microsecond=0)
+    elif granularity == 'hour':
+        moment = moment.replace(minute=0, second=0, microsecond=0)
+    elif granularity == 'day':
+        moment = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    else:
+        raise ValueError(f"Unknown granularity: {granularity}")
+    return int(moment.timestamp())
+
+
+def local_date_bounds(start_date: str, end_date: str) -> Tuple[int, int]:
+    """Convert an inclusive local YYYY-MM-DD range into [start, end) epochs."""
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+    return int(start.timestamp()), int(end.timestamp())
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def init_schema(conn: sqlite3.Connection) -> None:
+    """Create the raw and rollup tables, backfilling rollups on first run.
+
+    A fresh database is created at SCHEMA_VERSION. An older database gets the
+    ``ts`` column and its indexes added in place, which is cheap; converting
+    the existing rows is left to ``migrate_db.py`` so it can run in chunks.
+    """
+    is_new = not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'vehicle_tracking'"
+    ).fetchone()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS vehicle_tracking (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            vehicle_count INTEGER,
+            is_red_light_runner BOOLEAN,
+            ts INTEGER
+        )
+    ''')
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(vehicle_tracking)')]
+    if 'ts' not in columns:
+        conn.execute('ALTER TABLE vehicle_tracking ADD COLUMN ts INTEGER')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_vehicle_tracking_ts ON vehicle_tracking (ts)')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_vehicle_tracking_runner_ts
+        ON vehicle_tracking (is_red_light_runner, ts)
+    ''')
+    if is_new:
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+    elif get_schema_version(conn) < SCHEMA_VERSION:
+        print("vehicle_tracking has rows without epoch timestamps, run basic_pipelines/migrate_db.py")
+    for table in ROLLUP_TABLES.values():
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket_start INTEGER PRIMARY KEY,
+                total_vehicles INTEGER NOT NULL DEFAULT 0,
+                red_light_runners INTEGER NOT NULL DEFAULT 0
             )
         ''')
-        
-        conn.commit()
-        conn.close()
-    
-    def record_vehicle(self, is_runner: bool = False) -> None:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Store current local time
-        cursor.execute('''
-            INSERT INTO vehicle_tracking (timestamp, vehicle_count, is_red_light_runner)
-            VALUES (datetime('now', 'localtime'), ?, ?)
-        ''', (1, is_runner))
-        
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS violation_evidence (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts INTEGER NOT NULL,
+            track_id INTEGER,
+            image_path TEXT NOT NULL,
+            image_bytes INTEGER NOT NULL,
+            thumbnail_path TEXT,
+            thumbnail_bytes INTEGER,
+            width INTEGER,
+            height INTEGER
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_violation_evidence_ts ON violation_evidence (ts)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_violation_evidence_path ON violation_evidence (image_path)')
+    conn.commit()
+
+    # Take the write lock before checking so events committed concurrently by
+    # the writer are either already in the raw table or added incrementally.
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        has_rollups = conn.execute(f"SELECT 1 FROM {ROLLUP_TABLES['day']} LIMIT 1").fetchone()
+        has_events = conn.execute("SELECT 1 FROM vehicle_tracking LIMIT 1").fetchone()
+        if has_events and not has_rollups:
+            print("Backfilling rollup tables from vehicle_tracking...")
+            rebuild_rollups(conn)
         conn.commit()
-        conn.close()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def partition_name(moment: datetime) -> str:
+    return f"{PARTITION_PREFIX}{moment.year:04d}_{moment.month:02d}"
+
+
+def create_partition(conn: sqlite3.Connection, table: str) -> None:
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY,
+            timestamp DATETIME,
+            vehicle_count INTEGER,
+            is_red_light_runner BOOLEAN,
+            ts INTEGER
+        )
+    ''')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_ts ON {table} (ts)')
+
+
+def list_partitions(conn: sqlite3.Connection) -> List[str]:
+    """Return the monthly partition tables, oldest first."""
+    names = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'vehicle_tracking_%'"
+    )]
+    return sorted(name for name in names if _PARTITION_RE.match(name))
+
+
+def event_tables(conn: sqlite3.Connection) -> List[str]:
+    """Every table holding raw events, in chronological order."""
+    return list_partitions(conn) + ['vehicle_tracking']
+
+
+def rebuild_rollups(conn: sqlite3.Connection) -> None:
+    """Recompute the rollup tiers from the raw and partitioned events. Caller commits.
+
+    Only local months that still have raw events are rebuilt. Archived
+    partitions are not read, so the buckets of months with no raw events
+    left keep the rollups they already had.
+    """
+    events = ' UNION ALL '.join(
+        f"SELECT ts, timestamp, is_red_light_runner FROM {table}" for table in event_tables(conn)
+    )
+    conn.execute('CREATE TEMP TABLE IF NOT EXISTS rebuilt_months (month TEXT PRIMARY KEY)')
+    conn.execute('DELETE FROM rebuilt_months')
+    conn.execute(f'''
+        INSERT INTO rebuilt_months
+        SELECT DISTINCT strftime('%Y-%m', {_LOCAL_TIME_SQL}) FROM ({events})
+        WHERE ts IS NOT NULL OR timestamp IS NOT NULL
+    ''')
+    for granularity, table in ROLLUP_TABLES.items():
+        conn.execute(f'''
+            DELETE FROM {table}
+            WHERE strftime('%Y-%m', bucket_start, 'unixepoch', 'localtime') IN (SELECT month FROM rebuilt_months)
+        ''')
+        conn.execute(f'''
+            INSERT INTO {table} (bucket_start, total_vehicles, red_light_runners)
+            SELECT
+                CAST(strftime('%s', {_ROLLUP_TRUNCATE_SQL[granularity]}, 'utc') AS INTEGER) AS bucket,
+                COUNT(*),
+                SUM(CASE WHEN is_red_light_runner = 1 THEN 1 ELSE 0 END)
+            FROM ({events})
+            WHERE ts IS NOT NULL OR timestamp IS NOT NULL
+            GROUP BY bucket
+        ''')
+    conn.execute('DROP TABLE rebuilt_months')
+
+
+def query_rollups(conn: sqlite3.Connection, granularity: str, start: int, end: int) -> List[Tuple[int, int, int]]:
+    """Return (bucket_start, total_vehicles, red_light_runners) rows in [start, end)."""
+    table = ROLLUP_TABLES[granularity]
+    return conn.execute(f'''
+        SELECT bucket_start, total_vehicles, red_light_runners
+        FROM {table}
+        WHERE bucket_start >= ? AND bucket_start < ?
+        ORDER BY bucket_start ASC
+    ''', (start, end)).fetchall()
+
+
+def fetch_events_page(conn: sqlite3.Connection, start: int, end: int, after: Tuple[int, int],
+                      limit: int, runners_only: bool = False) -> List[Tuple[int, int, int, int]]:
+    """Return up to ``limit`` (id, ts, vehicle_count, is_red_light_runner) rows.
+
+    Rows come from the live table and every partition in (ts, id) order,
+    starting strictly after the ``after`` key. Each page is a short indexed
+    range scan, so no read transaction is held open between pages.
+    """
+    runner_filter = 'AND is_red_light_runner = 1' if runners_only else ''
+    rows = []
+    for table in event_tables(conn):
+        rows.extend(conn.execute(f'''
+            SELECT id, ts, vehicle_count, is_red_light_runner FROM {table}
+            WHERE ts >= ? AND ts < ? AND (ts, id) > (?, ?) {runner_filter}
+            ORDER BY ts, id
+            LIMIT ?
+        ''', (start, end, after[0], after[1], limit - len(rows))).fetchall())
+        if len(rows) >= limit:
+            break
+    return rows
+
+
+def has_unmigrated_events(conn: sqlite3.Connection, start: int, end: int) -> bool:
+    """Whether legacy rows without ``ts`` fall in [start, end).
+
+    ``fetch_events_page`` can't see those rows until migrate_db.py has
+    filled in their ``ts``. Partitions never hold any, retention fills it in.
+    """
+    if get_schema_version(conn) >= SCHEMA_VERSION:
+        return False
+    # Legacy rows hold local time as text, which sorts like the times it encodes
+    return conn.execute('''
+        SELECT 1 FROM vehicle_tracking
+        WHERE ts IS NULL AND timestamp >= ? AND timestamp < ?
+        LIMIT 1
+    ''', (
+        datetime.fromtimestamp(start).strftime('%Y-%m-%d %H:%M:%S'),
+        datetime.fromtimestamp(end).strftime('%Y-%m-%d %H:%M:%S'),
+    )).fetchone() is not None
+
+
+class IngestWatermark:
+    """Monotonic counter that changes whenever the database contents change.
+
+    The writer bumps it after commits and maintenance passes, at most once per
+    WATERMARK_MIN_INTERVAL. It lives in a small sidecar file next to the
+    database so other processes can check for new data with a ``stat``
+    instead of a query.
+    """
+
+    def __init__(self, db_path: Union[str, Path] = 'traffic.db'):
+        self.path = Path(f"{db_path}-watermark")
+        self._cached_stat = None
+        self._cached_value = 0
+
+    def read(self) -> int:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return 0
+        key = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if key != self._cached_stat:
+            try:
+                self._cached_value = int(self.path.read_text() or 0)
+                self._cached_stat = key
+            except (OSError, ValueError):
+                pass
+        return self._cached_value
+
+    def bump(self) -> int:
+        # Seeded from the clock so the value keeps increasing across restarts
+        value = max(self.read() + 1, time.time_ns() // 1000)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        tmp_path.write_text(str(value))
+        os.replace(tmp_path, self.path)
+        self._cached_value = value
+        return value
+
+
+# Longest the writer sleeps before checking whether close() was called
+STOP_POLL_INTERVAL = 0.5
+# Shortest time between watermark file writes; changes in between are
+# written once it has passed, and always on close
+WATERMARK_MIN_INTERVAL = 1.0
+
+
+class DatabaseManager:
+    """Handles all database operations for vehicle tracking.
+
+    Writes are handed to a background writer thread through a bounded queue so
+    the GStreamer probe never waits on SQLite. The writer keeps one connection
+    open in WAL mode and group-commits queued rows with ``executemany`` once
+    ``batch_size`` rows are pending or ``flush_interval`` seconds have passed.
+    Each batch also bumps the per-minute/hour/day rollup tables in the same
+    transaction, so readers never need to aggregate the raw events.
+
+    Periodic maintenance such as retention runs on the writer thread too, via
+    ``add_maintenance_task``, so it never contends with the writer for locks.
+    Slow one-off work such as a full VACUUM goes in ``startup_tasks``, which
+    run before the writer starts taking events.
+    """
+
+    def __init__(self, db_path: Union[str, Path] = 'traffic.db', max_queue_size: int = 1024,
+                 batch_size: int = 64, flush_interval: float = 1.0,
+                 startup_tasks: Sequence[Callable[[sqlite3.Connection], None]] = ()):
+        self.db_path = str(db_path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stop_event = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'enqueued': 0,
+            'dropped': 0,
+            'dropped_vehicle': 0,
+            'dropped_evidence': 0,
+            'dropped_deletion': 0,
+            'written': 0,
+            'evidence_written': 0,
+            'commits': 0,
+            'last_commit_ms': 0.0,
+            'max_commit_ms': 0.0,
+            'total_commit_ms': 0.0,
+        }
+        self._maintenance_tasks = []
+        self.watermark = IngestWatermark(self.db_path)
+        self._watermark_written = float('-inf')
+        self._watermark_dirty = False
+        self._init_db(startup_tasks)
+        self._writer = threading.Thread(target=self._writer_loop, name='db-writer', daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _init_db(self, startup_tasks=()) -> None:
+        """Initialize the database with required tables if they don't exist."""
+        conn = self._connect()
+        try:
+            init_schema(conn)
+            for task in startup_tasks:
+                task(conn)
+        finally:
+            conn.close()
+
+    def _enqueue(self, kind: str, item) -> bool:
+        """Put ``item`` on the writer queue without blocking.
+
+        Returns False if the queue is full; drops are counted in total and
+        per ``kind`` (vehicle, evidence or deletion).
+        """
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats['dropped'] += 1
+                self._stats[f'dropped_{kind}'] += 1
+            return False
+        with self._stats_lock:
+            self._stats['enqueued'] += 1
+        return True
+
+    def record_vehicle(self, is_runner: bool = False) -> bool:
+        """Queue a vehicle record for the writer thread. Never blocks.
+
+        Returns False if the queue is full and the record had to be dropped.
+        """
+        # Capture the local time now rather than at commit time
+        return self._enqueue('vehicle', (datetime.now(), bool(is_runner)))
+
+    def record_evidence(self, record: EvidenceRecord) -> bool:
+        """Queue a violation_evidence row for the writer thread. Never blocks."""
+        return self._enqueue('evidence', record)
+
+    def delete_evidence(self, image_paths) -> bool:
+        """Queue removal of the violation_evidence rows for ``image_paths``. Never blocks."""
+        return self._enqueue('deletion', EvidenceDeletion(tuple(image_paths)))
+
+    def add_maintenance_task(self, task: Callable[[sqlite3.Connection], None], interval: float) -> None:
+        """Run ``task(conn)`` on the writer's connection every ``interval`` seconds.
+
+        The first run happens one interval after the task is added.
+        """
+        self._maintenance_tasks.append([task, interval, time.monotonic() + interval])
+
+    def _run_maintenance(self, conn: sqlite3.Connection) -> None:
+        now = time.monotonic()
+        for entry in list(self._maintenance_tasks):
+            task, interval, due = entry
+            if now < due:
+                continue
+            entry[2] = now + interval
+            try:
+                task(conn)
+            except Exception as e:
+                conn.rollback()
+                print(f"Database maintenance task {getattr(task, '__name__', task)} failed: {e}")
+            # Maintenance may have pruned or moved data, even if it failed part way
+            self._bump_watermark()
+
+    def _bump_watermark(self, force: bool = False) -> None:
+        """Record a change, writing the watermark at most every WATERMARK_MIN_INTERVAL.
+
+        A change inside the interval only marks it dirty; the writer loop
+        writes it once the interval has passed, or with ``force`` on exit.
+        """
+        now = time.monotonic()
+        if not force and now - self._watermark_written < WATERMARK_MIN_INTERVAL:
+            self._watermark_dirty = True
+            return
+        self._watermark_dirty = False
+        self._watermark_written = now
+        try:
+            self.watermark.bump()
+        except OSError as e:
+            print(f"Failed to update ingest watermark: {e}")
+
+    def _writer_loop(self) -> None:
+        conn = self._connect()
+        pending = []
+        deadline = None
+        try:
+            while True:
+                timeout = self.flush_interval if deadline is None else max(0.0, deadline - time.monotonic())
+                # Wake up regularly so close() is noticed without waiting out the interval
+                timeout = min(timeout, STOP_POLL_INTERVAL)
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+
+                if item is not None:
+                    pending.append(item)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                    # Drain whatever else is already waiting, up to one batch
+                    while len(pending) < self.batch_size:
+                        try:
+                            pending.append(self._queue.get_nowait())
+                        except queue.Empty:
+                            break
+
+                if pending and (len(pending) >= self.batch_size or time.monotonic() >= deadline):
+                    self._commit_batch(conn, pending)
+                    pending = []
+                    deadline = None
+
+                if self._stop_event.is_set() and self._queue.empty():
+                    break
+
+                if not pending:
+                    self._run_maintenance(conn)
+
+                if self._watermark_dirty:
+                    self._bump_watermark()
+
+            if pending:
+                self._commit_batch(conn, pending)
+        finally:
+            conn.close()
+            if self._watermark_dirty:
+                self._bump_watermark(force=True)
+
+    def _commit_batch(self, conn: sqlite3.Connection, items) -> None:
+        rows = []
+        evidence = [item for item in items if isinstance(item, EvidenceRecord)]
+        deleted = [(path,) for item in items if isinstance(item, EvidenceDeletion) for path in item.image_paths]
+        vehicles = [item for item in items if not isinstance(item, (EvidenceRecord, EvidenceDeletion))]
+        rollups = {granularity: Counter() for granularity in ROLLUP_TABLES}
+        for moment, is_runner in vehicles:
+            rows.append((int(moment.timestamp()), moment.strftime('%Y-%m-%d %H:%M:%S'), 1, is_runner))
+            for granularity, counter in rollups.items():
+                bucket = bucket_start(moment, granularity)
+                counter[(bucket, 'total')] += 1
+                if is_runner:
+                    counter[(bucket, 'runners')] += 1
+
+        start = time.perf_counter()
+        try:
+            with conn:
+                conn.executemany('''
+                    INSERT INTO vehicle_tracking (ts, timestamp, vehicle_count, is_red_light_runner)
+                    VALUES (?, ?, ?, ?)
+                ''', rows)
+                for granularity, counter in rollups.items():
+                    buckets = sorted({bucket for bucket, _ in counter})
+                    conn.executemany(f'''
+                        INSERT INTO {ROLLUP_TABLES[granularity]} (bucket_start, total_vehicles, red_light_runners)
+                        VALUES (?, ?, ?)
+                        ON CONFLICT(bucket_start) DO UPDATE SET
+                            total_vehicles = total_vehicles + excluded.total_vehicles,
+                            red_light_runners = red_light_runners + excluded.red_light_runners
+                    ''', [(b, counter[(b, 'total')], counter[(b, 'runners')]) for b in buckets])
+                if evidence:
+                    conn.executemany('''
+                        INSERT INTO violation_evidence (
+                            ts, track_id, image_path, image_bytes,
+                            thumbnail_path, thumbnail_bytes, width, height
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ''', evidence)
+                # After the inserts, a row can be added and evicted in one batch
+                if deleted:
+                    conn.executemany('DELETE FROM violation_evidence WHERE image_path = ?', deleted)
+        except sqlite3.Error as e:
+            print(f"Database write failed, {len(items)} records lost: {e}")
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        # Evidence rows don't change any stats, so they don't invalidate /stats
+        if rows:
+            self._bump_watermark()
+        with self._stats_lock:
+            self._stats['written'] += len(rows)
+            self._stats['evidence_written'] += len(evidence)
+            self._stats['commits'] += 1
+            self._stats['last_commit_ms'] = elapsed_ms
+            self._stats['max_commit_ms'] = max(self._stats['max_commit_ms'], elapsed_ms)
+            self._stats['total_commit_ms'] += elapsed_ms
+
+    def get_stats(self) -> Dict[str, float]:
+        """Return writer counters: queue depth, drops and commit latency."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['avg_commit_ms'] = stats['total_commit_ms'] / stats['commits'] if stats['commits'] else 0.0
+        return stats
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Flush everything still queued and stop the writer thread."""
+        if self._stop_event.is_set():
+            return
+        self._stop_event.set()
+        self._writer.join(timeout)
+        if self._writer.is_alive():
+            print(f"Database writer did not finish within {timeout}s, {self._queue.qsize()} records pending")
+
+
+class ReadConnectionPool:
+    """Read-only SQLite connections used from asyncio code.
+
+    Queries run on a dedicated thread pool so they never block the event loop,
+    and an asyncio semaphore caps how many run at once. Connections are opened
+    with ``mode=ro`` and ``query_only`` so the API can never write; the writer
+    puts the database in WAL mode, so readers don't block it or each other.
+    """
+
+    def __init__(self, db_path: Union[str, Path] = 'traffic.db', size: int = 2,
+                 max_concurrency: Optional[int] = None, slow_query_ms: float = 250.0):
+        self.db_path = str(db_path)
+        self.size = size
+        self.max_concurrency = max_concurrency or size
+        self.slow_query_ms = slow_query_ms
+        self._connections = queue.Queue()
+        for _ in range(size):
+            self._connections.put(self._connect())
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix='db-read')
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        uri = f"file:{Path(self.db_path).resolve()}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=5, check_same_thread=False)
+        conn.execute('PRAGMA query_only = ON')
+        return conn
+
+    def _call(self, fn: Callable[..., Any], args: Tuple) -> Tuple[Any, float]:
+        conn = self._connections.get()
+        try:
+            start = time.perf_counter()
+            result = fn(conn, *args)
+            return result, (time.perf_counter() - start) * 1000
+        finally:
+            self._connections.put(conn)
+
+    async def run(self, fn: Callable[..., Any], *args, label: Optional[str] = None) -> Any:
+        """Run ``fn(conn, *args)`` on a pooled connection off the event loop."""
+        label = label or getattr(fn, '__name__', 'query')
+        loop = asyncio.get_running_loop()
+        queued_at = time.perf_counter()
+        async with self._semaphore:
+            wait_ms = (time.perf_counter() - queued_at) * 1000
+            result, elapsed_ms = await loop.run_in_executor(self._executor, self._call, fn, args)
+        self._record(label, elapsed_ms, wait_ms)
+        return result
+
+    async def fetchall(self, query: str, params: Tuple = (), label: Optional[str] = None) -> List[Tuple]:
+        return await self.run(lambda conn: conn.execute(query, params).fetchall(), label=label or 'fetchall')
+
+    def _record(self, label: str, elapsed_ms: float, wait_ms: float) -> None:
+        if elapsed_ms > self.slow_query_ms:
+            print(f"Slow query '{label}': {elapsed_ms:.1f}ms")
+        with self._stats_lock:
+            stats = self._stats.setdefault(label, {
+                'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'last_ms': 0.0, 'total_wait_ms': 0.0,
+            })
+            stats['count'] += 1
+            stats['total_ms'] += elapsed_ms
+            stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+            stats['last_ms'] = elapsed_ms
+            stats['total_wait_ms'] += wait_ms
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """Return per-query timing, keyed by label."""
+        with self._stats_lock:
+            result = {}
+            for label, stats in self._stats.items():
+                result[label] = dict(stats)
+                result[label]['avg_ms'] = stats['total_ms'] / stats['count']
+                result[label]['avg_wait_ms'] = stats['total_wait_ms'] / stats['count']
+        return result
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
@@ -1,10 +1,8 @@
 # Standard library imports
-import datetime
 import json
-import multiprocessing
-import os
 import socket
 import sqlite3
+import time
 
 # Third-party imports
 import cv2
@@ -23,16 +21,47 @@ from hailo_rpi_common import (
     app_callback_class,
 )
 from detection_pipeline import GStreamerDetectionApp
+from frame_bus import RENDITIONS
 from frame_publisher import FramePublisher
 from vehicle_tracking import TrackedVehicle, VehicleTracker
 from config import (
     DEFAULT_ZONES,
     OUTPUT_DIR,
     MAX_SAVED_IMAGES,
+    EVIDENCE_MAX_BYTES,
+    EVIDENCE_MAX_AGE_DAYS,
+    EVIDENCE_THUMBNAIL_WIDTH,
+    EVIDENCE_JPEG_QUALITY,
+    EVIDENCE_QUEUE_SIZE,
+    EVIDENCE_FSYNC_BATCH,
+    EVIDENCE_FSYNC_INTERVAL,
     ZONE_UPDATE_INTERVAL,
+    RETENTION_RAW_DAYS,
+    RETENTION_MINUTE_ROLLUP_DAYS,
+    RETENTION_PARTITION_MONTHS,
+    RETENTION_ARCHIVE_DIR,
+    RETENTION_INTERVAL,
+    PUBLISH_CHANGE_THRESHOLD,
+    PUBLISH_KEYFRAME_INTERVAL,
+    PUBLISH_HEARTBEAT_INTERVAL,
+    FRAME_TRANSPORT,
+    FRAME_RING_SLOTS,
+    FRAME_RING_SLOT_SIZE,
+    STREAM_CLEAN_FRAMES,
+    LIGHT_RED_HSV_RANGES,
+    LIGHT_RED_ON_PIXELS,
+    LIGHT_RED_OFF_PIXELS,
+    LIGHT_DEBOUNCE_FRAMES,
+    ANALYTICS_MODE,
+    ANALYTICS_QUEUE_SIZE,
+    ANALYTICS_STATS_INTERVAL,
 )
+from analytics_worker import AnalyticsWorker
 from database_utils import DatabaseManager
+from evidence_writer import EvidenceWriter
+from retention import RetentionPolicy
 from zone_manager import ZoneManager
+from light_state import LightStateEstimator
 from frame_processing import FrameProcessor
 
 class user_app_callback_class(app_callback_class):
@@ -44,14 +73,26 @@ class user_app_callback_class(app_callback_class):
     """
     def __init__(self):
         super().__init__()
-        self.db_manager = DatabaseManager()
+        retention = RetentionPolicy(
+            raw_days=RETENTION_RAW_DAYS,
+            minute_rollup_days=RETENTION_MINUTE_ROLLUP_DAYS,
+            partition_months=RETENTION_PARTITION_MONTHS,
+            archive_dir=RETENTION_ARCHIVE_DIR,
+        )
+        # The one-off VACUUM in prepare runs before any events are taken
+        self.db_manager = DatabaseManager(startup_tasks=[retention.prepare])
+        self.db_manager.add_maintenance_task(retention.run, RETENTION_INTERVAL)
         self.frame_processor = FrameProcessor()
         # Initialize counters
-        self.pixel_count = multiprocessing.Value('i', 0)
+        self.light_estimator = LightStateEstimator(
+            LIGHT_RED_HSV_RANGES,
+            on_pixels=LIGHT_RED_ON_PIXELS,
+            off_pixels=LIGHT_RED_OFF_PIXELS,
+            debounce_frames=LIGHT_DEBOUNCE_FRAMES,
+        )
         self.frame_count = 0
         self.red_light_runner_count = 0
         self.total_vehicles_seen = 0
-        self.saved_image_count = 0
         self.max_in_green = 0
         self.red_light_trigger_check = False
         self.detection_buffer = []
@@ -61,17 +102,95 @@ class user_app_callback_class(app_callback_class):
         
         # Initialize tracking and publishing components
         self.vehicle_tracker = VehicleTracker()
-        self.publisher = FramePublisher()
+        self.publisher = FramePublisher(
+            change_threshold=PUBLISH_CHANGE_THRESHOLD,
+            keyframe_interval=PUBLISH_KEYFRAME_INTERVAL,
+            heartbeat_interval=PUBLISH_HEARTBEAT_INTERVAL,
+            transport=FRAME_TRANSPORT,
+            ring_slots=FRAME_RING_SLOTS,
+            ring_slot_size=FRAME_RING_SLOT_SIZE,
+        )
         
-        # Create output directory if it doesn't exist
-        if not os.path.exists(OUTPUT_DIR):
-            os.makedirs(OUTPUT_DIR)
+        # Set by GStreamerDetectionApp; in 'native' mode GStreamer encodes the
+        # web stream and the callback only leaves the latest metadata here
+        self.stream_mode = 'python'
+        self.stream_overlay = False
+        self.stream_metadata = None
+        
+        # In worker mode the pad probe only copies out each frame and its detections, see app_callback
+        self.analytics_worker = None
+        if ANALYTICS_MODE == "worker":
+            self.analytics_worker = AnalyticsWorker(
+                lambda snapshot: analyze_frame(self, *snapshot),
+                max_queue_size=ANALYTICS_QUEUE_SIZE,
+                stats_interval=ANALYTICS_STATS_INTERVAL,
+            )
+        
+        # Violation images are encoded and written off the analytics path, and
+        # the oldest are evicted to keep the disk bounded; this also creates OUTPUT_DIR
+        self.evidence_writer = EvidenceWriter(
+            OUTPUT_DIR,
+            self.db_manager,
+            thumbnail_width=EVIDENCE_THUMBNAIL_WIDTH,
+            jpeg_quality=EVIDENCE_JPEG_QUALITY,
+            max_queue_size=EVIDENCE_QUEUE_SIZE,
+            fsync_batch=EVIDENCE_FSYNC_BATCH,
+            fsync_interval=EVIDENCE_FSYNC_INTERVAL,
+            max_bytes=EVIDENCE_MAX_BYTES,
+            max_age_days=EVIDENCE_MAX_AGE_DAYS,
+            max_files=MAX_SAVED_IMAGES,
+        )
     
     def __del__(self):
         """Cleanup when object is destroyed."""
+        if getattr(self, 'analytics_worker', None) is not None:
+            self.analytics_worker.close()
         if hasattr(self, 'publisher'):
             self.publisher.close()
+        if hasattr(self, 'evidence_writer'):
+            self.evidence_writer.close()
+        if hasattr(self, 'db_manager'):
+            self.db_manager.close()
     
+    def connect_native_stream(self, pipeline, name='web_stream', valve_interval_ms=500):
+        """Publish the JPEGs from the pipeline's web stream appsinks.
+
+        Each rendition's valve is only opened while someone is subscribed to
+        it, so idle renditions cost no encoding.
+        """
+        for topic, _, _ in RENDITIONS:
+            sink = pipeline.get_by_name(f"{name}_{topic.decode()}_sink")
+            if sink is None:
+                print(f"Warning: {name}_{topic.decode()}_sink not found, is the pipeline in native stream mode?")
+                continue
+            sink.connect("new-sample", self._on_stream_sample, topic)
+        GLib.timeout_add(valve_interval_ms, self._sync_stream_valves, pipeline, name)
+
+    def _on_stream_sample(self, sink, topic):
+        sample = sink.emit("pull-sample")
+        metadata = self.stream_metadata
+        if sample is None or metadata is None:
+            return Gst.FlowReturn.OK
+        buffer = sample.get_buffer()
+        success, map_info = buffer.map(Gst.MapFlags.READ)
+        if not success:
+            return Gst.FlowReturn.OK
+        try:
+            # The mapping is only valid until unmap, so the JPEG is copied once
+            self.publisher.publish_encoded(topic, bytes(map_info.data), metadata)
+        finally:
+            buffer.unmap(map_info)
+        return Gst.FlowReturn.OK
+
+    def _sync_stream_valves(self, pipeline, name):
+        active = {topic for topic, _, _ in self.publisher.active_renditions()}
+        for topic, _, _ in RENDITIONS:
+            valve = pipeline.get_by_name(f"{name}_{topic.decode()}_valve")
+            if valve is not None:
+                valve.set_property("drop", topic not in active)
+        # Keep the timeout running
+        return True
+
     @property
     def run_rate(self):
         """Calculate the percentage of vehicles that run red lights"""
@@ -79,10 +198,29 @@ class user_app_callback_class(app_callback_class):
             return 0.0
         return round((self.red_light_runner_count / self.total_vehicles_seen) * 100, 2)
     
+    @property
+    def draws_frames(self):
+        """Whether the callback's frames are drawn on and converted, i.e. anyone sees them.
+
+        In native mode GStreamer encodes the stream, so the callback's own
+        frames are only looked at with --show-frame.
+        """
+        return self.stream_mode != 'native' or self.show_frames
+
+    @property
+    def overlays_drawn(self):
+        """Whether the streamed frames already show the overlay, so the web client mustn't draw it.
+
+        In native mode only hailooverlay in the encoded branch draws on them, with --stream-overlay.
+        """
+        if self.stream_mode == 'native':
+            return self.stream_overlay
+        return not STREAM_CLEAN_FRAMES
+
     @property
     def light_status(self):
-        """Return current traffic light status based on pixel count"""
-        if self.pixel_count.value == 0:
+        """Return current traffic light status from the light state estimator"""
+        if not self.light_estimator.is_red:
             self.max_in_green = 0
             return "Green Light"
         return "Red Light"
@@ -98,88 +236,126 @@ def app_callback(pad, info, user_data):
     if buffer is None:
         return Gst.PadProbeReturn.OK
     
-
+    start = time.perf_counter()
     user_data.increment()
-    user_data.frame_count += 1
+    format, width, height = get_caps_from_pad(pad)
+    has_frame = user_data.use_frame and format and width and height
+    detections = None
+    # analyze_frame skips frames with neither pixels nor a native stream to feed
+    if width and height and (has_frame or user_data.stream_mode == 'native'):
+        detections = user_data.frame_processor.extract_detections(buffer, width, height)
 
-    print(f"Amount of red detected: {user_data.pixel_count.value}")
+    if user_data.analytics_worker is None:
+        if has_frame:
+            # The view is only valid inside the with block, nothing keeps it past that
+            with user_data.frame_processor.mapped_frame(buffer, format, width, height) as view:
+                # Drawing is the only write, otherwise frames are read straight from the mapping
+                draw = user_data.draws_frames and not STREAM_CLEAN_FRAMES
+                analyze_frame(user_data, view.copy() if draw else view, detections, width, height)
+        else:
+            analyze_frame(user_data, None, detections, width, height)
+    else:
+        # The worker runs after the buffer is released, so it gets its own copy
+        frame = user_data.frame_processor.setup_frame(buffer, format, width, height) if has_frame else None
+        user_data.analytics_worker.submit((frame, detections, width, height))
+        user_data.analytics_worker.record_probe_time(time.perf_counter() - start)
+
+    return Gst.PadProbeReturn.OK
 
-    format, width, height = get_caps_from_pad(pad)
-    frame = None
-    if user_data.use_frame and format and width and height:
-        frame = user_data.frame_processor.setup_frame(buffer, format, width, height)
-    
 
-    # every 500 frames parse for a new received zone
-    if user_data.get_count() % 500 == 0:
+def analyze_frame(user_data, frame, detections, width, height):
+    """Everything after the detection snapshot: tracking, counting and publishing."""
+    user_data.frame_count += 1
+
+    # every ZONE_UPDATE_INTERVAL frames parse for a new received zone
+    if user_data.frame_count % ZONE_UPDATE_INTERVAL == 0:
         user_data.zone_manager.update_zones()
         
 
-    if user_data.use_frame and frame is not None:
-        # Draw zones and process frame for traffic light detection
+    if not (width and height):
+        return
+    if frame is not None:
+        process_frame(user_data, detections, frame, width, height)
+    elif user_data.stream_mode == 'native':
+        # No pixels to look at, but the native stream still needs its metadata
+        process_frame(user_data, detections, None, width, height)
+
+
+def process_frame(user_data, detections, frame, width, height):
+    """Detect, track and publish one frame.
+
+    ``frame`` may be a read-only view, or None in native mode without
+    --use-frame, where only the metadata is produced and the light state
+    isn't updated.
+    """
+    user_data.zone_manager.set_frame_size(width, height)
+    # Only draw on frames someone will see
+    draw = frame is not None and user_data.draws_frames and not STREAM_CLEAN_FRAMES
+    if frame is not None:
+        # Traffic light state from the light's zone, read before anything is drawn over it
+        user_data.light_estimator.update(frame, user_data.zone_manager.get_zone('traffic_zone'))
+
+    # Draw zones
+    if draw:
         user_data.zone_manager.draw_zones(frame)
-        
-        hsv_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        lower_bound = np.array([55, 68, 40])
-        upper_bound = np.array([172, 196, 255])
-        color_mask = cv2.inRange(hsv_frame, lower_bound, upper_bound)
-        zone_mask = np.zeros(frame.shape[:2], dtype=np.uint8)
-        cv2.fillPoly(zone_mask, [user_data.zone_manager.get_zone('traffic_zone')], 255)
-
-        # Process vehicle detections
-        relevant_detections, detection_count = user_data.frame_processor.process_detections(
-            buffer, width, height, user_data.zone_manager
-        )
 
+    # The detections were read once in the probe, everything below works on that array
+    relevant_detections, detection_count = user_data.frame_processor.process_detections(
+        detections, user_data.zone_manager
+    )
 
-        # Add detection smoothing
-        buffer_size = 5  # Adjust based on frame rate
 
-        if len(user_data.detection_buffer) >= buffer_size:
-            user_data.detection_buffer.pop(0)
-        user_data.detection_buffer.append(detection_count)
+    # Add detection smoothing
+    buffer_size = 5  # Adjust based on frame rate
 
-        smoothed_count = sum(user_data.detection_buffer) / len(user_data.detection_buffer)
-        user_data.max_in_green = max(user_data.max_in_green, smoothed_count)
-        if smoothed_count < user_data.max_in_green:
-            user_data.red_light_trigger_check = True  
-        
+    if len(user_data.detection_buffer) >= buffer_size:
+        user_data.detection_buffer.pop(0)
+    user_data.detection_buffer.append(detection_count)
+
+    smoothed_count = sum(user_data.detection_buffer) / len(user_data.detection_buffer)
+    user_data.max_in_green = max(user_data.max_in_green, smoothed_count)
+    if smoothed_count < user_data.max_in_green:
+        user_data.red_light_trigger_check = True  
+    
+
+    # Update vehicle tracker
+    user_data.vehicle_tracker.update_from_arrays(
+        user_data.frame_count, relevant_detections['box'], relevant_detections['center']
+    )
 
-        # Update vehicle tracker
-        user_data.vehicle_tracker.update(user_data.frame_count, relevant_detections, width, height)
-
-        # Process tracked vehicles
-        for vehicle_id, vehicle in user_data.vehicle_tracker.get_active_vehicles().items():
-            # Update vehicle totals and database
-            if user_data.zone_manager.is_in_zone(user_data.zone_manager.get_zone('red_zone'), vehicle.center_point):
-                if not vehicle.counted_in_total:
-                    user_data.total_vehicles_seen += 1
-                    vehicle.counted_in_total = True
-                    user_data.db_manager.record_vehicle(
-                        is_runner=(user_data.light_status == "Red Light")
-                    )
+    # Process tracked vehicles, with one zone lookup for all of them
+    active_vehicles = user_data.vehicle_tracker.get_active_vehicles()
+    in_red_zone = (
+        user_data.zone_manager.labels_at([vehicle.center_point for vehicle in active_vehicles.values()])
+        & user_data.zone_manager.zone_mask('red_zone')
+    ) != 0
+    for (vehicle_id, vehicle), in_red in zip(active_vehicles.items(), in_red_zone):
+        # Update vehicle totals and database
+        if in_red:
+            if not vehicle.counted_in_total:
+                user_data.total_vehicles_seen += 1
+                vehicle.counted_in_total = True
+                user_data.db_manager.record_vehicle(
+                    is_runner=(user_data.light_status == "Red Light")
+                )
+            
+            # Handle red light runners
+            if user_data.light_status == "Red Light" and not vehicle.counted_as_runner:
+                if user_data.red_light_trigger_check:
+                    user_data.red_light_runner_count += 1
+                    # Remove this line to allow multiple detections:
+                    # user_data.red_light_trigger_check = False
+                    user_data.max_in_green = smoothed_count  # Update baseline after violation
+                vehicle.counted_as_runner = True
                 
-                # Handle red light runners
-                if user_data.light_status == "Red Light" and not vehicle.counted_as_runner:
-                    if user_data.red_light_trigger_check:
-                        user_data.red_light_runner_count += 1
-                        # Remove this line to allow multiple detections:
-                        # user_data.red_light_trigger_check = False
-                        user_data.max_in_green = smoothed_count  # Update baseline after violation
-                    vehicle.counted_as_runner = True
-                    
-                    # Save violation image if needed
-                    if user_data.saved_image_count < MAX_SAVED_IMAGES and not vehicle.red_light_image_saved:
-                        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H-%M-%S")
-                        filename = os.path.join(OUTPUT_DIR, f"{timestamp}_red_light_runner_id_{vehicle_id}.jpg")
-                        saved_converted_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                        cv2.imwrite(filename, saved_converted_rgb)
+                # Save violation image if needed; the evidence store evicts the
+                # oldest images past MAX_SAVED_IMAGES, so newer ones are always kept
+                if frame is not None and not vehicle.red_light_image_saved:
+                    # Only queued here; if the writer is backed up a later frame retries
+                    if user_data.evidence_writer.submit(frame, vehicle_id):
                         vehicle.red_light_image_saved = True
-                        user_data.saved_image_count += 1
-                        print(f"Saved red light runner image: {filename}")
-                    elif user_data.saved_image_count >= MAX_SAVED_IMAGES:
-                        print("Image save limit reached. No more images will be saved.")
-                            # Draw vehicle information
+                        # Draw vehicle information
+            if draw:
                 user_data.frame_processor.draw_vehicle_info(
                     frame, 
                     vehicle_id, 
@@ -190,31 +366,47 @@ def app_callback(pad, info, user_data):
 
 
 
-        # Draw statistics
-        stats = {
-            'light_status': user_data.light_status,
-            'total_vehicles': user_data.total_vehicles_seen,
-            'red_light_runners': user_data.red_light_runner_count,
-            'run_rate': user_data.run_rate,
-            'detection_count': detection_count
-        }
+    # Draw statistics
+    stats = {
+        'light_status': user_data.light_status,
+        'total_vehicles': user_data.total_vehicles_seen,
+        'red_light_runners': user_data.red_light_runner_count,
+        'run_rate': user_data.run_rate,
+        'detection_count': detection_count
+    }
+    if draw and user_data.stream_mode != 'native':
         user_data.frame_processor.draw_stats(frame, stats)
 
-        # Prepare frame for output
+    # Prepare frame for output, in native mode only the preview window needs it
+    if frame is not None and user_data.draws_frames:
         frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        user_data.set_frame(frame)
-
-        # Prepare and publish metadata
-        metadata = {
-            'frame_count': user_data.frame_count,
-            'light_status': user_data.light_status,
-            'total_vehicles': user_data.total_vehicles_seen,
-            'red_light_runners': user_data.red_light_runner_count,
-            'run_rate': user_data.run_rate,
-        }
-        user_data.publisher.publish_frame_with_metadata(frame, metadata)
+        if user_data.show_frames:
+            user_data.set_frame(frame)
 
-    return Gst.PadProbeReturn.OK
+    # Prepare and publish metadata
+    metadata = {
+        'frame_count': user_data.frame_count,
+        'light_status': user_data.light_status,
+        'total_vehicles': user_data.total_vehicles_seen,
+        'red_light_runners': user_data.red_light_runner_count,
+        'run_rate': user_data.run_rate,
+        # Wall-clock capture time, lets the API drop frames that queued too long
+        'captured_at': time.time(),
+        # Structured overlay data, the web client draws it when the frame is clean
+        'overlays_drawn': user_data.overlays_drawn,
+        'frame_size': [width, height],
+        'detection_count': detection_count,
+        'vehicles': [
+            {'id': vehicle_id, 'bbox': list(vehicle.bbox), 'runner': vehicle.counted_as_runner}
+            for vehicle_id, vehicle in user_data.vehicle_tracker.get_active_vehicles().items()
+        ],
+        'zones': user_data.zone_manager.as_polygons(),
+    }
+    if user_data.stream_mode == 'native':
+        # The pipeline encodes the stream, the appsinks pick this up
+        user_data.stream_metadata = metadata
+    else:
+        user_data.publisher.publish_frame_with_metadata(frame, metadata)
 
 
 def check_port_usage(port=5555):
@@ -240,17 +432,29 @@ def is_port_in_use(port=5555):
     
 
 if __name__ == "__main__":
-    # Check port status before starting
-    if is_port_in_use(5555):
-        print("Port 5555 is already in use!")
-        check_port_usage(5555)
-    else:
-        print("Port 5555 is available")
+    # Check port status before starting, the shm transport doesn't use it
+    if FRAME_TRANSPORT != "shm":
+        if is_port_in_use(5555):
+            print("Port 5555 is already in use!")
+            check_port_usage(5555)
+        else:
+            print("Port 5555 is available")
     
     user_data = user_app_callback_class()
     app = GStreamerDetectionApp(app_callback, user_data)
+    if app.stream_mode == "native":
+        user_data.connect_native_stream(app.pipeline)
     try:
         app.run()
         print('app is running')
     finally:
-        user_data.publisher.close()
\ No newline at end of file
+        if user_data.analytics_worker is not None:
+            user_data.analytics_worker.close()
+            print(f"Analytics worker stats: {user_data.analytics_worker.get_stats()}")
+        user_data.publisher.close()
+        print(f"Frame publisher stats: {user_data.publisher.get_stats()}")
+        # Before the database, which records the evidence rows
+        user_data.evidence_writer.close()
+        print(f"Evidence writer stats: {user_data.evidence_writer.get_stats()}")
+        user_data.db_manager.close()
+        print(f"Database writer stats: {user_data.db_manager.get_stats()}")
\ No newline at end of file
@@ -17,11 +17,13 @@ from hailo_rpi_common import (
     INFERENCE_PIPELINE_WRAPPER,
     USER_CALLBACK_PIPELINE,
     DISPLAY_PIPELINE,
+    JPEG_STREAM_PIPELINE,
     GStreamerApp,
     app_callback_class,
     dummy_callback,
     detect_hailo_arch,
 )
+from frame_bus import RENDITIONS
 
 
 
@@ -38,6 +40,18 @@ class GStreamerDetectionApp(GStreamerApp):
             default=None,
             help="Path to costume labels JSON file",
         )
+        parser.add_argument(
+            "--stream-mode",
+            default="python",
+            choices=["python", "native"],
+            help="How the web stream is encoded: 'python' draws and encodes frames in the callback, "
+                 "'native' tees the pipeline into GStreamer jpegenc branches and Python only sends metadata",
+        )
+        parser.add_argument(
+            "--stream-overlay", action="store_true",
+            help="With --stream-mode native, burn hailooverlay boxes into the stream "
+                 "(by default the web client draws overlays from the frame metadata)",
+        )
         args = parser.parse_args()
         # Call the parent class constructor
         super().__init__(args, user_data)
@@ -76,6 +90,12 @@ class GStreamerDetectionApp(GStreamerApp):
         # User-defined label JSON file
         self.labels_json = args.labels_json
 
+        # Web stream encoding, see get_pipeline_string
+        self.stream_mode = args.stream_mode
+        self.stream_overlay = args.stream_overlay
+        user_data.stream_mode = self.stream_mode
+        user_data.stream_overlay = self.stream_overlay
+
         self.app_callback = app_callback
 
         self.thresholds_str = (
@@ -108,12 +128,30 @@ class GStreamerDetectionApp(GStreamerApp):
                 video_sink=self.video_sink, sync=self.sync, show_fps=self.show_fps
             )
 
-        pipeline_string = (
-            f'{source_pipeline} '
-            f'{detection_pipeline} ! '
-            f'{user_callback_pipeline} ! '
-            f'{display_pipeline}'
-        )
+        if self.stream_mode == "native":
+            # Split after the callback: one branch displays (or discards) the
+            # video, the other is encoded to JPEG by GStreamer for the web stream
+            stream_pipeline = JPEG_STREAM_PIPELINE(
+                RENDITIONS,
+                video_width=self.network_width,
+                video_height=self.network_height,
+                overlay=self.stream_overlay,
+            )
+            pipeline_string = (
+                f'{source_pipeline} '
+                f'{detection_pipeline} ! '
+                f'{user_callback_pipeline} ! '
+                f'tee name=callback_tee '
+                f'callback_tee. ! {QUEUE(name="callback_tee_display_q")} ! {display_pipeline} '
+                f'callback_tee. ! {stream_pipeline}'
+            )
+        else:
+            pipeline_string = (
+                f'{source_pipeline} '
+                f'{detection_pipeline} ! '
+                f'{user_callback_pipeline} ! '
+                f'{display_pipeline}'
+            )
         print("Pipeline String:\n", pipeline_string)
         return pipeline_string
 
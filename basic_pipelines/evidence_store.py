@@ -0,0 +1,114 @@
+import os
+import re
+import time
+from collections import deque
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+
+# Evidence files are named "<%Y-%m-%d %H-%M-%S>_red_light_runner_id_<track>.jpg"
+TIMESTAMP_FORMAT = '%Y-%m-%d %H-%M-%S'
+TIMESTAMP_LENGTH = len('2000-01-01 00-00-00')
+EVIDENCE_NAME = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}-\d{2}-\d{2}_red_light_runner_id_\d+\.jpg')
+
+
+class EvidenceEntry(NamedTuple):
+    ts: float
+    name: str
+    nbytes: int  # image and thumbnail together
+
+
+class EvidenceStore:
+    """
+    Bounded set of violation images on disk, oldest evicted first.
+
+    Entries are kept in a deque in capture order with a running byte total,
+    so admitting an image and evicting the oldest are both O(1). Limits are a
+    byte quota, a maximum age and a file count; the newest image is always
+    admitted and older ones make room for it.
+
+    The directory itself is the index: file names start with the capture
+    time, so ``load`` rebuilds it at startup with one scandir pass and no
+    index file can drift out of sync with what is on disk. Not thread safe,
+    it is only used from the EvidenceWriter thread.
+    """
+
+    def __init__(self, output_dir: str, thumbnail_dir: str, max_bytes: Optional[int] = None,
+                 max_age_days: Optional[float] = None, max_files: Optional[int] = None):
+        self.output_dir = output_dir
+        self.thumbnail_dir = thumbnail_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        self.max_files = max_files
+        self.entries = deque()
+        self.total_bytes = 0
+        self.evicted = 0
+
+    @staticmethod
+    def parse_timestamp(name: str) -> Optional[float]:
+        try:
+            return datetime.strptime(name[:TIMESTAMP_LENGTH], TIMESTAMP_FORMAT).timestamp()
+        except ValueError:
+            return None
+
+    def load(self) -> List[EvidenceEntry]:
+        """Rebuild the index from the directory and apply the limits.
+
+        Only files named like the EvidenceWriter names them are indexed;
+        anything else in the directory is left alone and never evicted.
+        Returns the entries evicted because the limits are now tighter than
+        what is on disk.
+        """
+        thumbnail_sizes = {}
+        if os.path.isdir(self.thumbnail_dir):
+            with os.scandir(self.thumbnail_dir) as it:
+                for entry in it:
+                    if entry.is_file():
+                        thumbnail_sizes[entry.name] = entry.stat().st_size
+
+        entries = []
+        with os.scandir(self.output_dir) as it:
+            for entry in it:
+                if not EVIDENCE_NAME.fullmatch(entry.name) or not entry.is_file():
+                    continue
+                ts = self.parse_timestamp(entry.name)
+                if ts is None:
+                    continue
+                nbytes = entry.stat().st_size + thumbnail_sizes.get(entry.name, 0)
+                entries.append(EvidenceEntry(ts, entry.name, nbytes))
+
+        entries.sort()
+        self.entries = deque(entries)
+        self.total_bytes = sum(entry.nbytes for entry in entries)
+        print(f"Evidence store: {len(entries)} images, {self.total_bytes / 2**20:.1f} MiB in {self.output_dir}")
+        return self.enforce()
+
+    def add(self, ts: float, name: str, nbytes: int) -> List[EvidenceEntry]:
+        """Admit a newly written image and return the entries evicted to make room."""
+        if self.entries and self.entries[-1].name == name:
+            # Same second and track id, the file was overwritten
+            self.total_bytes -= self.entries.pop().nbytes
+        self.entries.append(EvidenceEntry(ts, name, nbytes))
+        self.total_bytes += nbytes
+        return self.enforce(keep_newest=True)
+
+    def enforce(self, now: Optional[float] = None, keep_newest: bool = False) -> List[EvidenceEntry]:
+        """Pop the oldest entries until every limit holds."""
+        now = time.time() if now is None else now
+        keep = 1 if keep_newest else 0
+        evicted = []
+        while len(self.entries) > keep:
+            oldest = self.entries[0]
+            if not (
+                (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+                or (self.max_files is not None and len(self.entries) > self.max_files)
+                or (self.max_age is not None and now - oldest.ts > self.max_age)
+            ):
+                break
+            self.entries.popleft()
+            self.total_bytes -= oldest.nbytes
+            evicted.append(oldest)
+        self.evicted += len(evicted)
+        return evicted
+
+    def paths(self, entry: EvidenceEntry) -> List[str]:
+        return [os.path.join(self.output_dir, entry.name), os.path.join(self.thumbnail_dir, entry.name)]
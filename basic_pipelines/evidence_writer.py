@@ -0,0 +1,264 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from database_utils import DatabaseManager, EvidenceRecord
+from evidence_store import TIMESTAMP_FORMAT, EvidenceEntry, EvidenceStore
+
+
+class EvidenceWriter:
+    """
+    Saves violation images on a background thread.
+
+    ``submit`` only queues a frame; the writer thread encodes the full image
+    and a thumbnail, writes both, and fsyncs them in batches: once
+    ``fsync_batch`` images are pending or ``fsync_interval`` seconds after
+    the first of them. Only after a batch is on disk are its
+    violation_evidence rows handed to the DatabaseManager, so the table never
+    points at files that could be lost in a power cut.
+
+    Disk use is bounded by an EvidenceStore: every new image is kept, and
+    the oldest ones are deleted, files and rows, once the byte quota, age or
+    file count limit is exceeded.
+    """
+
+    def __init__(self, output_dir: str, db_manager: DatabaseManager, thumbnail_width: int = 320,
+                 jpeg_quality: int = 90, max_queue_size: int = 8, fsync_batch: int = 4,
+                 fsync_interval: float = 5.0, max_bytes: Optional[int] = None,
+                 max_age_days: Optional[float] = None, max_files: Optional[int] = None):
+        self.output_dir = output_dir
+        self.thumbnail_dir = os.path.join(output_dir, 'thumbnails')
+        self.db_manager = db_manager
+        self.thumbnail_width = thumbnail_width
+        self.jpeg_quality = jpeg_quality
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        os.makedirs(self.thumbnail_dir, exist_ok=True)
+        self.store = EvidenceStore(
+            output_dir, self.thumbnail_dir, max_bytes=max_bytes, max_age_days=max_age_days, max_files=max_files,
+        )
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._stop_event = threading.Event()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'enqueued': 0,
+            'dropped': 0,
+            'written': 0,
+            'failed': 0,
+            'unrecorded': 0,  # written, but the database queue had no room for the row
+            'bytes_written': 0,
+            'fsyncs': 0,
+            'max_fsync_ms': 0.0,
+            'evicted': 0,
+        }
+        # Image paths whose rows still have to be deleted
+        self._pending_deletions: List[str] = []
+        self._writer = threading.Thread(target=self._writer_loop, name='evidence-writer', daemon=True)
+        self._writer.start()
+
+    def submit(self, frame: np.ndarray, track_id: int, captured_at: Optional[datetime] = None) -> bool:
+        """Queue an RGB frame as evidence for ``track_id``. Never blocks.
+
+        The frame is copied, so the caller may keep drawing on it. Returns
+        False if the queue is full and nothing was queued.
+        """
+        item = (np.array(frame, copy=True), track_id, captured_at or datetime.now())
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats['dropped'] += 1
+            return False
+        with self._stats_lock:
+            self._stats['enqueued'] += 1
+        return True
+
+    def _encode(self, frame: np.ndarray) -> Tuple[bytes, bytes]:
+        # cv2 wants BGR, the pipeline hands us RGB
+        bgr = cv2.cvtColor(frame, cv2.COLOR_RGB2BGR)
+        params = [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality]
+        ok, image = cv2.imencode('.jpg', bgr, params)
+        if not ok:
+            raise ValueError("JPEG encoding failed")
+        height, width = bgr.shape[:2]
+        thumb_height = max(1, round(height * self.thumbnail_width / width))
+        thumbnail = cv2.resize(bgr, (self.thumbnail_width, thumb_height), interpolation=cv2.INTER_AREA)
+        ok, thumb = cv2.imencode('.jpg', thumbnail, params)
+        if not ok:
+            raise ValueError("Thumbnail encoding failed")
+        return image.tobytes(), thumb.tobytes()
+
+    def _write_file(self, path: str, data: bytes) -> int:
+        """Write ``data`` to a new file and return its descriptor, left open for the batch fsync."""
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        except OSError:
+            os.close(fd)
+            raise
+        return fd
+
+    def _write(self, item) -> Tuple[List[int], EvidenceRecord]:
+        frame, track_id, captured_at = item
+        image, thumb = self._encode(frame)
+        name = f"{captured_at.strftime(TIMESTAMP_FORMAT)}_red_light_runner_id_{track_id}.jpg"
+        image_path = os.path.join(self.output_dir, name)
+        thumbnail_path = os.path.join(self.thumbnail_dir, name)
+        fds = [self._write_file(image_path, image)]
+        try:
+            fds.append(self._write_file(thumbnail_path, thumb))
+        except OSError:
+            os.close(fds[0])
+            raise
+        height, width = frame.shape[:2]
+        record = EvidenceRecord(
+            int(captured_at.timestamp()), track_id, image_path, len(image),
+            thumbnail_path, len(thumb), width, height,
+        )
+        return fds, record
+
+    def _flush(self, fds: List[int], records: List[EvidenceRecord]) -> None:
+        start = time.perf_counter()
+        durable = True
+        try:
+            for fd in fds:
+                os.fsync(fd)
+            # The directory entries have to be durable too
+            for directory in (self.output_dir, self.thumbnail_dir):
+                dir_fd = os.open(directory, os.O_RDONLY)
+                try:
+                    os.fsync(dir_fd)
+                finally:
+                    os.close(dir_fd)
+        except OSError as e:
+            durable = False
+            print(f"Evidence fsync failed, {len(records)} images not recorded: {e}")
+        finally:
+            for fd in fds:
+                os.close(fd)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        evicted = []
+        unrecorded = 0
+        for record in records:
+            if durable:
+                if self.db_manager.record_evidence(record):
+                    print(f"Saved red light runner image: {record.image_path}")
+                else:
+                    unrecorded += 1
+                    print(f"Database queue full, no violation_evidence row for {record.image_path}")
+            # The files take up disk either way, so the store accounts for them
+            evicted.extend(self.store.add(
+                record.ts, os.path.basename(record.image_path), record.image_bytes + record.thumbnail_bytes,
+            ))
+        self._evict(evicted)
+        with self._stats_lock:
+            if durable:
+                self._stats['written'] += len(records)
+            else:
+                self._stats['failed'] += len(records)
+            self._stats['unrecorded'] += unrecorded
+            self._stats['bytes_written'] += sum(r.image_bytes + r.thumbnail_bytes for r in records)
+            self._stats['fsyncs'] += 1
+            self._stats['max_fsync_ms'] = max(self._stats['max_fsync_ms'], elapsed_ms)
+
+    def _evict(self, entries: List[EvidenceEntry]) -> None:
+        """Delete evicted images, their thumbnails and their violation_evidence rows.
+
+        If the database queue is full the row deletions are kept and retried
+        with the next eviction or when the writer is idle, so no row is left
+        pointing at a deleted file.
+        """
+        if not entries and not self._pending_deletions:
+            return
+        for entry in entries:
+            for path in self.store.paths(entry):
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"Failed to remove evicted evidence {path}: {e}")
+        image_paths = self._pending_deletions + [self.store.paths(entry)[0] for entry in entries]
+        if self.db_manager.delete_evidence(image_paths):
+            self._pending_deletions = []
+        else:
+            self._pending_deletions = image_paths
+            print(f"Database queue full, {len(image_paths)} violation_evidence deletions deferred")
+        with self._stats_lock:
+            self._stats['evicted'] += len(entries)
+
+    def _writer_loop(self) -> None:
+        try:
+            self._evict(self.store.load())
+        except OSError as e:
+            print(f"Failed to index evidence directory {self.output_dir}: {e}")
+        fds, records = [], []
+        deadline = None
+        while True:
+            timeout = self.fsync_interval if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is None:
+                # Idle, age out old evidence
+                self._evict(self.store.enforce())
+            else:
+                try:
+                    item_fds, record = self._write(item)
+                    fds.extend(item_fds)
+                    records.append(record)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.fsync_interval
+                except (OSError, ValueError, cv2.error) as e:
+                    with self._stats_lock:
+                        self._stats['failed'] += 1
+                    print(f"Failed to save violation image for track {item[1]}: {e}")
+
+            if records and (len(records) >= self.fsync_batch or time.monotonic() >= deadline):
+                self._flush(fds, records)
+                fds, records = [], []
+                deadline = None
+
+            if self._stop_event.is_set() and self._queue.empty():
+                break
+
+        if records:
+            self._flush(fds, records)
+        # Last retry for row deletions the database queue had no room for
+        self._evict([])
+
+    def get_stats(self) -> Dict[str, float]:
+        """Return writer counters: queue depth, drops, images written and evicted, deferred row deletions, fsync latency."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['stored_images'] = len(self.store.entries)
+        stats['stored_bytes'] = self.store.total_bytes
+        stats['pending_deletions'] = len(self._pending_deletions)
+        return stats
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Write out everything still queued and stop the writer thread."""
+        if self._stop_event.is_set():
+            return
+        self._stop_event.set()
+        try:
+            # Wakes an idle writer now instead of after fsync_interval
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass  # Not idle then, it checks the stop flag after each item
+        self._writer.join(timeout)
+        if self._writer.is_alive():
+            print(f"Evidence writer did not finish within {timeout}s, {self._queue.qsize()} images pending")
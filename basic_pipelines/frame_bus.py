@@ -0,0 +1,65 @@
+"""
+Wire format for frames sent from FramePublisher to the API over ZMQ.
+
+Each frame is a four-part multipart message:
+
+    [rendition topic][header][metadata JSON][JPEG bytes]
+
+The topic comes first so subscribers can pick renditions with ZMQ's prefix
+subscriptions, and the publisher (an XPUB socket) can see which renditions
+anyone is subscribed to and skip encoding the rest. The header is a fixed
+struct carrying the format version and a message kind, so either side can be
+upgraded without misparsing the other. Keeping the JPEG in its own part means
+it can be sent straight from the encoder's buffer and received as a
+memoryview, with no delimiter to scan for and no copies.
+
+While the scene is static the publisher sends heartbeats instead of frames:
+the same four parts, with kind KIND_HEARTBEAT and an empty JPEG part. They
+carry fresh metadata and mean "the last frame on this topic is still current".
+
+When the detector and the API share a host, the JPEG goes through the shared
+memory ring in frame_ring.py instead: kind KIND_RING_FRAME, with the last part
+holding a ring reference rather than the image, and notifications on the
+FRAME_IPC_ENDPOINT unix socket rather than TCP.
+"""
+import struct
+from typing import List, Optional, Tuple
+
+FRAME_BUS_VERSION = 2
+
+# Message kinds
+KIND_FRAME = 1
+KIND_HEARTBEAT = 2
+KIND_RING_FRAME = 3
+
+# Same-host transport, see frame_ring.py
+FRAME_IPC_ENDPOINT = 'ipc:///tmp/traffic_frames.ipc'
+FRAME_RING_NAME = 'traffic_frames'
+
+HEADER = struct.Struct('>BB')
+
+# Renditions from best to cheapest: (topic, scale, JPEG quality)
+RENDITIONS = [
+    (b'full', 1.0, 85),
+    (b'half', 0.5, 75),
+    (b'low', 0.5, 45),
+]
+RENDITION_NAMES = [topic.decode() for topic, _, _ in RENDITIONS]
+
+
+def build_header(kind: int = KIND_FRAME) -> bytes:
+    return HEADER.pack(FRAME_BUS_VERSION, kind)
+
+
+def parse_message(parts: List[memoryview]) -> Optional[Tuple[str, int, memoryview, memoryview]]:
+    """Split a received multipart message into (rendition, kind, metadata, jpeg).
+
+    Returns None for messages from an incompatible version or with an
+    unexpected number of parts.
+    """
+    if len(parts) != 4 or len(parts[1]) != HEADER.size:
+        return None
+    version, kind = HEADER.unpack(parts[1])
+    if version != FRAME_BUS_VERSION:
+        return None
+    return bytes(parts[0]).decode(), kind, parts[2], parts[3]
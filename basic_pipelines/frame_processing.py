@@ -4,8 +4,17 @@ from typing import Tuple, List, Dict, Optional
 import hailo
 from hailo_rpi_common import (
     get_numpy_from_buffer,
+    mapped_frame,
 )
 
+# One row per detection, filled once per frame by FrameProcessor.extract_detections
+DETECTION_DTYPE = np.dtype([
+    ('class_id', np.int32),
+    ('confidence', np.float32),
+    ('box', np.int64, 4),       # x1, y1, x2, y2 in pixels
+    ('center', np.int64, 2),
+])
+
 class FrameProcessor:
     """Handles frame processing, detection and visualization."""
     
@@ -15,35 +24,64 @@ class FrameProcessor:
             'vehicle_box': (50, 180, 0),
             'detection_count': (0, 255, 0)
         }
+        # Label -> class_id, filled in as labels first show up
+        self.class_ids = {}
         
     def setup_frame(self, buffer, format, width, height) -> Optional[np.ndarray]:
-        """Extract and prepare frame from buffer if available."""
+        """Extract and prepare an owned copy of the frame from buffer if available."""
         if buffer is None:
             return None
             
         frame = get_numpy_from_buffer(buffer, format, width, height)
         return frame
+
+    def mapped_frame(self, buffer, format, width, height):
+        """Context manager yielding a read-only view of the buffer, see hailo_rpi_common.mapped_frame."""
+        return mapped_frame(buffer, format, width, height)
     
-    def process_detections(self, buffer, width: int, height: int, zone_manager) -> Tuple[List, int]:
-        """Process detections from buffer and filter relevant vehicles."""
+    def class_id(self, label: str) -> int:
+        return self.class_ids.setdefault(label, len(self.class_ids))
+
+    def extract_detections(self, buffer, width: int, height: int) -> np.ndarray:
+        """Read every detection in the buffer's ROI into a DETECTION_DTYPE array.
+
+        This is the only place the Hailo objects are touched; each detection's
+        label, confidence and bbox are read exactly once.
+        """
         roi = hailo.get_roi_from_buffer(buffer)
-        detections = roi.get_objects_typed(hailo.HAILO_DETECTION)
-        detection_count = 0
-        relevant_detections = []
-        
-        for detection in detections:
-            if detection.get_label() == "car":
-                bbox = detection.get_bbox()
-                x1, y1 = int(bbox.xmin() * width), int(bbox.ymin() * height)
-                x2, y2 = int(bbox.xmax() * width), int(bbox.ymax() * height)
-                car_center = (x1 + (x2 - x1) // 2, y1 + (y2 - y1) // 2)
-                
-                if (zone_manager.is_in_zone(zone_manager.get_zone('green_zone'), car_center) or zone_manager.is_in_zone(zone_manager.get_zone('green_zone_2'), car_center) or 
-                    zone_manager.is_in_zone(zone_manager.get_zone('red_zone'), car_center)):
-                    relevant_detections.append(detection)
-                    detection_count += 1
+        hailo_detections = roi.get_objects_typed(hailo.HAILO_DETECTION)
+        detections = np.zeros(len(hailo_detections), dtype=DETECTION_DTYPE)
+        if not hailo_detections:
+            return detections
+
+        class_ids = []
+        confidences = []
+        corners = []
+        for detection in hailo_detections:
+            bbox = detection.get_bbox()
+            class_ids.append(self.class_id(detection.get_label()))
+            confidences.append(detection.get_confidence())
+            corners.append((bbox.xmin(), bbox.ymin(), bbox.xmax(), bbox.ymax()))
+
+        detections['class_id'] = class_ids
+        detections['confidence'] = confidences
+        boxes = (np.asarray(corners) * (width, height, width, height)).astype(np.int64)
+        detections['box'] = boxes
+        detections['center'] = boxes[:, :2] + (boxes[:, 2:] - boxes[:, :2]) // 2
+        return detections
+
+    def process_detections(self, detections: np.ndarray, zone_manager) -> Tuple[np.ndarray, int]:
+        """Filter extracted detections down to cars in the watched zones."""
+        cars = detections[detections['class_id'] == self.class_id("car")]
+        if not len(cars):
+            return cars, 0
+
+        # One label map lookup covers every car against every zone
+        watched = zone_manager.zone_mask('green_zone', 'green_zone_2', 'red_zone')
+        in_zone = (zone_manager.labels_at(cars['center']) & watched) != 0
+        relevant_detections = cars[in_zone]
         
-        return relevant_detections, detection_count
+        return relevant_detections, len(relevant_detections)
     
     def draw_vehicle_info(self, frame: np.ndarray, vehicle_id: int, bbox: Tuple[int, int, int, int], 
                          is_runner: bool = False, light_status: str = "Green Light") -> None:
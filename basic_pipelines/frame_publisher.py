@@ -1,10 +1,22 @@
 import json
 import socket
+import threading
 import time
 import cv2
 import psutil
 import zmq
 
+from frame_bus import (
+    FRAME_IPC_ENDPOINT,
+    FRAME_RING_NAME,
+    KIND_FRAME,
+    KIND_HEARTBEAT,
+    KIND_RING_FRAME,
+    RENDITIONS,
+    build_header,
+)
+from frame_ring import FrameRingWriter, default_ring_path
+
 def is_port_free(port):
     """Check if port is available"""
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
@@ -24,47 +36,292 @@ def cleanup_existing_process(port=5555):
             continue
     return False
 
+class ChangeGate:
+    """Decides whether a frame changed enough since the last published one to send it.
+
+    If not, a metadata heartbeat is sent at most every ``heartbeat_interval``.
+    """
+
+    FRAME = 'frame'
+    HEARTBEAT = 'heartbeat'
+    THUMBNAIL_SIZE = (64, 36)
+
+    def __init__(self, threshold=2.0, keyframe_interval=10.0, heartbeat_interval=1.0,
+                 volatile_keys=('frame_count', 'captured_at', 'run_rate', 'vehicles', 'detection_count')):
+        self.threshold = threshold
+        self.keyframe_interval = keyframe_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.volatile_keys = set(volatile_keys)
+        self._lock = threading.Lock()
+        self._reference = None
+        self._reference_metadata = None
+        self._last_keyframe = 0.0
+        self._last_heartbeat = 0.0
+        self._force = True
+
+    def force_keyframe(self):
+        with self._lock:
+            self._force = True
+
+    def decide(self, frame_rgb, metadata):
+        """Return FRAME, HEARTBEAT or None (send nothing) for this frame."""
+        small = cv2.resize(frame_rgb, self.THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+        thumbnail = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+        significant = {key: value for key, value in metadata.items() if key not in self.volatile_keys}
+        now = time.monotonic()
+        with self._lock:
+            changed = (
+                self._force
+                or self._reference is None
+                or significant != self._reference_metadata
+                or now - self._last_keyframe >= self.keyframe_interval
+                or cv2.absdiff(thumbnail, self._reference).mean() > self.threshold
+            )
+            if changed:
+                self._reference = thumbnail
+                self._reference_metadata = significant
+                self._last_keyframe = now
+                self._last_heartbeat = now
+                self._force = False
+                return self.FRAME
+            if now - self._last_heartbeat >= self.heartbeat_interval:
+                self._last_heartbeat = now
+                return self.HEARTBEAT
+            return None
+
+
 class FramePublisher:
-    def __init__(self, port=5555):
-        # Clean up existing process and wait for port to be free
-        if cleanup_existing_process(port):
-            print("Waiting for port to be freed...")
-            time.sleep(2)  # Wait for OS to clean up the port
-            
-        # Verify port is free
-        if not is_port_free(port):
-            raise Exception(f"Port {port} is still in use after cleanup attempt")
+    """Publishes frames and metadata to the API over ZMQ, encoding JPEGs on a worker pool.
+
+    Only renditions with subscribers are encoded; a ChangeGate turns static scenes into heartbeats.
+    """
+
+    def __init__(self, port=5555, encoder_threads=2, change_threshold=None,
+                 keyframe_interval=10.0, heartbeat_interval=1.0, transport='tcp',
+                 ring_slots=16, ring_slot_size=512 * 1024):
+        self.ring = None
+        if transport == 'shm':
+            # ZMQ replaces a stale ipc socket file on bind, nothing to clean up
+            endpoint = FRAME_IPC_ENDPOINT
+            self.ring = FrameRingWriter(default_ring_path(FRAME_RING_NAME), ring_slots, ring_slot_size)
+        else:
+            # Clean up existing process and wait for port to be free
+            if cleanup_existing_process(port):
+                print("Waiting for port to be freed...")
+                time.sleep(2)  # Wait for OS to clean up the port
+
+            # Verify port is free
+            if not is_port_free(port):
+                raise Exception(f"Port {port} is still in use after cleanup attempt")
+            endpoint = f"tcp://*:{port}"
             
         self.context = zmq.Context()
-        self.socket = self.context.socket(zmq.PUB)
+        self.socket = self.context.socket(zmq.XPUB)
         self.socket.setsockopt(zmq.SNDHWM, 2)
         self.socket.setsockopt(zmq.LINGER, 0)  # Don't wait when closing
-        self.socket.bind(f"tcp://*:{port}")
-        print(f"Successfully bound to port {port}")
+        self.socket.bind(endpoint)
+        print(f"Successfully bound to {endpoint}")
+        self.frame_header = build_header(KIND_FRAME)
+        self.ring_header = build_header(KIND_RING_FRAME)
+        self.heartbeat_header = build_header(KIND_HEARTBEAT)
+        self.gate = None
+        if change_threshold is not None:
+            self.gate = ChangeGate(change_threshold, keyframe_interval, heartbeat_interval)
+        # Rendition topics with at least one subscriber
+        self._subscriptions = set()
+
+        # Latest-frame-wins slot shared with the encoder workers
+        self._slot = None
+        self._slot_cond = threading.Condition()
+        self._next_seq = 0
+        self._running = True
+        # ZMQ sockets are not thread safe, sends are serialized
+        self._send_lock = threading.Lock()
+        self._last_sent_seq = -1
+        self.stats = {
+            'submitted': 0,
+            'dropped_pending': 0,
+            'dropped_stale': 0,
+            'published': 0,
+            'heartbeats': 0,
+            'suppressed_static': 0,
+            'skipped_no_subscribers': 0,
+            'sent_inline': 0,
+            'encodes': 0,
+            'encode_ms_total': 0.0,
+        }
+        self._workers = [
+            threading.Thread(target=self._encode_loop, name=f'jpeg-encoder-{i}', daemon=True)
+            for i in range(encoder_threads)
+        ]
+        for worker in self._workers:
+            worker.start()
     
     def publish_frame_with_metadata(self, frame_rgb, metadata):
-        """Publish frame along with metadata."""
-        try:
-            
-            if frame_rgb is not None and metadata is not None:
-                metadata_json = json.dumps(metadata)
-                encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), 85]
-                _, buffer = cv2.imencode('.jpg', frame_rgb, encode_params)
-                metadata_bytes = metadata_json.encode('utf-8')
-                delimiter = b':::'
-                self.socket.send(metadata_bytes + delimiter + buffer.tobytes(), zmq.NOBLOCK)
-        except zmq.error.ZMQError as e:
-            print(f"ZMQ error during publish: {e}")
-        except Exception as e:
-            print(f"Error during publish: {e}")
+        """Hand a frame to the encoder pool and return immediately.
+
+        The frame must not be modified by the caller afterwards.
+        """
+        if frame_rgb is None or metadata is None:
+            return
+        with self._slot_cond:
+            if self._slot is not None:
+                self.stats['dropped_pending'] += 1
+            self._slot = (self._next_seq, frame_rgb, metadata)
+            self._next_seq += 1
+            self.stats['submitted'] += 1
+            self._slot_cond.notify()
+
+    def _encode_loop(self):
+        while True:
+            with self._slot_cond:
+                while self._slot is None and self._running:
+                    self._slot_cond.wait()
+                if not self._running:
+                    return
+                seq, frame_rgb, metadata = self._slot
+                self._slot = None
+            try:
+                renditions = self.active_renditions()
+                if not renditions:
+                    with self._send_lock:
+                        self.stats['skipped_no_subscribers'] += 1
+                    continue
+                decision = self.gate.decide(frame_rgb, metadata) if self.gate else ChangeGate.FRAME
+                if decision is None:
+                    with self._send_lock:
+                        self.stats['suppressed_static'] += 1
+                    continue
+                metadata_bytes = json.dumps(metadata).encode('utf-8')
+                if decision == ChangeGate.HEARTBEAT:
+                    self._send_heartbeat(seq, metadata_bytes, renditions)
+                else:
+                    encoded = self._encode_renditions(frame_rgb, renditions)
+                    self._send(seq, metadata_bytes, encoded)
+            except Exception as e:
+                print(f"Error during publish: {e}")
+
+    def active_renditions(self):
+        """Drain pending (un)subscribe notifications and return what is wanted."""
+        with self._send_lock:
+            while True:
+                try:
+                    event = self.socket.recv(zmq.NOBLOCK)
+                except zmq.error.ZMQError:
+                    # zmq.Again, nothing pending
+                    break
+                # XPUB reports b'\x01' + topic on the first subscription to a
+                # topic and b'\x00' + topic once its last subscriber leaves
+                if event[:1] == b'\x01':
+                    self._subscriptions.add(event[1:])
+                    # A new viewer has nothing to show until the next frame
+                    if self.gate:
+                        self.gate.force_keyframe()
+                elif event[:1] == b'\x00':
+                    self._subscriptions.discard(event[1:])
+            subscriptions = set(self._subscriptions)
+        # An empty prefix subscription matches every rendition
+        return [
+            rendition for rendition in RENDITIONS
+            if any(rendition[0].startswith(topic) for topic in subscriptions)
+        ]
+
+    def _encode_renditions(self, frame_rgb, renditions):
+        scaled = {1.0: frame_rgb}
+        encoded = []
+        for topic, scale, quality in renditions:
+            start = time.perf_counter()
+            if scale not in scaled:
+                scaled[scale] = cv2.resize(frame_rgb, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            _, buffer = cv2.imencode('.jpg', scaled[scale], [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+            encoded.append((topic, buffer, (time.perf_counter() - start) * 1000))
+        return encoded
+
+    def _send(self, seq, metadata_bytes, encoded):
+        with self._send_lock:
+            for _, _, encode_ms in encoded:
+                self.stats['encodes'] += 1
+                self.stats['encode_ms_total'] += encode_ms
+            # Another worker already published a newer frame
+            if seq < self._last_sent_seq:
+                self.stats['dropped_stale'] += 1
+                return
+            self._last_sent_seq = seq
+            try:
+                for topic, buffer, _ in encoded:
+                    self.socket.send_multipart(
+                        self._frame_parts(topic, metadata_bytes, buffer), zmq.NOBLOCK, copy=False
+                    )
+                self.stats['published'] += 1
+            except zmq.error.ZMQError as e:
+                print(f"ZMQ error during publish: {e}")
+
+    def _frame_parts(self, topic, metadata_bytes, buffer):
+        """Build the message for one encoded frame. Called with the send lock held."""
+        if self.ring is not None:
+            ref = self.ring.write(buffer)
+            if ref is not None:
+                return [topic, self.ring_header, metadata_bytes, ref]
+        # TCP transport, or too big for a ring slot: the encoded buffer goes
+        # onto the socket as-is, see frame_bus.py
+        self.stats['sent_inline'] += 1
+        return [topic, self.frame_header, metadata_bytes, buffer]
+
+    def publish_encoded(self, topic, jpeg, metadata):
+        """Publish a JPEG that was already encoded elsewhere, e.g. by GStreamer.
+
+        Not change gated: there is no raw frame to compare, so every JPEG is
+        sent. ``jpeg`` may be any buffer-like object.
+        """
+        metadata_bytes = json.dumps(metadata).encode('utf-8')
+        with self._send_lock:
+            try:
+                self.socket.send_multipart(
+                    self._frame_parts(topic, metadata_bytes, jpeg), zmq.NOBLOCK, copy=False
+                )
+                self.stats['published'] += 1
+            except zmq.error.ZMQError as e:
+                print(f"ZMQ error during publish: {e}")
+
+    def _send_heartbeat(self, seq, metadata_bytes, renditions):
+        with self._send_lock:
+            if seq < self._last_sent_seq:
+                self.stats['dropped_stale'] += 1
+                return
+            self._last_sent_seq = seq
+            try:
+                for topic, _, _ in renditions:
+                    self.socket.send_multipart(
+                        [topic, self.heartbeat_header, metadata_bytes, b''], zmq.NOBLOCK
+                    )
+                self.stats['heartbeats'] += 1
+            except zmq.error.ZMQError as e:
+                print(f"ZMQ error during heartbeat: {e}")
+
+    def get_stats(self):
+        """Return hand-off, drop, gating and encode-time counters."""
+        with self._send_lock:
+            stats = dict(self.stats)
+        stats['avg_encode_ms'] = stats['encode_ms_total'] / stats['encodes'] if stats['encodes'] else 0.0
+        return stats
     
     def close(self):
-        """Clean up ZMQ resources."""
-        if hasattr(self, 'socket'):
-            self.socket.close()
-        if hasattr(self, 'context'):
-            self.context.term()
+        """Stop the encoder workers and clean up ZMQ resources."""
+        if hasattr(self, '_slot_cond'):
+            with self._slot_cond:
+                self._running = False
+                self._slot_cond.notify_all()
+            for worker in self._workers:
+                worker.join(timeout=1.0)
+        with getattr(self, '_send_lock', threading.Lock()):
+            if hasattr(self, 'socket'):
+                self.socket.close()
+            if hasattr(self, 'context'):
+                self.context.term()
+            if getattr(self, 'ring', None) is not None:
+                self.ring.close()
+                self.ring = None
 
     def __del__(self):
         """Ensure cleanup on object destruction"""
-        self.close()
\ No newline at end of file
+        self.close()
@@ -0,0 +1,167 @@
+"""
+Shared-memory ring of encoded frames between the detector and the API.
+
+The detector copies each JPEG into the next slot of a fixed-size ring in a
+memory-mapped file (under /dev/shm where available) and only sends a small
+reference - (generation, slot, sequence) - over ZMQ. Any number of readers
+map the same file and copy the frame out, so no frame bytes go through a
+socket.
+
+Each slot starts with a sequence number used as a seqlock: the writer sets it
+odd while copying and to the new even value once done. A reader checks the
+number before and after copying and drops the frame if it changed, which
+means the writer lapped it. Readers never take a lock or write to the ring.
+The notification is sent after the write completes, and it goes through a
+socket, which in practice orders the writes before the reader sees the
+reference; the re-check covers slots that get overwritten while being read.
+
+The generation changes every time the detector creates the ring, so readers
+notice a restart and re-map the new file.
+"""
+import mmap
+import os
+import struct
+import tempfile
+import time
+from typing import Optional
+
+RING_MAGIC = b'TFR1'
+# magic, slot count, slot size, generation
+RING_HEADER = struct.Struct('<4sIIQ')
+# sequence, payload length
+SLOT_HEADER = struct.Struct('<QI')
+# generation, slot index, sequence; this is what gets sent over ZMQ
+RING_REF = struct.Struct('<QIQ')
+
+
+def default_ring_path(name: str) -> str:
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, name)
+
+
+class FrameRingWriter:
+    """Single-writer side of the ring. Not thread safe, callers serialize writes."""
+
+    def __init__(self, path: str, slot_count: int = 16, slot_size: int = 512 * 1024):
+        self.path = path
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self.generation = time.time_ns()
+        self._next_slot = 0
+        self._seq = 0
+
+        size = RING_HEADER.size + slot_count * (SLOT_HEADER.size + slot_size)
+        # Built under a temporary name and renamed into place, so readers
+        # never map a half-initialised ring
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_CREAT | os.O_TRUNC | os.O_RDWR, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        RING_HEADER.pack_into(self._map, 0, RING_MAGIC, slot_count, slot_size, self.generation)
+        os.replace(tmp_path, path)
+        print(f"Frame ring at {path}: {slot_count} slots of {slot_size // 1024} KiB")
+
+    def _offset(self, index: int) -> int:
+        return RING_HEADER.size + index * (SLOT_HEADER.size + self.slot_size)
+
+    def write(self, data) -> Optional[bytes]:
+        """Copy ``data`` into the next slot and return its reference.
+
+        Returns None if it doesn't fit in a slot; the caller should send it
+        inline instead.
+        """
+        view = memoryview(data).cast('B')
+        length = view.nbytes
+        if length > self.slot_size:
+            return None
+        index = self._next_slot
+        self._next_slot = (index + 1) % self.slot_count
+        self._seq += 1
+        seq = 2 * self._seq
+        offset = self._offset(index)
+        start = offset + SLOT_HEADER.size
+
+        SLOT_HEADER.pack_into(self._map, offset, seq - 1, 0)
+        self._map[start:start + length] = view
+        SLOT_HEADER.pack_into(self._map, offset, seq, length)
+        return RING_REF.pack(self.generation, index, seq)
+
+    def close(self, unlink: bool = True) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if unlink:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+
+class FrameRingReader:
+    """Lock-free reader. Maps the ring lazily and re-maps it when the writer restarts."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.generation = None
+        self._map = None
+        self.stats = {'read': 0, 'overwritten': 0, 'unavailable': 0, 'remaps': 0}
+
+    def _remap(self) -> None:
+        self.close()
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return
+        try:
+            size = os.fstat(fd).st_size
+            if size < RING_HEADER.size:
+                return
+            ring_map = mmap.mmap(fd, size, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+        magic, self.slot_count, self.slot_size, generation = RING_HEADER.unpack_from(ring_map, 0)
+        if magic != RING_MAGIC:
+            ring_map.close()
+            return
+        self._map = ring_map
+        self.generation = generation
+        self.stats['remaps'] += 1
+
+    def read(self, ref) -> Optional[bytes]:
+        """Copy out the frame a notification refers to.
+
+        Returns None if the ring isn't there, belongs to another writer
+        generation, or the slot was overwritten before it could be read.
+        """
+        generation, index, seq = RING_REF.unpack(ref)
+        if generation != self.generation:
+            self._remap()
+            if generation != self.generation:
+                self.stats['unavailable'] += 1
+                return None
+        if index >= self.slot_count:
+            self.stats['unavailable'] += 1
+            return None
+
+        offset = RING_HEADER.size + index * (SLOT_HEADER.size + self.slot_size)
+        before, length = SLOT_HEADER.unpack_from(self._map, offset)
+        if before != seq:
+            self.stats['overwritten'] += 1
+            return None
+        start = offset + SLOT_HEADER.size
+        data = self._map[start:start + length]
+        after, _ = SLOT_HEADER.unpack_from(self._map, offset)
+        if after != seq:
+            self.stats['overwritten'] += 1
+            return None
+        self.stats['read'] += 1
+        return data
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self.generation = None
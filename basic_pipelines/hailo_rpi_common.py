@@ -13,6 +13,7 @@ import cv2
 import time
 import signal
 import subprocess
+from contextlib import contextmanager
 
 # Try to import hailo python module
 try:
@@ -33,6 +34,7 @@ class app_callback_class:
     def __init__(self):
         self.frame_count = 0
         self.use_frame = True
+        self.show_frames = False
         self.frame_queue = multiprocessing.Queue(maxsize=3)
         self.running = True
 
@@ -108,57 +110,10 @@ def get_caps_from_pad(pad: Gst.Pad):
         return None, None, None
 
 def display_user_data_frame(user_data: app_callback_class):
-    frame_count = 0 
-
-
-
     while user_data.running:
         frame = user_data.get_frame()
 
         if frame is not None:
-            if frame_count % 500 == 0:
-                user_data.zone_manager.update_zones()
-                
-            frame_count += 1  # Increment frame count
-            
-            zone_vertices_light = user_data.zone_manager.get_zone('traffic_zone')
-            # Convert the frame to HSV color space
-            hsv_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-
-            lower_red1 = np.array([0, 150, 150])    # Increased S and V minimums
-            upper_red1 = np.array([5, 255, 255])    # Reduced H range from 10 to 5
-
-            # Second red range (around H=180)
-            lower_red2 = np.array([175, 150, 150])  # Increased S and V minimums
-            upper_red2 = np.array([180, 255, 255])  # Narrowed H range
-
-
-            
-            # Create masks for both red ranges
-            mask1 = cv2.inRange(hsv_frame, lower_red1, upper_red1)
-            mask2 = cv2.inRange(hsv_frame, lower_red2, upper_red2)
-
-            
-            
-            # Combine the two red masks
-            color_mask = cv2.bitwise_or(mask1, mask2)
-            
-            # Create and apply the zone mask
-            zone_mask = np.zeros(frame.shape[:2], dtype=np.uint8)
-            cv2.fillPoly(zone_mask, [zone_vertices_light], 255)
-            
-            # Combine zone and color masks
-            combined_mask = cv2.bitwise_and(color_mask, zone_mask)
-            
-            # Count red pixels in the zone
-            pixel_count = cv2.countNonZero(combined_mask)
-            user_data.pixel_count.value = pixel_count
-            
-            # Optional: Visualize the detection zone and mask for debugging
-            # Uncomment these lines if you want to see the detection in action
-            # cv2.imshow("Red Mask", color_mask)
-            # cv2.imshow("Combined Mask", combined_mask)
-            
             cv2.imshow("User Frame", frame)
 
         # Wait for 1 ms between frames and allow for 'q' key to exit
@@ -177,6 +132,7 @@ def get_default_parser():
         Defaults to example video resources/detection0.mp4"
     )
     parser.add_argument("--use-frame", "-u", action="store_true", help="Use frame from the callback function")
+    parser.add_argument("--show-frame", action="store_true", help="Show the callback's frames in a window (needs a display)")
     parser.add_argument("--show-fps", "-f", action="store_true", help="Print FPS on sink")
     parser.add_argument(
             "--arch",
@@ -374,6 +330,50 @@ def DISPLAY_PIPELINE(video_sink='xvimagesink', sync='true', show_fps='false', na
 
     return display_pipeline
 
+def JPEG_STREAM_PIPELINE(renditions, video_width=640, video_height=640, overlay=True, name='web_stream'):
+    """
+    Creates a GStreamer pipeline string that JPEG-encodes the video for the web stream.
+    Meant to hang off a tee after the user callback. Each rendition gets its own
+    scaler, jpegenc and appsink, behind a valve so it can be switched off while
+    nobody is watching it.
+
+    Args:
+        renditions (list): (topic, scale, quality) tuples, see frame_bus.RENDITIONS.
+        video_width (int, optional): The width of the incoming video. Defaults to 640.
+        video_height (int, optional): The height of the incoming video. Defaults to 640.
+        overlay (bool, optional): Whether to draw detections with hailooverlay. Defaults to True.
+        name (str, optional): The prefix name for the pipeline elements. Defaults to 'web_stream'.
+
+    Returns:
+        str: A string representing the GStreamer pipeline for the web stream. The
+        appsinks are named {name}_{topic}_sink and the valves {name}_{topic}_valve.
+    """
+    # Never hold up inference, drop frames when the encoders fall behind
+    jpeg_stream_pipeline = f'{QUEUE(name=f"{name}_q", max_size_buffers=1, leaky="downstream")} ! '
+    if overlay:
+        jpeg_stream_pipeline += f'hailooverlay name={name}_hailooverlay ! '
+    jpeg_stream_pipeline += (
+        f'videoconvert name={name}_videoconvert n-threads=2 qos=false ! '
+        f'video/x-raw,format=I420 ! '
+        f'tee name={name}_tee '
+    )
+    for topic, scale, quality in renditions:
+        rendition = topic.decode() if isinstance(topic, bytes) else topic
+        # I420 needs even dimensions
+        width = int(video_width * scale) // 2 * 2
+        height = int(video_height * scale) // 2 * 2
+        jpeg_stream_pipeline += (
+            f'{name}_tee. ! '
+            f'{QUEUE(name=f"{name}_{rendition}_q", max_size_buffers=1, leaky="downstream")} ! '
+            f'valve name={name}_{rendition}_valve drop=true ! '
+            f'videoscale name={name}_{rendition}_videoscale ! '
+            f'video/x-raw,width={width},height={height} ! '
+            f'jpegenc name={name}_{rendition}_jpegenc quality={quality} ! '
+            f'appsink name={name}_{rendition}_sink emit-signals=true max-buffers=1 drop=true sync=false '
+        )
+
+    return jpeg_stream_pipeline
+
 def USER_CALLBACK_PIPELINE(name='identity_callback'):
     """
     Creates a GStreamer pipeline string for the user callback element.
@@ -429,6 +429,7 @@ class GStreamerApp:
 
         # Set user data parameters
         user_data.use_frame = self.options_menu.use_frame
+        user_data.show_frames = self.options_menu.use_frame and self.options_menu.show_frame
 
         self.sync = "false" if (self.options_menu.disable_sync or self.source_type != "file") else "true"
         self.show_fps = "true" if self.options_menu.show_fps else "false"
@@ -538,7 +539,7 @@ class GStreamerApp:
         disable_qos(self.pipeline)
 
         # Start a subprocess to run the display_user_data_frame function
-        if self.options_menu.use_frame:
+        if self.user_data.show_frames:
             display_process = multiprocessing.Process(target=display_user_data_frame, args=(self.user_data,))
             display_process.start()
 
@@ -555,7 +556,7 @@ class GStreamerApp:
         # Clean up
         self.user_data.running = False
         self.pipeline.set_state(Gst.State.NULL)
-        if self.options_menu.use_frame:
+        if self.user_data.show_frames:
             display_process.terminate()
             display_process.join()
 
@@ -563,19 +564,23 @@ class GStreamerApp:
 # Functions used to get numpy arrays from GStreamer buffers
 # ---------------------------------------------------------
 
-def handle_rgb(map_info, width, height):
+def handle_rgb(map_info, width, height, copy=True):
     # The copy() method is used to create a copy of the numpy array. This is necessary because the original numpy array is created from buffer data, and it does not own the data it represents. Instead, it's just a view of the buffer's data.
-    return np.ndarray(shape=(height, width, 3), dtype=np.uint8, buffer=map_info.data).copy()
+    frame = np.ndarray(shape=(height, width, 3), dtype=np.uint8, buffer=map_info.data)
+    return frame.copy() if copy else frame
 
-def handle_nv12(map_info, width, height):
+def handle_nv12(map_info, width, height, copy=True):
     y_plane_size = width * height
     uv_plane_size = width * height // 2
-    y_plane = np.ndarray(shape=(height, width), dtype=np.uint8, buffer=map_info.data[:y_plane_size]).copy()
-    uv_plane = np.ndarray(shape=(height//2, width//2, 2), dtype=np.uint8, buffer=map_info.data[y_plane_size:]).copy()
+    y_plane = np.ndarray(shape=(height, width), dtype=np.uint8, buffer=map_info.data[:y_plane_size])
+    uv_plane = np.ndarray(shape=(height//2, width//2, 2), dtype=np.uint8, buffer=map_info.data[y_plane_size:])
+    if copy:
+        return y_plane.copy(), uv_plane.copy()
     return y_plane, uv_plane
 
-def handle_yuyv(map_info, width, height):
-    return np.ndarray(shape=(height, width, 2), dtype=np.uint8, buffer=map_info.data).copy()
+def handle_yuyv(map_info, width, height, copy=True):
+    frame = np.ndarray(shape=(height, width, 2), dtype=np.uint8, buffer=map_info.data)
+    return frame.copy() if copy else frame
 
 FORMAT_HANDLERS = {
     'RGB': handle_rgb,
@@ -610,6 +615,39 @@ def get_numpy_from_buffer(buffer, format, width, height):
     finally:
         buffer.unmap(map_info)
 
+@contextmanager
+def mapped_frame(buffer, format, width, height):
+    """
+    Maps a GstBuffer and yields a read-only numpy view of it, without copying.
+
+    The view points straight into the buffer's memory and is only valid inside
+    the with block; the buffer is unmapped on exit. Callers that keep the frame
+    past that, or want to draw on it, must take a .copy() themselves.
+
+    Args:
+        buffer (GstBuffer): The GStreamer Buffer to map.
+        format (str): The video format ('RGB', 'NV12', 'YUYV', etc.).
+        width (int): The width of the video frame.
+        height (int): The height of the video frame.
+
+    Yields:
+        np.ndarray: A read-only view of the buffer's data, or a tuple of views for certain formats.
+    """
+    handler = FORMAT_HANDLERS.get(format)
+    if handler is None:
+        raise ValueError(f"Unsupported format: {format}")
+    success, map_info = buffer.map(Gst.MapFlags.READ)
+    if not success:
+        raise ValueError("Buffer mapping failed")
+
+    try:
+        frame = handler(map_info, width, height, copy=False)
+        for array in (frame if isinstance(frame, tuple) else (frame,)):
+            array.flags.writeable = False
+        yield frame
+    finally:
+        buffer.unmap(map_info)
+
 # ---------------------------------------------------------
 # Useful functions for working with GStreamer
 # ---------------------------------------------------------
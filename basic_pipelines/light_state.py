@@ -0,0 +1,96 @@
+import cv2
+import numpy as np
+from typing import Optional, Sequence, Tuple
+
+HSVRange = Tuple[Tuple[int, int, int], Tuple[int, int, int]]
+
+RED_LIGHT = "Red Light"
+GREEN_LIGHT = "Green Light"
+
+
+class LightStateEstimator:
+    """Estimates the traffic light state from the pixels inside the light's zone.
+
+    Only the bounding box of the zone is cropped out and converted to HSV, and
+    the zone mask for that crop is cached until the zone changes. Pixels inside
+    any of ``color_ranges`` count as lit red.
+
+    The state has hysteresis: ``on_pixels`` or more red pixels count as a red
+    reading, ``off_pixels`` or fewer as green, and anything in between keeps
+    the current state. It only flips after ``debounce_frames`` consecutive
+    readings for the other state; above 1 that ignores single-frame glitches.
+    """
+
+    def __init__(self, color_ranges: Sequence[HSVRange], on_pixels: int = 1, off_pixels: int = 0,
+                 debounce_frames: int = 1, color_conversion: int = cv2.COLOR_RGB2HSV):
+        self.color_ranges = [
+            (np.array(lower, np.uint8), np.array(upper, np.uint8)) for lower, upper in color_ranges
+        ]
+        self.on_pixels = on_pixels
+        self.off_pixels = off_pixels
+        self.debounce_frames = debounce_frames
+        self.color_conversion = color_conversion
+
+        self.state = GREEN_LIGHT
+        self.pixel_count = 0
+        self._pending = 0
+        self._zone = None
+        self._frame_shape = None
+        self._rect = None
+        self._mask = None
+
+    @property
+    def is_red(self) -> bool:
+        return self.state == RED_LIGHT
+
+    def _prepare(self, zone: np.ndarray, frame_shape: Tuple[int, ...]) -> None:
+        """Cache the crop rectangle and the zone mask within it."""
+        height, width = frame_shape[:2]
+        x, y, w, h = cv2.boundingRect(zone.reshape(-1, 1, 2).astype(np.int32))
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, width), min(y + h, height)
+        self._zone = zone
+        self._frame_shape = frame_shape
+        if x1 <= x0 or y1 <= y0:
+            self._rect = None
+            self._mask = None
+            return
+        self._rect = (x0, y0, x1, y1)
+        self._mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        cv2.fillPoly(self._mask, [zone.reshape(-1, 1, 2).astype(np.int32) - (x0, y0)], 255)
+
+    def _count_red(self, frame: np.ndarray) -> int:
+        x0, y0, x1, y1 = self._rect
+        hsv = cv2.cvtColor(frame[y0:y1, x0:x1], self.color_conversion)
+        red: Optional[np.ndarray] = None
+        for lower, upper in self.color_ranges:
+            in_range = cv2.inRange(hsv, lower, upper)
+            red = in_range if red is None else cv2.bitwise_or(red, in_range)
+        if red is None:
+            return 0
+        return cv2.countNonZero(cv2.bitwise_and(red, self._mask))
+
+    def update(self, frame: np.ndarray, zone: np.ndarray) -> str:
+        """Feed one frame and return the (debounced) light state."""
+        # ZoneManager swaps in a new array when zones are reloaded
+        if zone is not self._zone or frame.shape != self._frame_shape:
+            self._prepare(zone, frame.shape)
+        if self._rect is None:
+            return self.state
+
+        self.pixel_count = self._count_red(frame)
+        if self.pixel_count >= self.on_pixels:
+            reading = RED_LIGHT
+        elif self.pixel_count <= self.off_pixels:
+            reading = GREEN_LIGHT
+        else:
+            reading = self.state
+
+        if reading == self.state:
+            self._pending = 0
+        else:
+            self._pending += 1
+            if self._pending >= self.debounce_frames:
+                self.state = reading
+                self._pending = 0
+        return self.state
@@ -0,0 +1,81 @@
+"""
+Online migration of traffic.db to the current schema version.
+
+Rows recorded before the epoch ``ts`` column existed only carry a local-time
+text ``timestamp``. This converts them in small chunks, each in its own short
+write transaction, so the detector's writer thread keeps committing in between
+and nothing needs to be stopped. It is safe to interrupt and re-run.
+
+    python basic_pipelines/migrate_db.py --db traffic.db
+"""
+import argparse
+import sqlite3
+import time
+
+from database_utils import SCHEMA_VERSION, get_schema_version, init_schema
+
+
+def migrate_timestamps(conn: sqlite3.Connection, chunk_size: int = 2000, pause: float = 0.05) -> int:
+    """Fill ``ts`` for legacy rows, walking the primary key in chunks."""
+    converted = 0
+    last_id = 0
+    # Rows written after this point already carry ts, no need to chase them
+    max_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM vehicle_tracking').fetchone()[0]
+    while last_id < max_id:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('''
+                SELECT MAX(id) FROM (
+                    SELECT id FROM vehicle_tracking WHERE id > ? AND id <= ? ORDER BY id LIMIT ?
+                )
+            ''', (last_id, max_id, chunk_size)).fetchone()
+            chunk_end = row[0]
+            if chunk_end is None:
+                conn.commit()
+                break
+            # The stored text is local time, the 'utc' modifier converts it
+            cursor = conn.execute('''
+                UPDATE vehicle_tracking
+                SET ts = CAST(strftime('%s', timestamp, 'utc') AS INTEGER)
+                WHERE id > ? AND id <= ? AND ts IS NULL AND timestamp IS NOT NULL
+            ''', (last_id, chunk_end))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        converted += cursor.rowcount
+        last_id = chunk_end
+        print(f"Converted {converted} rows (up to id {last_id})")
+        # Give the detector's writer a window to take the lock
+        time.sleep(pause)
+    return converted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate traffic.db to the current schema")
+    parser.add_argument("--db", default="traffic.db", help="Path to the SQLite database")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="Rows converted per transaction")
+    parser.add_argument("--pause", type=float, default=0.05, help="Seconds to sleep between chunks")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    try:
+        version = get_schema_version(conn)
+        if version >= SCHEMA_VERSION:
+            print(f"{args.db} is already at schema version {version}")
+            return
+        # Adds the ts column and indexes if the detector hasn't already
+        init_schema(conn)
+        start = time.monotonic()
+        converted = migrate_timestamps(conn, args.chunk_size, args.pause)
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        conn.execute('ANALYZE vehicle_tracking')
+        conn.commit()
+        print(f"Migrated {converted} rows to schema version {SCHEMA_VERSION} in {time.monotonic() - start:.1f}s")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Retention and archival for traffic.db.
+
+Raw events older than the retention window are moved out of vehicle_tracking
+into one partition table per local month, keeping the hot table and its
+indexes small. Partitions older than a few months are written out as gzipped
+NDJSON files and dropped. The hour and day rollups are never pruned, so the
+dashboard keeps its full history; the minute tier is pruned along with the raw
+events. Freed pages are returned to the filesystem with incremental vacuum.
+
+The policy normally runs on the detector's database writer thread (see
+``DatabaseManager.add_maintenance_task``). The one-off switch to incremental
+auto-vacuum rewrites the whole file, so it is done by ``prepare`` before the
+writer starts instead. It can also be run by hand:
+
+    python basic_pipelines/retention.py --db traffic.db
+    python basic_pipelines/retention.py --db traffic.db --restore archive/vehicle_tracking_2024_11.ndjson.gz
+"""
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Union
+
+from database_utils import (
+    PARTITION_PREFIX,
+    ROLLUP_TABLES,
+    create_partition,
+    list_partitions,
+    partition_name,
+)
+
+EVENT_COLUMNS = ('id', 'timestamp', 'vehicle_count', 'is_red_light_runner', 'ts')
+
+# Epoch of a legacy row from its local-time text, for rows migrate_db.py hasn't reached
+_LEGACY_EPOCH_SQL = "CAST(strftime('%s', timestamp, 'utc') AS INTEGER)"
+
+
+def ensure_incremental_vacuum(conn: sqlite3.Connection) -> None:
+    """Switch the database to incremental auto-vacuum, once."""
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        return
+    print("Enabling incremental auto-vacuum, this rewrites the database once...")
+    conn.commit()
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    # The new mode only takes effect after a full VACUUM
+    conn.execute('VACUUM')
+
+
+def partition_old_events(conn: sqlite3.Connection, cutoff: int, chunk_size: int = 2000) -> int:
+    """Move events from before ``cutoff`` into their monthly partitions.
+
+    Legacy rows without ``ts`` are dated from their ``timestamp`` text, and
+    get ``ts`` filled in on the way into the partition.
+    """
+    moved = 0
+    selects = [
+        f"SELECT {', '.join(EVENT_COLUMNS)} FROM vehicle_tracking WHERE ts < ? ORDER BY ts LIMIT ?",
+        f"""SELECT {', '.join(EVENT_COLUMNS[:-1])}, {_LEGACY_EPOCH_SQL} AS epoch FROM vehicle_tracking
+            WHERE ts IS NULL AND epoch < ? ORDER BY epoch LIMIT ?""",
+    ]
+    for select in selects:
+        while True:
+            rows = conn.execute(select, (cutoff, chunk_size)).fetchall()
+            if not rows:
+                break
+            by_partition = defaultdict(list)
+            for row in rows:
+                by_partition[partition_name(datetime.fromtimestamp(row[4]))].append(row)
+            with conn:
+                for table, partition_rows in by_partition.items():
+                    create_partition(conn, table)
+                    conn.executemany(f'''
+                        INSERT OR REPLACE INTO {table} ({', '.join(EVENT_COLUMNS)})
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', partition_rows)
+                conn.executemany('DELETE FROM vehicle_tracking WHERE id = ?', [(row[0],) for row in rows])
+            moved += len(rows)
+    return moved
+
+
+def archive_partition(conn: sqlite3.Connection, table: str, archive_dir: Union[str, Path]) -> Path:
+    """Write a partition out as gzipped NDJSON, then drop it."""
+    archive_dir = Path(archive_dir)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    path = archive_dir / f"{table}.ndjson.gz"
+    tmp_path = path.with_name(path.name + '.tmp')
+
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as archive:
+        cursor = conn.execute(f"SELECT {', '.join(EVENT_COLUMNS)} FROM {table} ORDER BY ts, id")
+        for row in cursor:
+            archive.write(json.dumps(dict(zip(EVENT_COLUMNS, row))) + '\n')
+    with open(tmp_path, 'rb') as archive:
+        os.fsync(archive.fileno())
+    os.replace(tmp_path, path)
+
+    with conn:
+        conn.execute(f"DROP TABLE {table}")
+    return path
+
+
+def restore_archive(conn: sqlite3.Connection, path: Union[str, Path]) -> str:
+    """Load an archive file back into its partition table."""
+    table = Path(path).name.split('.')[0]
+    if not table.startswith(PARTITION_PREFIX):
+        raise ValueError(f"{path} is not a vehicle_tracking archive")
+    with gzip.open(path, 'rt', encoding='utf-8') as archive, conn:
+        create_partition(conn, table)
+        conn.executemany(f'''
+            INSERT OR REPLACE INTO {table} ({', '.join(EVENT_COLUMNS)})
+            VALUES (?, ?, ?, ?, ?)
+        ''', (tuple(row[column] for column in EVENT_COLUMNS) for row in map(json.loads, archive)))
+    return table
+
+
+class RetentionPolicy:
+    """Keeps traffic.db at a bounded size.
+
+    Raw events are kept for ``raw_days``, minute rollups for
+    ``minute_rollup_days``, and monthly partitions for ``partition_months``
+    before they are archived to ``archive_dir``.
+    """
+
+    def __init__(self, raw_days: int = 30, minute_rollup_days: int = 30, partition_months: int = 12,
+                 archive_dir: Union[str, Path] = 'archive', chunk_size: int = 2000,
+                 vacuum_pages: int = 2000):
+        self.raw_days = raw_days
+        self.minute_rollup_days = minute_rollup_days
+        self.partition_months = partition_months
+        self.archive_dir = Path(archive_dir)
+        self.chunk_size = chunk_size
+        self.vacuum_pages = vacuum_pages
+
+    def prepare(self, conn: sqlite3.Connection) -> None:
+        """One-off setup, to run before the writer starts (see DatabaseManager startup_tasks)."""
+        ensure_incremental_vacuum(conn)
+
+    def _oldest_kept_partition(self, now: datetime) -> str:
+        month_index = now.year * 12 + (now.month - 1) - self.partition_months
+        return partition_name(datetime(month_index // 12, month_index % 12 + 1, 1))
+
+    def run(self, conn: sqlite3.Connection) -> Dict[str, int]:
+        start = time.monotonic()
+        now = datetime.now()
+
+        raw_cutoff = int((now - timedelta(days=self.raw_days)).timestamp())
+        moved = partition_old_events(conn, raw_cutoff, self.chunk_size)
+
+        minute_cutoff = int((now - timedelta(days=self.minute_rollup_days)).timestamp())
+        with conn:
+            pruned = conn.execute(
+                f"DELETE FROM {ROLLUP_TABLES['minute']} WHERE bucket_start < ?", (minute_cutoff,)
+            ).rowcount
+
+        oldest_kept = self._oldest_kept_partition(now)
+        archived = 0
+        for table in list_partitions(conn):
+            if table < oldest_kept:
+                path = archive_partition(conn, table, self.archive_dir)
+                print(f"Archived {table} to {path}")
+                archived += 1
+
+        conn.execute(f'PRAGMA incremental_vacuum({self.vacuum_pages})').fetchall()
+        conn.commit()
+
+        summary = {'moved': moved, 'minute_rollups_pruned': pruned, 'partitions_archived': archived}
+        if moved or pruned or archived:
+            print(f"Retention pass in {time.monotonic() - start:.1f}s: {summary}")
+        return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply the retention policy to traffic.db")
+    parser.add_argument("--db", default="traffic.db", help="Path to the SQLite database")
+    parser.add_argument("--raw-days", type=int, default=30, help="Days of raw events to keep in vehicle_tracking")
+    parser.add_argument("--partition-months", type=int, default=12, help="Months of partitions to keep before archiving")
+    parser.add_argument("--archive-dir", default="archive", help="Directory for archived partitions")
+    parser.add_argument("--restore", default=None, help="Load an archive file back into its partition table")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    try:
+        if args.restore:
+            print(f"Restored {restore_archive(conn, args.restore)}")
+        else:
+            policy = RetentionPolicy(
+                raw_days=args.raw_days,
+                partition_months=args.partition_months,
+                archive_dir=args.archive_dir,
+            )
+            policy.prepare(conn)
+            policy.run(conn)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,24 @@
+import math
+
+import numpy as np
+
+# scipy's assignment solver is faster, the numpy fallback gives the same result
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+# Up to this many track/detection pairs the costs are worked out in plain
+# Python; numpy's per-call overhead dominates at a handful of vehicles
+SMALL_PROBLEM_PAIRS = 64
+
+
 class TrackedVehicle:
+    __slots__ = (
+        'id', 'bbox', 'frame_first_seen', 'center_point', 'counted_as_runner',
+        'frames_tracked', 'last_seen', 'red_light_image_saved', 'counted_in_total',
+    )
+
     def __init__(self, detection_id, bbox, frame_first_seen, center_point):
         self.id = detection_id
         self.bbox = bbox
@@ -10,75 +30,247 @@ class TrackedVehicle:
         self.red_light_image_saved = False
         self.counted_in_total = False
 
+
+def _hungarian(cost):
+    """Minimum-cost assignment for a cost matrix with no more rows than columns.
+
+    The classic O(n^2 m) potentials algorithm, with the scan over columns
+    done in numpy. Returns the column assigned to each row.
+    """
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    # 1-based: owner[j] is the row holding column j, 0 for none
+    owner = np.zeros(m + 1, dtype=np.int64)
+    way = np.zeros(m + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        owner[0] = i
+        j0 = 0
+        min_slack = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = owner[j0]
+            free = ~used[1:]
+            slack = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (slack < min_slack[1:])
+            min_slack[1:][better] = slack[better]
+            way[1:][better] = j0
+            candidates = np.where(free, min_slack[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+            used_columns = np.flatnonzero(used)
+            u[owner[used_columns]] += delta
+            v[used_columns] -= delta
+            min_slack[1:][free] -= delta
+            j0 = j1
+            if owner[j0] == 0:
+                break
+        # Flip the augmenting path
+        while j0:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+
+    row_to_column = np.full(n, -1, dtype=np.int64)
+    assigned = np.flatnonzero(owner[1:])
+    row_to_column[owner[1:][assigned] - 1] = assigned
+    return row_to_column
+
+
+def linear_assignment(cost):
+    """Optimal assignment for a rectangular cost matrix, as (rows, columns)."""
+    cost = np.asarray(cost, dtype=np.float64)
+    if cost.size == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    if linear_sum_assignment is not None:
+        return linear_sum_assignment(cost)
+    if cost.shape[0] > cost.shape[1]:
+        columns, rows = linear_assignment(cost.T)
+        order = np.argsort(rows)
+        return rows[order], columns[order]
+    columns = _hungarian(cost)
+    return np.arange(cost.shape[0]), columns
+
+
+def assign_components(costs, bound):
+    """Optimal assignment over the feasible pairs, as (rows, columns).
+
+    ``costs`` maps each feasible (row, column) pair to its cost, none above
+    ``bound``. Tracks and detections only interact through feasible pairs,
+    so the problem splits into connected components that are usually a
+    single track and detection. Only the components with a real choice in
+    them go to the solver, with the missing pairs costing more than any full
+    set of feasible ones so the number of real matches is maximised first.
+    """
+    rows = [row for row, _ in costs]
+    columns = [column for _, column in costs]
+    if len(set(rows)) == len(rows) and len(set(columns)) == len(columns):
+        # Every pair is its own component
+        return rows, columns
+
+    # Union-find over rows (0, 1, ...) and columns (-1, -2, ...)
+    parent = {}
+
+    def find(node):
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for row, column in costs:
+        root_a, root_b = find(row), find(~column)
+        if root_a != root_b:
+            parent[root_a] = root_b
+
+    components = {}
+    for pair in costs:
+        components.setdefault(find(pair[0]), []).append(pair)
+
+    rows, columns = [], []
+    for pairs in components.values():
+        if len(pairs) == 1:
+            rows.append(pairs[0][0])
+            columns.append(pairs[0][1])
+            continue
+        component_rows = sorted({row for row, _ in pairs})
+        component_columns = sorted({column for _, column in pairs})
+        row_index = {row: i for i, row in enumerate(component_rows)}
+        column_index = {column: j for j, column in enumerate(component_columns)}
+        penalty = bound * (min(len(component_rows), len(component_columns)) + 1)
+        cost = np.full((len(component_rows), len(component_columns)), penalty)
+        for row, column in pairs:
+            cost[row_index[row], column_index[column]] = costs[row, column]
+        for i, j in zip(*linear_assignment(cost)):
+            row, column = component_rows[i], component_columns[j]
+            if (row, column) in costs:
+                rows.append(row)
+                columns.append(column)
+    return rows, columns
+
+
+def box_iou(boxes_a, boxes_b):
+    """Pairwise IoU of two (N, 4) and (M, 4) arrays of x1, y1, x2, y2 boxes."""
+    a = boxes_a[:, None, :]
+    b = boxes_b[None, :, :]
+    width = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    height = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    intersection = width * height
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    union = area_a + area_b - intersection
+    return np.divide(intersection, union, out=np.zeros(intersection.shape), where=union > 0)
+
+
 class VehicleTracker:
-    def __init__(self):
+    """Matches each frame's detections to existing tracks.
+
+    Pair costs come from center distances or from 1 - IoU, built with numpy
+    (or plain Python for a few vehicles), and are solved as an optimal
+    assignment rather than greedily. Pairs further apart than
+    ``distance_threshold`` (or overlapping less than ``iou_threshold``) are
+    never matched, which splits the problem into small independent pieces.
+    """
+
+    def __init__(self, max_frames_to_track=30, distance_threshold=50, metric='distance', iou_threshold=0.1):
+        if metric not in ('distance', 'iou'):
+            raise ValueError(f"Unknown tracking metric: {metric}")
         self.tracked_vehicles = {}
         self.next_id = 0
-        self.max_frames_to_track = 30
-        self.distance_threshold = 50
-
-    def update(self, current_frame_count, detections, width, height):
-        # Convert detections to format we can use
-        current_detections = []
-        for detection in detections:
-            bbox = detection.get_bbox()
-            x1, y1 = int(bbox.xmin() * width), int(bbox.ymin() * height)
-            x2, y2 = int(bbox.xmax() * width), int(bbox.ymax() * height)
-            center = (x1 + (x2 - x1) // 2, y1 + (y2 - y1) // 2)
-            current_detections.append({
-                'bbox': (x1, y1, x2, y2),
-                'center': center,
-                'confidence': detection.get_confidence()
-            })
-
-        # Match existing tracks to new detections
-        matched_tracks = set()
-        matched_detections = set()
-
-        for vehicle_id, vehicle in list(self.tracked_vehicles.items()):
-            # Remove old tracks
-            if current_frame_count - vehicle.last_seen > self.max_frames_to_track:
-                del self.tracked_vehicles[vehicle_id]
-                continue
+        self.max_frames_to_track = max_frames_to_track
+        self.distance_threshold = distance_threshold
+        self.metric = metric
+        self.iou_threshold = iou_threshold
 
-            # Find the closest detection to this track
-            min_dist = float('inf')
-            closest_detection_idx = None
+    def update_from_arrays(self, current_frame_count, boxes, centers=None):
+        """Update the tracks from an (N, 4) array of x1, y1, x2, y2 pixel boxes.
 
-            for i, detection in enumerate(current_detections):
-                if i in matched_detections:
-                    continue
+        ``centers`` can be passed in when the caller already has them, see
+        FrameProcessor.extract_detections.
+        """
+        boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        if centers is None:
+            centers = boxes[:, :2] + (boxes[:, 2:] - boxes[:, :2]) // 2
+        else:
+            centers = np.asarray(centers, dtype=np.int64).reshape(-1, 2)
 
-                dist = self._calculate_distance(vehicle.center_point, detection['center'])
-                if dist < min_dist and dist < self.distance_threshold:
-                    min_dist = dist
-                    closest_detection_idx = i
+        # Remove old tracks
+        for vehicle_id in [
+            vehicle_id for vehicle_id, vehicle in self.tracked_vehicles.items()
+            if current_frame_count - vehicle.last_seen > self.max_frames_to_track
+        ]:
+            del self.tracked_vehicles[vehicle_id]
 
-            if closest_detection_idx is not None:
+        tracks = list(self.tracked_vehicles.values())
+        box_list, center_list = boxes.tolist(), centers.tolist()
+        matched_detections = set()
+        if tracks and box_list:
+            if len(tracks) * len(box_list) <= SMALL_PROBLEM_PAIRS:
+                costs = self._pair_costs(tracks, box_list, center_list)
+            else:
+                costs = self._matrix_costs(tracks, boxes, centers)
+            bound = 1.0 if self.metric == 'iou' else float(self.distance_threshold)
+            for row, column in zip(*assign_components(costs, bound)):
                 # Update the track with new detection
-                matched_detection = current_detections[closest_detection_idx]
-                vehicle.bbox = matched_detection['bbox']
-                vehicle.center_point = matched_detection['center']
+                vehicle = tracks[row]
+                vehicle.bbox = tuple(box_list[column])
+                vehicle.center_point = tuple(center_list[column])
                 vehicle.last_seen = current_frame_count
                 vehicle.frames_tracked += 1
-                
-                matched_tracks.add(vehicle_id)
-                matched_detections.add(closest_detection_idx)
+                matched_detections.add(column)
 
         # Create new tracks for unmatched detections
-        for i, detection in enumerate(current_detections):
-            if i not in matched_detections:
-                new_vehicle = TrackedVehicle(
-                    self.next_id,
-                    detection['bbox'],
-                    current_frame_count,
-                    detection['center']
-                )
-                self.tracked_vehicles[self.next_id] = new_vehicle
-                self.next_id += 1
-
-    def _calculate_distance(self, point1, point2):
-        return ((point1[0] - point2[0]) ** 2 + (point1[1] - point2[1]) ** 2) ** 0.5
+        for i in range(len(box_list)):
+            if i in matched_detections:
+                continue
+            self.tracked_vehicles[self.next_id] = TrackedVehicle(
+                self.next_id,
+                tuple(box_list[i]),
+                current_frame_count,
+                tuple(center_list[i]),
+            )
+            self.next_id += 1
+
+    def _matrix_costs(self, tracks, boxes, centers):
+        """Cost of every feasible (track, detection) pair, built with numpy."""
+        if self.metric == 'iou':
+            track_boxes = np.array([vehicle.bbox for vehicle in tracks], dtype=np.float64)
+            iou = box_iou(track_boxes, boxes.astype(np.float64))
+            feasible = iou > self.iou_threshold
+            cost = 1.0 - iou
+        else:
+            track_centers = np.array([vehicle.center_point for vehicle in tracks], dtype=np.float64)
+            offsets = track_centers[:, None, :] - centers[None, :, :]
+            cost = np.sqrt((offsets ** 2).sum(axis=2))
+            feasible = cost < self.distance_threshold
+        rows, columns = np.nonzero(feasible)
+        return dict(zip(zip(rows.tolist(), columns.tolist()), cost[rows, columns].tolist()))
+
+    def _pair_costs(self, tracks, boxes, centers):
+        """Same as _matrix_costs, in plain Python for small problems."""
+        costs = {}
+        limit = self.distance_threshold ** 2
+        for row, vehicle in enumerate(tracks):
+            if self.metric == 'iou':
+                ax1, ay1, ax2, ay2 = vehicle.bbox
+                area_a = (ax2 - ax1) * (ay2 - ay1)
+                for column, (bx1, by1, bx2, by2) in enumerate(boxes):
+                    width = max(min(ax2, bx2) - max(ax1, bx1), 0)
+                    height = max(min(ay2, by2) - max(ay1, by1), 0)
+                    intersection = width * height
+                    union = area_a + (bx2 - bx1) * (by2 - by1) - intersection
+                    iou = intersection / union if union > 0 else 0.0
+                    if iou > self.iou_threshold:
+                        costs[row, column] = 1.0 - iou
+            else:
+                x, y = vehicle.center_point
+                for column, (cx, cy) in enumerate(centers):
+                    squared = (x - cx) ** 2 + (y - cy) ** 2
+                    if squared < limit:
+                        costs[row, column] = math.sqrt(squared)
+        return costs
 
     def get_active_vehicles(self):
-        return self.tracked_vehicles
\ No newline at end of file
+        return self.tracked_vehicles
@@ -3,31 +3,99 @@ import numpy as np
 from typing import Dict, List, Tuple, Optional
 import cv2
 
+# Drawing colours for the built-in zones, anything else uses DEFAULT_ZONE_COLOR
+ZONE_COLORS = {
+    'red_zone': (255, 0, 0),
+    'green_zone': (0, 240, 44),
+    'green_zone_2': (0, 240, 44),
+    'traffic_zone': (0, 255, 255),
+}
+DEFAULT_ZONE_COLOR = (255, 255, 255)
+MAX_ZONES = 32
+
+
 class ZoneManager:
-    """Manages traffic monitoring zones and their updates."""
+    """Manages traffic monitoring zones and their updates.
+
+    Zones are also rasterized into a label map, one bit per zone, rebuilt
+    whenever the zones or the frame size change. ``labels_at`` then answers
+    membership for any number of points and zones with one indexed lookup.
+    """
     
-    def __init__(self, default_zones: Dict[str, List[List[int]]]):
+    def __init__(self, default_zones: Dict[str, List[List[int]]], frame_size: Tuple[int, int] = (640, 640)):
+        if len(default_zones) > MAX_ZONES:
+            raise ValueError(f"At most {MAX_ZONES} zones are supported, got {len(default_zones)}")
         self.zones = {
-            'red_zone': np.array(default_zones['red_zone'], np.int32).reshape((-1, 1, 2)),
-            'green_zone': np.array(default_zones['green_zone'], np.int32).reshape((-1, 1, 2)),
-            'green_zone_2': np.array(default_zones['green_zone_2'], np.int32).reshape((-1, 1, 2)),
-            'traffic_zone': np.array(default_zones['traffic_zone'], np.int32).reshape((-1, 1, 2))
+            name: np.array(vertices, np.int32).reshape((-1, 1, 2))
+            for name, vertices in default_zones.items()
         }
         
-        self.fallback_zones = {
-            'red_zone': [[80, 382], [160, 410], [138, 430], [80, 405]],
-            'traffic_zone': [[177.0532989501953, 384.20062255859375], [192.10031127929688, 388.2131652832031], [189.09091186523438, 409.27899169921875], [178.05642700195312, 408.2758483886719]],
-            'green_zone': [[210, 420], [555, 530], [560, 590], [165, 425]],
-            'green_zone_2': [[210, 420], [555, 530], [560, 590], [165, 425]]
-        }
+        self.fallback_zones = {name: list(vertices) for name, vertices in default_zones.items()}
+        self.zone_bits = {name: 1 << index for index, name in enumerate(self.zones)}
+        self.frame_size = frame_size
+        self._label_map = None
+        self._polygons = None
     
     def get_zone(self, zone_name: str) -> np.ndarray:
         """Get a specific zone's numpy array."""
         return self.zones[zone_name]
     
+    def as_polygons(self) -> Dict[str, List[List[int]]]:
+        """All zones as plain vertex lists, for the stream metadata."""
+        if self._polygons is None:
+            self._polygons = {name: zone.reshape(-1, 2).tolist() for name, zone in self.zones.items()}
+        return self._polygons
+
+    def set_frame_size(self, width: int, height: int) -> None:
+        if (width, height) != self.frame_size:
+            self.frame_size = (width, height)
+            self._label_map = None
+
+    def zone_mask(self, *zone_names: str) -> int:
+        """Bitmask matching any of the given zones in ``labels_at`` results."""
+        mask = 0
+        for name in zone_names:
+            mask |= self.zone_bits[name]
+        return mask
+
+    def label_map(self) -> np.ndarray:
+        """Per-pixel bitmask of the zones covering it, rebuilt lazily."""
+        if self._label_map is None:
+            width, height = self.frame_size
+            label_map = np.zeros((height, width), dtype=np.uint32)
+            scratch = np.zeros((height, width), dtype=np.uint8)
+            edges = np.zeros((height, width), dtype=np.uint8)
+            for name, zone in self.zones.items():
+                scratch[:] = 0
+                cv2.fillPoly(scratch, [zone], 1)
+                # fillPoly also takes pixels a slanted edge only passes near;
+                # settle the band around the edges with is_in_zone so the map
+                # agrees with the polygon test exactly
+                edges[:] = 0
+                cv2.polylines(edges, [zone], isClosed=True, color=1, thickness=3)
+                ys, xs = np.nonzero(edges)
+                for x, y in zip(xs.tolist(), ys.tolist()):
+                    scratch[y, x] = self.is_in_zone(zone, (x, y))
+                label_map[scratch.view(bool)] |= np.uint32(self.zone_bits[name])
+            self._label_map = label_map
+        return self._label_map
+
+    def labels_at(self, points: np.ndarray) -> np.ndarray:
+        """Zone bitmask for each (x, y) row of ``points``; 0 outside the frame."""
+        points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+        label_map = self.label_map()
+        height, width = label_map.shape
+        x, y = points[:, 0], points[:, 1]
+        inside = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+        labels = np.zeros(len(points), dtype=np.uint32)
+        labels[inside] = label_map[y[inside], x[inside]]
+        return labels
+
     def update_zones(self) -> None:
         """Update zones from JSON files if available."""
-        for zone_name in ['red_zone', 'green_zone', 'green_zone_2', 'traffic_zone']:
+        self._polygons = None
+        self._label_map = None
+        for zone_name in list(self.zones):
             try:
                 with open(f'{zone_name}.json', 'r') as file:
                     data = json.load(file)
@@ -47,31 +115,11 @@ class ZoneManager:
     
     def draw_zones(self, frame: np.ndarray) -> None:
         """Draw all zones on the frame."""
-        cv2.polylines(
-            frame, 
-            [self.zones['green_zone']], 
-            isClosed=True, 
-            color=(0, 240, 44), 
-            thickness=1
-        )
-        cv2.polylines(
-            frame, 
-            [self.zones['green_zone_2']], 
-            isClosed=True, 
-            color=(0, 240, 44), 
-            thickness=1
-        )
-        cv2.polylines(
-            frame, 
-            [self.zones['red_zone']], 
-            isClosed=True, 
-            color=(255, 0, 0), 
-            thickness=1
-        )
-        cv2.polylines(
-            frame, 
-            [self.zones['traffic_zone']], 
-            isClosed=True, 
-            color=(0, 255, 255), 
-            thickness=1
-        )
\ No newline at end of file
+        for name, zone in self.zones.items():
+            cv2.polylines(
+                frame, 
+                [zone], 
+                isClosed=True, 
+                color=ZONE_COLORS.get(name, DEFAULT_ZONE_COLOR), 
+                thickness=1
+            )
\ No newline at end of file
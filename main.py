@@ -1,9 +1,14 @@
+from collections import OrderedDict
 from contextlib import asynccontextmanager
 import sqlite3
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
-from fastapi.responses import JSONResponse
+import sys
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
 import base64
+import csv
+import io
 import json
+import struct
 from pathlib import Path
 import psutil
 import zmq.asyncio
@@ -13,6 +18,65 @@ from pydantic import BaseModel
 from datetime import datetime, timedelta, time
 from typing import Literal
 
+sys.path.append(str(Path(__file__).resolve().parent / "basic_pipelines"))
+from frame_bus import (
+    FRAME_IPC_ENDPOINT,
+    FRAME_RING_NAME,
+    KIND_FRAME,
+    KIND_HEARTBEAT,
+    KIND_RING_FRAME,
+    RENDITION_NAMES,
+    parse_message,
+)
+from frame_ring import FrameRingReader, default_ring_path
+from database_utils import (
+    IngestWatermark,
+    ReadConnectionPool,
+    fetch_events_page,
+    has_unmigrated_events,
+    init_schema,
+    local_date_bounds,
+    query_rollups,
+)
+
+DB_PATH = "traffic.db"
+# Read connections for analytics queries, and how many may run at once
+DB_READ_POOL_SIZE = 2
+DB_READ_CONCURRENCY = 2
+# Number of distinct /stats ranges kept in the result cache
+STATS_CACHE_SIZE = 128
+# Rows fetched per page by /events/export
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_MAX_CHUNK_SIZE = 10000
+EXPORT_FIELDS = ["id", "ts", "time", "vehicle_count", "is_red_light_runner", "cursor"]
+
+# Binary /ws framing, negotiated with the Sec-WebSocket-Protocol header.
+# Each message is a fixed header (version, flags, metadata length), the
+# metadata as UTF-8 JSON, then the untouched JPEG bytes. Clients that don't
+# ask for it keep receiving the JSON {"metadata", "frame": base64} format.
+BINARY_SUBPROTOCOL = "traffic-frames.v2"
+BINARY_FRAME_VERSION = 2
+BINARY_FRAME_HEADER = struct.Struct(">BBI")
+# Header flag: metadata-only heartbeat, the scene hasn't changed and there is
+# no JPEG. JSON clients get "frame": null instead.
+BINARY_FLAG_METADATA_ONLY = 0x01
+
+# Per-client adaptive rendition switching, driven by how long sends take
+DEGRADE_SEND_MS = 40.0  # smoothed send time that moves a client down a rendition
+UPGRADE_SEND_MS = 10.0  # smoothed send time that counts towards moving back up
+UPGRADE_AFTER_FRAMES = 90
+SWITCH_COOLDOWN_FRAMES = 30
+
+# Per-client /ws pacing defaults, both can be overridden with query parameters
+WS_MAX_FPS = 30.0  # 0 disables the cap
+WS_MAX_STALENESS_MS = 500.0  # frames older than this are skipped, not sent
+
+STAT_LABEL_FORMATS = {
+    "minute": "%m-%d %I:%M%p",
+    "hour": "%m-%d %I%p",
+    "day": "%m-%d",
+}
+
 class Vertex(BaseModel):
     id: int
     x: float
@@ -29,18 +93,32 @@ class FrameConsumer:
         self.socket = self.context.socket(zmq.SUB)
         self.socket.setsockopt(zmq.RCVHWM, 2)
         self.socket.setsockopt(zmq.LINGER, 0)  # Add LINGER option
+        # The detector binds one of these depending on its FRAME_TRANSPORT,
+        # connecting to both means either works without configuration
         self.socket.connect(f"tcp://localhost:{port}")
-        self.socket.subscribe(b"")
+        self.socket.connect(FRAME_IPC_ENDPOINT)
+        # Frames sent over ipc are in the detector's shared-memory ring
+        self.ring = FrameRingReader(default_ring_path(FRAME_RING_NAME))
+        # Renditions are subscribed on demand, see FrameBroadcaster
+
+    def subscribe(self, rendition: str) -> None:
+        self.socket.subscribe(rendition.encode())
+
+    def unsubscribe(self, rendition: str) -> None:
+        self.socket.unsubscribe(rendition.encode())
         
-    async def receive_frame(self) -> bytes | None:
+    async def receive_frame(self) -> list[zmq.Frame] | None:
         try:
-            return await self.socket.recv()
+            # Zero-copy receive, each part's .buffer is a memoryview
+            return await self.socket.recv_multipart(copy=False)
         except Exception as e:
             print(f"Error receiving frame: {e}")
             return None
     
     async def close(self):
         try:
+            if hasattr(self, 'ring'):
+                self.ring.close()
             if hasattr(self, 'socket') and self.socket:
                 self.socket.close(linger=0)
                 self.socket = None
@@ -58,33 +136,384 @@ class FrameConsumer:
             self.context.term()
 
 
+def decode_metadata(raw: bytes) -> tuple[str, float | None] | None:
+    """Decode and check a frame's metadata once, as (JSON text, captured_at).
+
+    Returns None if it isn't a UTF-8 JSON object.
+    """
+    try:
+        text = raw.decode('utf-8')
+        metadata = json.loads(text)
+        captured_at = metadata.get("captured_at")
+        return text, float(captured_at) if captured_at is not None else None
+    except (ValueError, AttributeError, TypeError):
+        return None
+
+
+class FramePayload:
+    """One received frame, encoded lazily for each wire format in use.
+
+    Every encoding is computed at most once and then shared by all clients
+    that asked for it. Heartbeats are payloads without a frame. The metadata
+    has already been checked by decode_metadata, so encoding can't fail.
+    """
+
+    def __init__(self, metadata: bytes, metadata_text: str, frame: memoryview | None,
+                 captured_at: float | None = None):
+        self.metadata = metadata
+        self.metadata_text = metadata_text
+        self.frame = frame
+        self.captured_at = captured_at or None
+        self._json_text = None
+        self._binary = None
+
+    def age_ms(self) -> float:
+        captured_at = self.captured_at
+        return (datetime.now().timestamp() - captured_at) * 1000 if captured_at else 0.0
+
+    @property
+    def is_heartbeat(self) -> bool:
+        return self.frame is None
+
+    @property
+    def json_text(self) -> str:
+        if self._json_text is None and self.is_heartbeat:
+            self._json_text = '{"metadata": ' + self.metadata_text + ', "frame": null}'
+        elif self._json_text is None:
+            # The metadata is already JSON, so it is spliced in as-is
+            self._json_text = (
+                '{"metadata": ' + self.metadata_text
+                + ', "frame": "' + base64.b64encode(self.frame).decode('ascii') + '"}'
+            )
+        return self._json_text
+
+    @property
+    def binary(self) -> bytes:
+        if self._binary is None:
+            flags = BINARY_FLAG_METADATA_ONLY if self.is_heartbeat else 0
+            header = BINARY_FRAME_HEADER.pack(BINARY_FRAME_VERSION, flags, len(self.metadata))
+            self._binary = b"".join((header, self.metadata, self.frame or b""))
+        return self._binary
+
+
+class ClientMetrics:
+    """Send counters for one websocket client, reported by /ws/clients."""
+
+    def __init__(self, client_id: int, remote: str, wire_format: str, max_fps: float,
+                 max_staleness_ms: float):
+        self.client_id = client_id
+        self.remote = remote
+        self.wire_format = wire_format
+        self.max_fps = max_fps
+        self.max_staleness_ms = max_staleness_ms
+        self.connected_at = datetime.now()
+        self.sent = 0
+        self.stale = 0
+        self.send_ms_total = 0.0
+        self.last_send_ms = 0.0
+
+    def record_send(self, send_ms: float) -> None:
+        self.sent += 1
+        self.send_ms_total += send_ms
+        self.last_send_ms = send_ms
+
+    def as_dict(self, slot: "LatestFrameSlot") -> dict:
+        return {
+            "id": self.client_id,
+            "remote": self.remote,
+            "format": self.wire_format,
+            "rendition": slot.rendition,
+            "max_fps": self.max_fps,
+            "max_staleness_ms": self.max_staleness_ms,
+            "connected_at": self.connected_at.isoformat(timespec="seconds"),
+            "frames_sent": self.sent,
+            # Overwritten in the slot before they could be sent
+            "frames_dropped": slot.dropped,
+            # Taken from the slot but older than the staleness budget
+            "frames_stale": self.stale,
+            "avg_send_ms": round(self.send_ms_total / self.sent, 2) if self.sent else 0.0,
+            "last_send_ms": round(self.last_send_ms, 2),
+        }
+
+
+class LatestFrameSlot:
+    """Single-entry mailbox for one websocket client.
+
+    The broadcaster overwrites whatever the client hasn't sent yet, so a slow
+    client only ever skips frames and never holds up anyone else.
+    """
+
+    def __init__(self, rendition: str, metrics: ClientMetrics):
+        self.rendition = rendition
+        self.metrics = metrics
+        self._payload = None
+        self._ready = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, payload) -> None:
+        if self._ready.is_set():
+            # Never let a heartbeat push out a frame the client hasn't seen
+            if payload.is_heartbeat and not self._payload.is_heartbeat:
+                return
+            # Only a lost image counts; an unsent heartbeat carried nothing to see
+            if not self._payload.is_heartbeat:
+                self.dropped += 1
+        self._payload = payload
+        self._ready.set()
+
+    async def get(self):
+        await self._ready.wait()
+        self._ready.clear()
+        return self._payload
+
+
+class FrameBroadcaster:
+    """Receives each frame once from the FrameConsumer and fans it out.
+
+    Each frame is wrapped in one FramePayload, and the same object is handed
+    to the LatestFrameSlot of every client watching that rendition. The
+    consumer is only subscribed to renditions with at least one client, which
+    in turn is what tells the publisher which renditions to encode.
+
+    While the scene is static the publisher only sends heartbeats, so the last
+    frame of each rendition is kept to give clients that join or switch
+    rendition something to show straight away.
+    """
+
+    def __init__(self, consumer: FrameConsumer):
+        self.consumer = consumer
+        self.clients: set[LatestFrameSlot] = set()
+        self.frames_received = 0
+        self.heartbeats_received = 0
+        self.malformed_received = 0
+        self.dropped_received = 0
+        self._viewers = {rendition: 0 for rendition in RENDITION_NAMES}
+        self._last_frame: dict[str, FramePayload] = {}
+        self._last_heartbeat: dict[str, FramePayload] = {}
+
+    def _retain(self, rendition: str) -> None:
+        self._viewers[rendition] += 1
+        if self._viewers[rendition] == 1:
+            self.consumer.subscribe(rendition)
+
+    def _release(self, rendition: str) -> None:
+        self._viewers[rendition] -= 1
+        if self._viewers[rendition] == 0:
+            self.consumer.unsubscribe(rendition)
+            # Nothing keeps these current once unsubscribed
+            self._last_frame.pop(rendition, None)
+            self._last_heartbeat.pop(rendition, None)
+
+    def _remember(self, rendition: str, payload: FramePayload) -> None:
+        if payload.is_heartbeat:
+            self._last_heartbeat[rendition] = payload
+        else:
+            self._last_frame[rendition] = payload
+            self._last_heartbeat.pop(rendition, None)
+
+    def snapshot(self, rendition: str) -> FramePayload | None:
+        """The current picture for a rendition, with the newest metadata.
+
+        A static scene can go a while without a new frame, so the snapshot
+        counts as captured now and is never skipped as stale.
+        """
+        frame = self._last_frame.get(rendition)
+        if frame is None:
+            return None
+        heartbeat = self._last_heartbeat.get(rendition, frame)
+        return FramePayload(heartbeat.metadata, heartbeat.metadata_text, frame.frame, datetime.now().timestamp())
+
+    def register(self, rendition: str, metrics: ClientMetrics) -> LatestFrameSlot:
+        slot = LatestFrameSlot(rendition, metrics)
+        self.clients.add(slot)
+        self._retain(rendition)
+        snapshot = self.snapshot(rendition)
+        if snapshot is not None:
+            slot.put(snapshot)
+        return slot
+
+    def unregister(self, slot: LatestFrameSlot) -> None:
+        if slot in self.clients:
+            self.clients.discard(slot)
+            self._release(slot.rendition)
+
+    def switch(self, slot: LatestFrameSlot, rendition: str) -> None:
+        if rendition == slot.rendition:
+            return
+        self._retain(rendition)
+        self._release(slot.rendition)
+        slot.rendition = rendition
+        snapshot = self.snapshot(rendition)
+        if snapshot is not None:
+            slot.put(snapshot)
+
+    def build_payload(self, message: list[zmq.Frame]) -> tuple[str, FramePayload] | None:
+        parsed = parse_message([part.buffer for part in message])
+        if parsed is None:
+            print("Dropping frame with an unrecognised frame bus header")
+            return None
+        rendition, kind, metadata, frame = parsed
+        if kind not in (KIND_FRAME, KIND_HEARTBEAT, KIND_RING_FRAME):
+            return None
+        # Checked once here, so a bad frame can't break a client's send loop
+        metadata = bytes(metadata)
+        decoded = decode_metadata(metadata)
+        if decoded is None:
+            self.malformed_received += 1
+            print("Dropping frame with malformed metadata")
+            return None
+        metadata_text, captured_at = decoded
+        if kind == KIND_HEARTBEAT:
+            return rendition, FramePayload(metadata, metadata_text, None, captured_at)
+        if kind == KIND_RING_FRAME:
+            # One copy out of shared memory; None if the writer lapped us
+            frame = self.consumer.ring.read(frame)
+            if frame is None:
+                return None
+        # Metadata is small, the JPEG stays a view into the ZMQ message
+        return rendition, FramePayload(metadata, metadata_text, frame, captured_at)
+
+    async def run(self) -> None:
+        while True:
+            message = await self.consumer.receive_frame()
+            if message is None:
+                await asyncio.sleep(0.1)
+                continue
+            try:
+                built = self.build_payload(message)
+            except Exception as e:
+                # One bad message must not end the task and stall every client
+                self.dropped_received += 1
+                print(f"Dropping frame that failed to parse: {e!r}")
+                continue
+            if built is None:
+                continue
+            rendition, payload = built
+            if payload.is_heartbeat:
+                self.heartbeats_received += 1
+            else:
+                self.frames_received += 1
+            self._remember(rendition, payload)
+            for slot in self.clients:
+                if slot.rendition == rendition:
+                    slot.put(payload)
+
+
+class AdaptiveRendition:
+    """Picks a rendition for one client from its measured send backpressure.
+
+    A smoothed send time above DEGRADE_SEND_MS, or frames piling up in the
+    client's slot, moves it one rendition down. A long run of fast sends moves
+    it back up, never above the rendition the client asked for.
+    """
+
+    def __init__(self, best: str):
+        self.best_level = RENDITION_NAMES.index(best)
+        self.level = self.best_level
+        self.smoothed_send_ms = 0.0
+        self.fast_streak = 0
+        self.cooldown = SWITCH_COOLDOWN_FRAMES
+
+    @property
+    def rendition(self) -> str:
+        return RENDITION_NAMES[self.level]
+
+    def update(self, send_ms: float, dropped: int) -> str | None:
+        """Record one send; returns the new rendition if it should change."""
+        self.smoothed_send_ms = 0.8 * self.smoothed_send_ms + 0.2 * send_ms
+        if self.cooldown > 0:
+            self.cooldown -= 1
+            return None
+
+        if self.smoothed_send_ms > DEGRADE_SEND_MS or dropped > 1:
+            self.fast_streak = 0
+            if self.level < len(RENDITION_NAMES) - 1:
+                return self._move(self.level + 1)
+        elif self.smoothed_send_ms < UPGRADE_SEND_MS:
+            self.fast_streak += 1
+            if self.fast_streak >= UPGRADE_AFTER_FRAMES and self.level > self.best_level:
+                return self._move(self.level - 1)
+        else:
+            self.fast_streak = 0
+        return None
+
+    def _move(self, level: int) -> str:
+        self.level = level
+        self.fast_streak = 0
+        self.cooldown = SWITCH_COOLDOWN_FRAMES
+        return self.rendition
+
+
+class StatsCache:
+    """LRU cache of /stats responses, invalidated by the ingest watermark.
+
+    Entries remember the watermark they were computed at and are only served
+    while it is unchanged, so new events show up on the next request.
+    """
+
+    def __init__(self, max_entries: int = 128):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, watermark: int):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != watermark:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, watermark: int, value) -> None:
+        self._entries[key] = (watermark, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
 frame_consumer: FrameConsumer | None = None
+frame_broadcaster: FrameBroadcaster | None = None
+read_pool: ReadConnectionPool | None = None
+ingest_watermark = IngestWatermark(DB_PATH)
+stats_cache = StatsCache(STATS_CACHE_SIZE)
+next_client_id = 0
 
 def init_db():
-    conn = sqlite3.connect('traffic.db')
-    cursor = conn.cursor()
-    
-    # Create table for vehicle tracking
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS vehicle_tracking (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-        vehicle_count INTEGER,
-        is_red_light_runner BOOLEAN
-    )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    try:
+        # WAL lets the read pool query while the detector is writing
+        conn.execute('PRAGMA journal_mode=WAL')
+        # Create the vehicle tracking and rollup tables
+        init_schema(conn)
+    finally:
+        conn.close()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
-    global frame_consumer
+    global frame_consumer, frame_broadcaster, read_pool
+    broadcast_task = None
     try:
         frame_consumer = FrameConsumer()
+        frame_broadcaster = FrameBroadcaster(frame_consumer)
+        broadcast_task = asyncio.create_task(frame_broadcaster.run())
         init_db()
+        read_pool = ReadConnectionPool(
+            DB_PATH, size=DB_READ_POOL_SIZE, max_concurrency=DB_READ_CONCURRENCY
+        )
         yield
     finally:
+        if broadcast_task:
+            broadcast_task.cancel()
+            try:
+                await broadcast_task
+            except asyncio.CancelledError:
+                pass
+        frame_broadcaster = None
+        if read_pool:
+            read_pool.close()
+            read_pool = None
         if frame_consumer:
             await frame_consumer.close()
             frame_consumer = None
@@ -99,113 +528,241 @@ async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
 app = FastAPI(lifespan=lifespan)
 
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    if not frame_consumer:
+async def websocket_endpoint(
+    websocket: WebSocket,
+    rendition: str = "full",
+    adaptive: bool = True,
+    max_fps: float = WS_MAX_FPS,
+    max_staleness_ms: float = WS_MAX_STALENESS_MS,
+):
+    global next_client_id
+    broadcaster = frame_broadcaster
+    if not broadcaster:
         await websocket.close(code=1011)
         return
+    if rendition not in RENDITION_NAMES:
+        rendition = RENDITION_NAMES[0]
         
-    await websocket.accept()
-    
-    # Create ZMQ context and socket
-    context = zmq.asyncio.Context()  # Use asyncio context instead
-    socket = context.socket(zmq.SUB)
-    socket.setsockopt(zmq.RCVHWM, 2)  # Set high water mark
-    socket.connect("tcp://localhost:5555")
-    socket.setsockopt_string(zmq.SUBSCRIBE, "")
+    binary = BINARY_SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+    await websocket.accept(subprotocol=BINARY_SUBPROTOCOL if binary else None)
+    next_client_id += 1
+    remote = f"{websocket.client.host}:{websocket.client.port}" if websocket.client else "unknown"
+    metrics = ClientMetrics(
+        next_client_id, remote, "binary" if binary else "json", max_fps, max_staleness_ms
+    )
+    slot = broadcaster.register(rendition, metrics)
+    quality = AdaptiveRendition(rendition)
+    loop = asyncio.get_running_loop()
+    min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+    next_send = loop.time()
     
     try:
         while True:
-            try:
-                # Use asyncio-native receive
-                message = await socket.recv()
-                
-                # Split the message using the delimiter
-                delimiter = b':::'
-                parts = message.split(delimiter)
-                
-                if len(parts) == 2:
-                    # Parse metadata
-                    metadata_json = parts[0].decode('utf-8')
-                    metadata = json.loads(metadata_json)
-                    
-                    # Get frame data
-                    frame_data = parts[1]
-                    
-                    # Encode frame as base64
-                    frame_base64 = base64.b64encode(frame_data).decode('utf-8')
-                    
-                    # Combine into a single JSON message
-                    response = {
-                        "metadata": metadata,
-                        "frame": frame_base64
-                    }
-                    
-                    # Send to frontend
-                    await websocket.send_json(response)
-                    
-                await asyncio.sleep(0.016)  # Keep the frame rate limit
-                
-            except zmq.error.ZMQError as e:
-                print(f"ZMQ Error: {e}")
-                break
+            # Hold off until the fps cap allows another send. Frames arriving
+            # meanwhile overwrite each other, so only the newest is sent.
+            delay = next_send - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            payload = await slot.get()
+            if max_staleness_ms > 0 and payload.age_ms() > max_staleness_ms:
+                metrics.stale += 1
+                continue
+
+            dropped_before = slot.dropped
+            send_start = loop.time()
+            # Awaiting the send is the backpressure: nothing else is queued
+            # for this client until the previous frame has been written
+            if binary:
+                await websocket.send_bytes(payload.binary)
+            else:
+                await websocket.send_text(payload.json_text)
+            send_ms = (loop.time() - send_start) * 1000
+            metrics.record_send(send_ms)
+            next_send = send_start + min_interval
+
+            if adaptive:
+                new_rendition = quality.update(send_ms, slot.dropped - dropped_before)
+                if new_rendition:
+                    broadcaster.switch(slot, new_rendition)
                 
     except WebSocketDisconnect:
         print("WebSocket disconnected")
     except Exception as e:
         print(f"Error in websocket: {e}")
     finally:
-        # Proper cleanup sequence
-        try:
-            socket.setsockopt(zmq.LINGER, 0)  # Don't wait for unsent messages
-            socket.close()
-            await context.term()  # Use async termination
-        except Exception as e:
-            print(f"Error during cleanup: {e}")
+        broadcaster.unregister(slot)
+
+@app.get("/ws/clients")
+async def get_websocket_clients():
+    """Per-client send metrics for the connected /ws clients."""
+    broadcaster = frame_broadcaster
+    if not broadcaster:
+        return {
+            "frames_received": 0, "heartbeats_received": 0, "malformed_received": 0, "dropped_received": 0,
+            "ring": {}, "clients": [],
+        }
+    clients = sorted(broadcaster.clients, key=lambda slot: slot.metrics.client_id)
+    return {
+        "frames_received": broadcaster.frames_received,
+        "heartbeats_received": broadcaster.heartbeats_received,
+        "malformed_received": broadcaster.malformed_received,
+        "dropped_received": broadcaster.dropped_received,
+        "ring": dict(broadcaster.consumer.ring.stats),
+        "clients": [slot.metrics.as_dict(slot) for slot in clients],
+    }
 
 @app.get("/stats")
 async def get_vehicle_stats(
+   request: Request,
    start_date: str | None = None,
    end_date: str | None = None,
+   granularity: Literal["minute", "hour", "day"] = "hour",
 ):
-   conn = sqlite3.connect('traffic.db')
-   cursor = conn.cursor()
-   
-   query = '''
-       SELECT 
-           strftime('%Y-%m-%d %H:00', timestamp, 'localtime') as full_timestamp,
-           COUNT(*) as total_vehicles,
-           SUM(CASE WHEN is_red_light_runner = 1 THEN 1 ELSE 0 END) as red_light_runners
-       FROM vehicle_tracking
-       WHERE datetime(timestamp, "localtime") BETWEEN datetime(?, "00:00:00") AND datetime(?, "23:59:59")
-   '''
-   
-   params = [start_date, end_date]
-   
-   query += '''
-       GROUP BY strftime('%Y-%m-%d %H', timestamp, 'localtime')
-       ORDER BY timestamp ASC
-   '''
-   
-   cursor.execute(query, params)
-   results = cursor.fetchall()
-   
-   stats = [
-       {
-           "hour": datetime.strptime(row[0], '%Y-%m-%d %H:00').strftime('%m-%d %I%p').replace(' 0', ' '),
-           "total_vehicles": row[1],
-           "red_light_runners": row[2]
+   if start_date is None or end_date is None:
+       return {
+           "hourly_stats": [],
+           "summary": {"total_vehicles": 0, "total_red_light_runners": 0}
        }
-       for row in results
-   ]
-   
+
+   try:
+       start, end = local_date_bounds(start_date, end_date)
+   except ValueError:
+       raise HTTPException(status_code=400, detail="Dates must be formatted as YYYY-MM-DD")
+
+   # Any commit by the detector moves the watermark, so the ETag only
+   # matches while nothing has been written since it was issued
+   watermark = ingest_watermark.read()
+   etag = f'"{watermark:x}-{granularity}-{start}-{end}"'
+   headers = {"ETag": etag, "Cache-Control": "no-cache"}
+   if_none_match = request.headers.get("if-none-match", "")
+   if etag in (tag.strip() for tag in if_none_match.split(",")):
+       return Response(status_code=304, headers=headers)
+
+   cache_key = (start, end, granularity)
+   content = stats_cache.get(cache_key, watermark)
+   if content is None:
+       content = await build_vehicle_stats(start, end, granularity)
+       stats_cache.put(cache_key, watermark, content)
+
+   return JSONResponse(content=content, headers=headers)
+
+async def build_vehicle_stats(start: int, end: int, granularity: str) -> dict:
+   # Read the pre-aggregated tier, one row per bucket in the range
+   results = await read_pool.run(query_rollups, granularity, start, end, label=f"stats_{granularity}")
+
+   label_format = STAT_LABEL_FORMATS[granularity]
+   stats = []
+   total_vehicles = 0
+   total_red_light_runners = 0
+   for bucket, vehicles, runners in results:
+       stats.append({
+           "hour": datetime.fromtimestamp(bucket).strftime(label_format).replace(' 0', ' '),
+           "total_vehicles": vehicles,
+           "red_light_runners": runners
+       })
+       total_vehicles += vehicles
+       total_red_light_runners += runners
+
+   # "hourly_stats" is kept as the key for every granularity so existing
+   # dashboard code keeps working
    return {
        "hourly_stats": stats,
        "summary": {
-           "total_vehicles": sum(s["total_vehicles"] for s in stats),
-           "total_red_light_runners": sum(s["red_light_runners"] for s in stats)
+           "total_vehicles": total_vehicles,
+           "total_red_light_runners": total_red_light_runners
        }
    }
 
+def encode_export_cursor(ts: int, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{ts}:{row_id}".encode()).decode().rstrip("=")
+
+def decode_export_cursor(token: str) -> tuple[int, int]:
+    padded = token + "=" * (-len(token) % 4)
+    ts, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split(":")
+    return int(ts), int(row_id)
+
+def format_export_rows(rows, export_format: str) -> str:
+    records = [
+        {
+            "id": row_id,
+            "ts": ts,
+            "time": datetime.fromtimestamp(ts).isoformat(),
+            "vehicle_count": vehicle_count,
+            "is_red_light_runner": bool(is_runner),
+            "cursor": encode_export_cursor(ts, row_id),
+        }
+        for row_id, ts, vehicle_count, is_runner in rows
+    ]
+    if export_format == "ndjson":
+        return "".join(json.dumps(record) + "\n" for record in records)
+    buffer = io.StringIO()
+    csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS).writerows(records)
+    return buffer.getvalue()
+
+@app.get("/events/export")
+async def export_events(
+    start_date: str,
+    end_date: str,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    cursor: str | None = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+    runners_only: bool = False,
+):
+    """Stream raw vehicle events in (ts, id) order.
+
+    Every record carries a ``cursor`` token; pass the last one received back
+    as ``cursor`` to resume an interrupted export right after that record.
+    Answers 409 while the range still has rows migrate_db.py hasn't converted.
+    """
+    try:
+        start, end = local_date_bounds(start_date, end_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be formatted as YYYY-MM-DD")
+    try:
+        after = decode_export_cursor(cursor) if cursor else (start - 1, 0)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    chunk_size = max(1, min(chunk_size, EXPORT_MAX_CHUNK_SIZE))
+    # Pages are read by ts, which legacy rows don't have yet
+    if await read_pool.run(has_unmigrated_events, start, end, label="export_check"):
+        raise HTTPException(
+            status_code=409,
+            detail="Some events in this range predate the ts column, run basic_pipelines/migrate_db.py first",
+        )
+
+    async def stream_pages():
+        nonlocal after
+        if format == "csv":
+            yield ",".join(EXPORT_FIELDS) + "\r\n"
+        while True:
+            rows = await read_pool.run(
+                fetch_events_page, start, end, after, chunk_size, runners_only, label="export_page"
+            )
+            if not rows:
+                break
+            yield format_export_rows(rows, format)
+            after = (rows[-1][1], rows[-1][0])
+            if len(rows) < chunk_size:
+                break
+
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    filename = f"vehicle_events_{start_date}_{end_date}.{format}"
+    return StreamingResponse(
+        stream_pages(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.get("/db/stats")
+async def get_db_stats():
+    """Per-query timing for the read connection pool."""
+    return {
+        "pool_size": read_pool.size,
+        "max_concurrency": read_pool.max_concurrency,
+        "queries": read_pool.get_stats(),
+        "stats_cache": {"hits": stats_cache.hits, "misses": stats_cache.misses},
+    }
+
 @app.get("/images")
 async def get_images():
     """Endpoint to retrieve the last 15 base64-encoded images from the red_light_runners directory."""
@@ -21,7 +21,25 @@ echo "Running tests..."
 pytest --log-cli-level=INFO \
        "$TESTS_DIR/test_sanity_check.py" \
        "$TESTS_DIR/test_hailo_rpi5_examples.py" \
-       "$TESTS_DIR/test_edge_cases.py"
+       "$TESTS_DIR/test_edge_cases.py" \
+       "$TESTS_DIR/test_database_manager.py" \
+       "$TESTS_DIR/test_frame_ring.py" \
+       "$TESTS_DIR/test_analytics_worker.py" \
+       "$TESTS_DIR/test_evidence_store.py" \
+       "$TESTS_DIR/test_read_pool.py" \
+       "$TESTS_DIR/test_retention.py" \
+       "$TESTS_DIR/test_stats_cache.py" \
+       "$TESTS_DIR/test_export.py" \
+       "$TESTS_DIR/test_frame_broadcaster.py" \
+       "$TESTS_DIR/test_frame_slot.py" \
+       "$TESTS_DIR/test_change_gate.py" \
+       "$TESTS_DIR/test_frame_payload.py" \
+       "$TESTS_DIR/test_stream_overlay.py" \
+       "$TESTS_DIR/test_zone_labels.py" \
+       "$TESTS_DIR/test_light_state.py" \
+       "$TESTS_DIR/test_vehicle_tracking.py" \
+       "$TESTS_DIR/test_frame_processing.py" \
+       "$TESTS_DIR/test_evidence_writer.py"
        # "$TESTS_DIR/test_advanced.py"
 
 echo "All tests completed."
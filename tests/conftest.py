@@ -0,0 +1,6 @@
+# tests/conftest.py
+import os
+import sys
+
+# The pipeline modules import each other by bare name, as when run from basic_pipelines/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'basic_pipelines'))
@@ -0,0 +1,93 @@
+# tests/test_analytics_worker.py
+import threading
+import time
+
+import pytest
+
+from analytics_worker import AnalyticsWorker
+
+
+class BlockingHandler:
+    """Records items and holds the worker inside the first one until released."""
+
+    def __init__(self):
+        self.items = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, item):
+        self.items.append(item)
+        self.started.set()
+        assert self.release.wait(5)
+
+
+@pytest.fixture
+def handler():
+    handler = BlockingHandler()
+    yield handler
+    handler.release.set()
+
+
+def test_full_queue_drops_the_oldest_items(handler):
+    worker = AnalyticsWorker(handler, max_queue_size=2, stats_interval=0)
+    assert worker.submit(0)
+    assert handler.started.wait(5)
+
+    # The worker is busy with 0, so the queue holds two and the rest push out older ones
+    assert [worker.submit(i) for i in range(1, 6)] == [True, True, False, False, False]
+    stats = worker.get_stats()
+    assert stats['submitted'] == 6
+    assert stats['dropped'] == 3
+    assert stats['queue_depth'] == 2
+    assert stats['max_queue_depth'] == 2
+
+    handler.release.set()
+    worker.close()
+    assert handler.items == [0, 4, 5]
+    stats = worker.get_stats()
+    assert stats['processed'] == 3
+    assert stats['queue_depth'] == 0
+    assert stats['avg_handler_ms'] > 0
+
+
+def test_close_processes_what_is_queued(handler):
+    worker = AnalyticsWorker(handler, max_queue_size=4, stats_interval=0)
+    worker.submit('a')
+    assert handler.started.wait(5)
+    worker.submit('b')
+    worker.submit('c')
+    handler.release.set()
+    worker.close()
+    assert handler.items == ['a', 'b', 'c']
+    assert worker.get_stats()['dropped'] == 0
+    assert not worker._thread.is_alive()
+
+
+def test_handler_errors_are_counted_and_the_worker_carries_on():
+    seen = []
+
+    def handler(item):
+        if item == 'bad':
+            raise RuntimeError("boom")
+        seen.append(item)
+
+    worker = AnalyticsWorker(handler, max_queue_size=4, stats_interval=0)
+    for item in ('first', 'bad', 'last'):
+        worker.submit(item)
+        time.sleep(0.01)
+    worker.close()
+    assert seen == ['first', 'last']
+    stats = worker.get_stats()
+    assert stats['errors'] == 1
+    assert stats['processed'] == 3
+
+
+def test_probe_times_are_reported_in_microseconds():
+    worker = AnalyticsWorker(lambda item: None, stats_interval=0)
+    worker.record_probe_time(0.000010)
+    worker.record_probe_time(0.000030)
+    worker.close()
+    stats = worker.get_stats()
+    assert stats['probe_calls'] == 2
+    assert stats['avg_probe_us'] == pytest.approx(20)
+    assert stats['max_probe_us'] == pytest.approx(30)
@@ -0,0 +1,68 @@
+# tests/test_change_gate.py
+import time
+
+import numpy as np
+
+from frame_publisher import ChangeGate
+
+FRAME, HEARTBEAT = ChangeGate.FRAME, ChangeGate.HEARTBEAT
+
+
+def scene(level=100):
+    return np.full((360, 640, 3), level, dtype=np.uint8)
+
+
+def metadata(**changes):
+    return {'light_status': 'Green Light', 'frame_count': 1, 'vehicles': [], **changes}
+
+
+def gate(**kwargs):
+    kwargs.setdefault('keyframe_interval', 60.0)
+    kwargs.setdefault('heartbeat_interval', 60.0)
+    return ChangeGate(**kwargs)
+
+
+def test_first_frame_is_sent_and_a_static_scene_is_suppressed():
+    g = gate()
+    assert g.decide(scene(), metadata()) == FRAME
+    assert g.decide(scene(), metadata()) is None
+
+
+def test_static_scene_sends_heartbeats_at_the_interval():
+    g = gate(heartbeat_interval=0.05)
+    assert g.decide(scene(), metadata()) == FRAME
+    assert g.decide(scene(), metadata()) is None
+    time.sleep(0.06)
+    assert g.decide(scene(), metadata()) == HEARTBEAT
+    assert g.decide(scene(), metadata()) is None
+
+
+def test_a_changed_picture_is_sent():
+    g = gate(threshold=2.0)
+    g.decide(scene(100), metadata())
+    assert g.decide(scene(101), metadata()) is None
+    assert g.decide(scene(110), metadata()) == FRAME
+
+
+def test_slow_drift_adds_up_against_the_last_sent_frame():
+    g = gate(threshold=2.0)
+    g.decide(scene(100), metadata())
+    decisions = [g.decide(scene(100 + step), metadata()) for step in range(1, 5)]
+    assert decisions == [None, None, FRAME, None]
+
+
+def test_only_non_volatile_metadata_counts_as_a_change():
+    g = gate()
+    g.decide(scene(), metadata())
+    assert g.decide(scene(), metadata(frame_count=2, vehicles=[{'id': 1}], captured_at=5.0)) is None
+    assert g.decide(scene(), metadata(light_status='Red Light')) == FRAME
+
+
+def test_forced_and_periodic_keyframes():
+    g = gate(keyframe_interval=0.05)
+    g.decide(scene(), metadata())
+    g.force_keyframe()
+    assert g.decide(scene(), metadata()) == FRAME
+    assert g.decide(scene(), metadata()) is None
+    time.sleep(0.06)
+    assert g.decide(scene(), metadata()) == FRAME
@@ -0,0 +1,190 @@
+# tests/test_database_manager.py
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+import database_utils
+from database_utils import (
+    ROLLUP_TABLES,
+    DatabaseManager,
+    EvidenceRecord,
+    bucket_start,
+)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for the database writer")
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / 'traffic.db'
+
+
+def query(db_path, sql, *args):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql, args).fetchall()
+    finally:
+        conn.close()
+
+
+def evidence(track_id):
+    return EvidenceRecord(1700000000 + track_id, track_id, f"/evidence/{track_id}.jpg", 1000,
+                          f"/evidence/thumbnails/{track_id}.jpg", 100, 640, 640)
+
+
+def test_full_batches_commit_without_waiting_for_the_interval(db_path):
+    manager = DatabaseManager(db_path, batch_size=5, flush_interval=60)
+    try:
+        for i in range(12):
+            assert manager.record_vehicle(is_runner=i % 2 == 0)
+        wait_for(lambda: manager.get_stats()['written'] == 10)
+        stats = manager.get_stats()
+        assert stats['commits'] == 2
+        assert stats['enqueued'] == 12
+        assert query(db_path, 'SELECT COUNT(*) FROM vehicle_tracking') == [(10,)]
+    finally:
+        manager.close()
+    # The partial batch is flushed on close
+    assert manager.get_stats()['written'] == 12
+    assert manager.get_stats()['commits'] == 3
+
+
+def test_close_flushes_queued_rows(db_path):
+    manager = DatabaseManager(db_path, batch_size=100, flush_interval=60)
+    for _ in range(3):
+        manager.record_vehicle(is_runner=True)
+    manager.close()
+    assert query(db_path, 'SELECT COUNT(*), SUM(is_red_light_runner) FROM vehicle_tracking') == [(3, 3)]
+    assert query(db_path, 'SELECT COUNT(*) FROM vehicle_tracking WHERE ts IS NULL') == [(0,)]
+    stats = manager.get_stats()
+    assert stats['written'] == 3
+    assert stats['queue_depth'] == 0
+
+
+def test_rollups_are_upserted_per_bucket(db_path):
+    manager = DatabaseManager(db_path)
+    manager.close()
+    moment = datetime(2024, 5, 17, 8, 30, 15)
+    conn = sqlite3.connect(db_path)
+    try:
+        manager._commit_batch(conn, [(moment, True), (moment, False)])
+        manager._commit_batch(conn, [(moment.replace(second=45), True)])
+    finally:
+        conn.close()
+
+    for granularity, table in ROLLUP_TABLES.items():
+        assert query(db_path, f'SELECT bucket_start, total_vehicles, red_light_runners FROM {table}') == [
+            (bucket_start(moment, granularity), 3, 2)
+        ]
+
+
+def test_rollups_match_raw_events(db_path):
+    manager = DatabaseManager(db_path, batch_size=4, flush_interval=0.05)
+    for i in range(10):
+        manager.record_vehicle(is_runner=i < 3)
+    manager.close()
+    for table in ROLLUP_TABLES.values():
+        assert query(db_path, f'SELECT SUM(total_vehicles), SUM(red_light_runners) FROM {table}') == [(10, 3)]
+
+
+def test_full_queue_drops_and_counts(db_path):
+    manager = DatabaseManager(db_path, max_queue_size=2, flush_interval=0.01)
+    started, release = threading.Event(), threading.Event()
+
+    def stall(conn):
+        started.set()
+        release.wait(5)
+
+    # Hold the writer thread in maintenance so the queue can't drain
+    manager.add_maintenance_task(stall, 0)
+    try:
+        assert started.wait(5)
+        results = [manager.record_vehicle() for _ in range(5)]
+        assert results == [True, True, False, False, False]
+        assert not manager.record_evidence(evidence(1))
+        assert not manager.delete_evidence(['/evidence/1.jpg'])
+        stats = manager.get_stats()
+        assert stats['enqueued'] == 2
+        assert stats['dropped'] == 5
+        assert (stats['dropped_vehicle'], stats['dropped_evidence'], stats['dropped_deletion']) == (3, 1, 1)
+        assert stats['queue_depth'] == 2
+    finally:
+        release.set()
+        manager._maintenance_tasks.clear()
+        manager.close()
+    assert manager.get_stats()['written'] == 2
+    assert query(db_path, 'SELECT COUNT(*) FROM vehicle_tracking') == [(2,)]
+
+
+def test_evidence_rows_are_inserted_and_deleted_in_order(db_path):
+    manager = DatabaseManager(db_path, batch_size=100, flush_interval=60)
+    manager.record_evidence(evidence(1))
+    manager.record_evidence(evidence(2))
+    # Added and evicted within the same batch
+    manager.delete_evidence([evidence(1).image_path])
+    manager.close()
+
+    assert query(db_path, 'SELECT track_id, image_path, image_bytes FROM violation_evidence') == [
+        (2, '/evidence/2.jpg', 1000)
+    ]
+    stats = manager.get_stats()
+    assert stats['evidence_written'] == 2
+    assert stats['written'] == 0
+
+
+def test_evidence_only_batches_leave_the_watermark_alone(db_path):
+    manager = DatabaseManager(db_path, batch_size=100, flush_interval=60)
+    manager.record_evidence(evidence(1))
+    manager.close()
+    assert manager.watermark.read() == 0
+
+    manager = DatabaseManager(db_path, batch_size=100, flush_interval=60)
+    manager.record_vehicle()
+    manager.close()
+    assert manager.watermark.read() > 0
+
+
+def count_bumps(manager):
+    bumps = []
+    bump = manager.watermark.bump
+    manager.watermark.bump = lambda: bumps.append(None) or bump()
+    return bumps
+
+
+def test_watermark_writes_are_throttled_and_the_last_change_is_kept(db_path):
+    manager = DatabaseManager(db_path, batch_size=1, flush_interval=60)
+    bumps = count_bumps(manager)
+    for _ in range(20):
+        manager.record_vehicle()
+    wait_for(lambda: manager.get_stats()['written'] == 20)
+    before_close = manager.watermark.read()
+    manager.close()
+    assert manager.get_stats()['commits'] > 2
+    # One write for the first commit, one on close for everything after it
+    assert len(bumps) <= 2
+    assert manager.watermark.read() >= before_close > 0
+
+
+def test_a_throttled_change_is_written_once_the_interval_passes(db_path, monkeypatch):
+    monkeypatch.setattr(database_utils, 'WATERMARK_MIN_INTERVAL', 0.2)
+    manager = DatabaseManager(db_path, batch_size=1, flush_interval=60)
+    bumps = count_bumps(manager)
+    try:
+        manager.record_vehicle()
+        wait_for(lambda: len(bumps) == 1)
+        manager.record_vehicle()
+        wait_for(lambda: manager.get_stats()['written'] == 2)
+        # Without waiting for close
+        wait_for(lambda: len(bumps) == 2)
+    finally:
+        manager.close()
+    assert len(bumps) == 2
@@ -0,0 +1,130 @@
+# tests/test_evidence_store.py
+import os
+import time
+from datetime import datetime
+
+import pytest
+
+from evidence_store import TIMESTAMP_FORMAT, EvidenceStore
+
+# load() ages entries against the clock, and file names only keep whole seconds
+NOW = float(int(time.time()))
+DAY = 86400
+
+
+def evidence_name(ts, track_id):
+    return f"{datetime.fromtimestamp(ts).strftime(TIMESTAMP_FORMAT)}_red_light_runner_id_{track_id}.jpg"
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    output_dir = tmp_path / 'red_light_runners'
+    thumbnail_dir = output_dir / 'thumbnails'
+    thumbnail_dir.mkdir(parents=True)
+    return str(output_dir), str(thumbnail_dir)
+
+
+def make_store(dirs, **limits):
+    return EvidenceStore(*dirs, **limits)
+
+
+def names(entries):
+    return [entry.name for entry in entries]
+
+
+def test_byte_quota_evicts_the_oldest(dirs):
+    store = make_store(dirs, max_bytes=250)
+    assert store.add(NOW, 'a.jpg', 100) == []
+    assert store.add(NOW + 1, 'b.jpg', 100) == []
+    assert names(store.add(NOW + 2, 'c.jpg', 100)) == ['a.jpg']
+    assert names(store.entries) == ['b.jpg', 'c.jpg']
+    assert store.total_bytes == 200
+    assert store.evicted == 1
+
+
+def test_file_count_limit(dirs):
+    store = make_store(dirs, max_files=2)
+    for i in range(5):
+        store.add(NOW + i, f'{i}.jpg', 10)
+    assert names(store.entries) == ['3.jpg', '4.jpg']
+    assert store.total_bytes == 20
+    assert store.evicted == 3
+
+
+def test_age_limit(dirs):
+    store = make_store(dirs, max_age_days=1)
+    store.add(NOW - DAY // 2, 'a.jpg', 10)
+    store.add(NOW - DAY // 4, 'b.jpg', 10)
+    assert store.enforce(now=NOW) == []
+    assert names(store.enforce(now=NOW + DAY * 5 // 8)) == ['a.jpg']
+    assert names(store.entries) == ['b.jpg']
+
+
+def test_the_newest_image_is_kept_even_over_quota(dirs):
+    store = make_store(dirs, max_bytes=50)
+    store.add(NOW, 'a.jpg', 10)
+    assert names(store.add(NOW + 1, 'big.jpg', 100)) == ['a.jpg']
+    assert names(store.entries) == ['big.jpg']
+    # Without keep_newest the quota holds for everything
+    assert names(store.enforce(now=NOW)) == ['big.jpg']
+    assert store.total_bytes == 0
+
+
+def test_same_second_overwrite_replaces_the_entry(dirs):
+    store = make_store(dirs)
+    store.add(NOW, 'a.jpg', 100)
+    store.add(NOW, 'a.jpg', 40)
+    assert names(store.entries) == ['a.jpg']
+    assert store.total_bytes == 40
+
+
+def write_file(path, nbytes):
+    with open(path, 'wb') as f:
+        f.write(b'\0' * nbytes)
+
+
+def test_load_indexes_evidence_in_capture_order(dirs):
+    output_dir, thumbnail_dir = dirs
+    newer = evidence_name(NOW - 60, 2)
+    older = evidence_name(NOW - 120, 7)
+    for name, size in ((newer, 300), (older, 200)):
+        write_file(os.path.join(output_dir, name), size)
+        write_file(os.path.join(thumbnail_dir, name), 30)
+    # Only the full image of this one survived
+    no_thumb = evidence_name(NOW - 30, 3)
+    write_file(os.path.join(output_dir, no_thumb), 100)
+
+    store = make_store(dirs)
+    assert store.load() == []
+    assert names(store.entries) == [older, newer, no_thumb]
+    assert [entry.ts for entry in store.entries] == [NOW - 120, NOW - 60, NOW - 30]
+    assert store.total_bytes == 230 + 330 + 100
+
+
+def test_load_skips_files_it_did_not_write(dirs):
+    output_dir, _ = dirs
+    name = evidence_name(NOW - 60, 1)
+    write_file(os.path.join(output_dir, name), 10)
+    for other in ('junk.jpg', 'notes.txt', name + '.tmp', 'Screenshot 2026-10-18.JPG',
+                  '2026-13-40 00-00-00_red_light_runner_id_1.jpg'):
+        write_file(os.path.join(output_dir, other), 10)
+    os.mkdir(os.path.join(output_dir, evidence_name(NOW, 9)))
+
+    store = make_store(dirs, max_files=0)
+    assert names(store.load()) == [name]
+    assert len(store.entries) == 0
+    # Nothing that was skipped is ever a candidate for deletion
+    assert 'junk.jpg' in os.listdir(output_dir)
+
+
+def test_load_applies_the_limits(dirs):
+    output_dir, _ = dirs
+    stale = evidence_name(NOW - 10 * DAY, 1)
+    kept = [evidence_name(NOW - 3600 * i, i) for i in (3, 2, 1)]
+    for name in [stale] + kept:
+        write_file(os.path.join(output_dir, name), 10)
+
+    store = make_store(dirs, max_age_days=7, max_files=2)
+    assert names(store.load()) == [stale, kept[0]]
+    assert names(store.entries) == kept[1:]
+    assert store.total_bytes == 20
@@ -0,0 +1,151 @@
+# tests/test_evidence_writer.py
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import evidence_writer
+from evidence_writer import EvidenceWriter
+
+
+class RecordingDatabase:
+    """Stands in for DatabaseManager, keeping the rows it is handed."""
+
+    def __init__(self):
+        self.records = []
+        self.deleted = []
+        self.lock = threading.Lock()
+
+    def record_evidence(self, record):
+        with self.lock:
+            self.records.append(record)
+        return True
+
+    def delete_evidence(self, image_paths):
+        self.deleted.extend(image_paths)
+        return True
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out waiting for the evidence writer")
+        time.sleep(0.01)
+
+
+def frame(level=128):
+    return np.full((120, 160, 3), level, dtype=np.uint8)
+
+
+@pytest.fixture
+def writer(tmp_path):
+    writers = []
+
+    def make(**kwargs):
+        kwargs.setdefault('fsync_batch', 3)
+        kwargs.setdefault('fsync_interval', 60.0)
+        db = RecordingDatabase()
+        w = EvidenceWriter(str(tmp_path / 'red_light_runners'), db, thumbnail_width=40, **kwargs)
+        writers.append(w)
+        return w, db
+
+    yield make
+    for w in writers:
+        w.close()
+
+
+def moment(second):
+    return datetime(2024, 1, 1, 12, 0, second)
+
+
+def test_rows_are_recorded_only_once_a_batch_is_fsynced(writer, monkeypatch):
+    synced = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(evidence_writer.os, 'fsync', lambda fd: synced.append(fd) or real_fsync(fd))
+    w, db = writer()
+    w.submit(frame(), 1, moment(1))
+    w.submit(frame(), 2, moment(2))
+    time.sleep(0.2)
+    assert db.records == [] and synced == []
+
+    w.submit(frame(), 3, moment(3))
+    wait_for(lambda: len(db.records) == 3)
+    # Six files plus the two directories, in one batch
+    assert len(synced) == 8
+    assert w.get_stats()['fsyncs'] == 1
+    for record in db.records:
+        assert os.path.getsize(record.image_path) == record.image_bytes
+        assert os.path.getsize(record.thumbnail_path) == record.thumbnail_bytes
+        assert (record.width, record.height) == (160, 120)
+
+
+def test_close_writes_out_a_partial_batch_without_waiting_for_the_interval(writer):
+    w, db = writer()
+    w.submit(frame(), 1, moment(1))
+    # Let the writer take the image and go back to waiting on the queue
+    wait_for(lambda: w.get_stats()['queue_depth'] == 0)
+    time.sleep(0.1)
+    start = time.monotonic()
+    w.close()
+    assert time.monotonic() - start < 2.0
+    assert [r.track_id for r in db.records] == [1]
+    assert os.path.exists(db.records[0].image_path)
+    assert w.get_stats()['written'] == 1
+
+
+def test_a_failed_write_does_not_hold_up_the_queue(writer, monkeypatch):
+    w, db = writer(fsync_batch=1)
+    real_write_file = w._write_file
+    failures = iter([True])
+
+    def flaky_write_file(path, data):
+        if next(failures, False):
+            raise OSError(28, 'No space left on device')
+        return real_write_file(path, data)
+
+    monkeypatch.setattr(w, '_write_file', flaky_write_file)
+    w.submit(frame(), 1, moment(1))
+    w.submit(np.zeros((0, 0, 3), dtype=np.uint8), 2, moment(2))  # cv2 can't encode this
+    w.submit(frame(), 3, moment(3))
+    w.close()
+    assert [r.track_id for r in db.records] == [3]
+    stats = w.get_stats()
+    assert (stats['failed'], stats['written']) == (2, 1)
+
+
+def test_a_failed_fsync_records_nothing_for_that_batch(writer, monkeypatch):
+    real_fsync = os.fsync
+    failures = iter([True])
+
+    def flaky_fsync(fd):
+        if next(failures, False):
+            raise OSError(5, 'I/O error')
+        real_fsync(fd)
+
+    monkeypatch.setattr(evidence_writer.os, 'fsync', flaky_fsync)
+    w, db = writer(fsync_batch=1)
+    w.submit(frame(), 1, moment(1))
+    wait_for(lambda: w.get_stats()['failed'] == 1)
+    w.submit(frame(), 2, moment(2))
+    w.close()
+    assert [r.track_id for r in db.records] == [2]
+    assert w.get_stats()['written'] == 1
+
+
+def test_a_full_queue_drops_instead_of_blocking(writer, monkeypatch):
+    release = threading.Event()
+    w, db = writer(max_queue_size=1, fsync_batch=1)
+    real_write = w._write
+    monkeypatch.setattr(w, '_write', lambda item: release.wait() and real_write(item))
+    w.submit(frame(), 1, moment(1))
+    wait_for(lambda: w.get_stats()['queue_depth'] == 0)
+    assert w.submit(frame(), 2, moment(2))
+    assert not w.submit(frame(), 3, moment(3))
+    release.set()
+    w.close()
+    assert [r.track_id for r in db.records] == [1, 2]
+    assert w.get_stats()['dropped'] == 1
@@ -0,0 +1,70 @@
+# tests/test_frame_broadcaster.py
+import asyncio
+import json
+
+import zmq
+
+import main
+from frame_bus import KIND_FRAME, KIND_RING_FRAME, build_header
+from frame_ring import FrameRingReader
+
+
+class ListConsumer:
+    """Stands in for FrameConsumer, replaying a fixed list of messages."""
+
+    def __init__(self, messages, ring_path):
+        self.messages = list(messages)
+        self.ring = FrameRingReader(ring_path)
+        self.subscribed = set()
+
+    def subscribe(self, rendition):
+        self.subscribed.add(rendition)
+
+    def unsubscribe(self, rendition):
+        self.subscribed.discard(rendition)
+
+    async def receive_frame(self):
+        if not self.messages:
+            # Ends FrameBroadcaster.run once everything was replayed
+            raise asyncio.CancelledError
+        return self.messages.pop(0)
+
+
+def message(topic=b'full', kind=KIND_FRAME, metadata=None, frame=b'jpeg'):
+    if metadata is None:
+        metadata = json.dumps({'frame_count': 1}).encode()
+    return [zmq.Frame(part) for part in (topic, build_header(kind), metadata, frame)]
+
+
+def replay(messages, tmp_path):
+    broadcaster = main.FrameBroadcaster(ListConsumer(messages, str(tmp_path / 'ring')))
+    metrics = main.ClientMetrics(1, 'test', 'json', 0, 0)
+
+    async def run():
+        slot = broadcaster.register('full', metrics)
+        try:
+            await broadcaster.run()
+        except asyncio.CancelledError:
+            pass
+        return slot
+
+    return broadcaster, asyncio.run(run())
+
+
+def test_messages_that_fail_to_parse_are_dropped_and_the_loop_carries_on(tmp_path):
+    broadcaster, slot = replay([
+        message(topic=b'\xff\xfe'),  # not UTF-8
+        message(kind=KIND_RING_FRAME, frame=b'short'),  # ring reference of the wrong length
+        message(frame=b'good jpeg'),
+    ], tmp_path)
+    assert broadcaster.dropped_received == 2
+    assert broadcaster.frames_received == 1
+    assert bytes(slot._payload.frame) == b'good jpeg'
+
+
+def test_malformed_metadata_is_counted_separately(tmp_path):
+    broadcaster, slot = replay([message(metadata=b'not json'), message(metadata=b'[1, 2]')], tmp_path)
+    assert broadcaster.malformed_received == 2
+    assert broadcaster.dropped_received == 0
+    assert broadcaster.frames_received == 0
+    assert slot._payload is None
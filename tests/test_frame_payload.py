@@ -0,0 +1,71 @@
+# tests/test_frame_payload.py
+import base64
+import json
+
+import pytest
+
+from main import (
+    BINARY_FLAG_METADATA_ONLY,
+    BINARY_FRAME_HEADER,
+    BINARY_FRAME_VERSION,
+    FramePayload,
+    decode_metadata,
+)
+
+METADATA = json.dumps({'frame_count': 7, 'captured_at': 1700000000.5}).encode()
+
+
+def payload(frame=b'\xff\xd8jpeg\xff\xd9'):
+    text, captured_at = decode_metadata(METADATA)
+    return FramePayload(METADATA, text, memoryview(frame) if frame is not None else None, captured_at)
+
+
+def test_decode_metadata():
+    assert decode_metadata(METADATA) == (METADATA.decode(), 1700000000.5)
+    assert decode_metadata(b'{"frame_count": 1}') == ('{"frame_count": 1}', None)
+
+
+@pytest.mark.parametrize('raw', [
+    b'\xff\xfe',  # not UTF-8
+    b'not json',
+    b'[1, 2]',  # not an object
+    b'{"captured_at": "soon"}',
+    b'{"captured_at": [1]}',
+])
+def test_decode_metadata_rejects_bad_input(raw):
+    assert decode_metadata(raw) is None
+
+
+def test_json_encoding_splices_in_the_metadata():
+    message = json.loads(payload().json_text)
+    assert message['metadata'] == json.loads(METADATA)
+    assert base64.b64decode(message['frame']) == b'\xff\xd8jpeg\xff\xd9'
+
+
+def test_binary_encoding():
+    data = payload().binary
+    version, flags, length = BINARY_FRAME_HEADER.unpack_from(data)
+    assert (version, flags) == (BINARY_FRAME_VERSION, 0)
+    body = data[BINARY_FRAME_HEADER.size:]
+    assert body[:length] == METADATA
+    assert body[length:] == b'\xff\xd8jpeg\xff\xd9'
+
+
+def test_heartbeats_carry_metadata_only():
+    heartbeat = payload(frame=None)
+    assert heartbeat.is_heartbeat
+    assert json.loads(heartbeat.json_text) == {'metadata': json.loads(METADATA), 'frame': None}
+    _, flags, length = BINARY_FRAME_HEADER.unpack_from(heartbeat.binary)
+    assert flags == BINARY_FLAG_METADATA_ONLY
+    assert len(heartbeat.binary) == BINARY_FRAME_HEADER.size + length
+
+
+def test_encodings_are_built_once_and_shared():
+    p = payload()
+    assert p.json_text is p.json_text
+    assert p.binary is p.binary
+
+
+def test_age_is_zero_without_a_capture_time():
+    assert FramePayload(b'{}', '{}', None).age_ms() == 0.0
+    assert payload().age_ms() > 0
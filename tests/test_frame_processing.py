@@ -0,0 +1,139 @@
+# tests/test_frame_processing.py
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+# frame_processing needs the GStreamer bindings and the Hailo runtime
+pytest.importorskip('gi')
+pytest.importorskip('hailo')
+
+import detection
+import frame_processing
+from frame_processing import DETECTION_DTYPE, FrameProcessor
+
+
+class FakeBBox:
+    def __init__(self, xmin, ymin, xmax, ymax):
+        self.corners = (xmin, ymin, xmax, ymax)
+
+    def xmin(self):
+        return self.corners[0]
+
+    def ymin(self):
+        return self.corners[1]
+
+    def xmax(self):
+        return self.corners[2]
+
+    def ymax(self):
+        return self.corners[3]
+
+
+class FakeDetection:
+    def __init__(self, label, confidence, corners):
+        self.label, self.confidence, self.bbox = label, confidence, FakeBBox(*corners)
+        self.reads = 0
+
+    def get_label(self):
+        self.reads += 1
+        return self.label
+
+    def get_confidence(self):
+        return self.confidence
+
+    def get_bbox(self):
+        return self.bbox
+
+
+@pytest.fixture
+def roi(monkeypatch):
+    """Detections the next get_roi_from_buffer call returns."""
+    detections = []
+    fake_roi = SimpleNamespace(get_objects_typed=lambda kind: list(detections))
+    monkeypatch.setattr(frame_processing.hailo, 'get_roi_from_buffer', lambda buffer: fake_roi)
+    return detections
+
+
+def test_extracts_one_row_per_detection(roi):
+    roi.extend([
+        FakeDetection('car', 0.9, (0.1, 0.2, 0.3, 0.5)),
+        FakeDetection('person', 0.5, (0.0, 0.0, 0.5, 0.25)),
+        FakeDetection('car', 0.75, (0.5, 0.5, 1.0, 1.0)),
+    ])
+    processor = FrameProcessor()
+    detections = processor.extract_detections(object(), 640, 480)
+
+    assert detections.dtype == DETECTION_DTYPE
+    # Class ids are handed out as labels first show up
+    assert detections['class_id'].tolist() == [0, 1, 0]
+    assert processor.class_id('car') == 0 and processor.class_id('person') == 1
+    assert detections['confidence'].tolist() == pytest.approx([0.9, 0.5, 0.75])
+    assert detections['box'].tolist() == [[64, 96, 192, 240], [0, 0, 320, 120], [320, 240, 640, 480]]
+    assert detections['center'].tolist() == [[128, 168], [160, 60], [480, 360]]
+    assert [d.reads for d in roi] == [1, 1, 1]
+
+
+def test_boxes_truncate_like_the_old_int_conversion(roi):
+    corners = (0.1234, 0.5678, 0.9012, 0.3456)
+    roi.append(FakeDetection('car', 0.5, corners))
+    box = FrameProcessor().extract_detections(object(), 641, 359)['box'][0]
+    assert box.tolist() == [int(corners[0] * 641), int(corners[1] * 359), int(corners[2] * 641), int(corners[3] * 359)]
+
+
+def test_no_detections_gives_an_empty_array(roi):
+    detections = FrameProcessor().extract_detections(object(), 640, 480)
+    assert detections.dtype == DETECTION_DTYPE
+    assert len(detections) == 0
+
+
+def test_cars_in_watched_zones_are_kept(roi):
+    from config import DEFAULT_ZONES
+    from zone_manager import ZoneManager
+
+    roi.extend([
+        FakeDetection('car', 0.9, (390 / 640, 490 / 640, 410 / 640, 510 / 640)),  # in green_zone
+        FakeDetection('car', 0.9, (0.0, 0.0, 0.05, 0.05)),  # in no zone
+        FakeDetection('truck', 0.9, (390 / 640, 490 / 640, 410 / 640, 510 / 640)),
+    ])
+    processor = FrameProcessor()
+    cars, count = processor.process_detections(
+        processor.extract_detections(object(), 640, 640), ZoneManager(DEFAULT_ZONES)
+    )
+    assert count == 1
+    assert cars['center'].tolist() == [[400, 500]]
+
+
+class CallbackState(SimpleNamespace):
+    def increment(self):
+        pass
+
+
+@pytest.fixture
+def callback(monkeypatch):
+    """Runs app_callback on a 640x640 RGB buffer, returning how often detections were extracted."""
+    monkeypatch.setattr(detection, 'get_caps_from_pad', lambda pad: ('RGB', 640, 640))
+    processed = []
+    monkeypatch.setattr(detection, 'process_frame', lambda *args: processed.append(args))
+
+    def run(**state):
+        extracted = []
+        processor = SimpleNamespace(
+            extract_detections=lambda buffer, width, height: extracted.append(buffer) or np.zeros(0, DETECTION_DTYPE)
+        )
+        user_data = CallbackState(
+            publisher=object(), analytics_worker=None, frame_processor=processor, frame_count=0, **state
+        )
+        detection.app_callback(None, SimpleNamespace(get_buffer=object), user_data)
+        return len(extracted), len(processed)
+
+    return run
+
+
+def test_skipped_frames_are_not_extracted(callback):
+    # Python stream mode without --use-frame: nothing downstream looks at the frame
+    assert callback(use_frame=False, stream_mode='python') == (0, 0)
+
+
+def test_native_mode_extracts_for_the_metadata(callback):
+    assert callback(use_frame=False, stream_mode='native') == (1, 1)
@@ -0,0 +1,85 @@
+# tests/test_frame_ring.py
+import pytest
+
+from frame_ring import RING_REF, SLOT_HEADER, FrameRingReader, FrameRingWriter
+
+
+@pytest.fixture
+def ring_path(tmp_path):
+    return str(tmp_path / 'traffic_frames')
+
+
+@pytest.fixture
+def writer(ring_path):
+    writer = FrameRingWriter(ring_path, slot_count=4, slot_size=64)
+    yield writer
+    writer.close()
+
+
+def test_round_trip(writer, ring_path):
+    reader = FrameRingReader(ring_path)
+    ref = writer.write(b'jpeg bytes')
+    assert reader.read(ref) == b'jpeg bytes'
+    assert reader.read(writer.write(memoryview(b'second'))) == b'second'
+    assert reader.stats['read'] == 2
+    assert reader.stats['remaps'] == 1
+    reader.close()
+
+
+def test_oversized_frames_are_not_written(writer):
+    assert writer.write(b'x' * 65) is None
+    assert writer.write(b'x' * 64) is not None
+
+
+def test_wraparound_overwrites_the_oldest_slot(writer, ring_path):
+    reader = FrameRingReader(ring_path)
+    refs = [writer.write(bytes([i]) * 8) for i in range(6)]
+    slots = [RING_REF.unpack(ref)[1] for ref in refs]
+    assert slots == [0, 1, 2, 3, 0, 1]
+
+    # The first two slots have been reused, their old references are stale
+    assert reader.read(refs[0]) is None
+    assert reader.read(refs[1]) is None
+    assert [reader.read(ref) for ref in refs[2:]] == [bytes([i]) * 8 for i in range(2, 6)]
+    assert reader.stats['overwritten'] == 2
+    reader.close()
+
+
+def test_reader_drops_a_slot_being_written(writer, ring_path):
+    reader = FrameRingReader(ring_path)
+    ref = writer.write(b'frame')
+    _, index, seq = RING_REF.unpack(ref)
+    offset = writer._offset(index)
+    # What a reader sees while the writer is part way through the slot
+    SLOT_HEADER.pack_into(writer._map, offset, seq + 1, 0)
+    assert reader.read(ref) is None
+    assert reader.stats['overwritten'] == 1
+
+    # And once the writer has finished the next frame in that slot
+    SLOT_HEADER.pack_into(writer._map, offset, seq + 2, 5)
+    assert reader.read(ref) is None
+    assert reader.stats['overwritten'] == 2
+    reader.close()
+
+
+def test_reader_follows_a_restarted_writer(writer, ring_path):
+    reader = FrameRingReader(ring_path)
+    old_ref = writer.write(b'old')
+    assert reader.read(old_ref) == b'old'
+
+    restarted = FrameRingWriter(ring_path, slot_count=2, slot_size=32)
+    try:
+        assert reader.read(restarted.write(b'new')) == b'new'
+        assert reader.stats['remaps'] == 2
+        # References from the previous writer no longer resolve
+        assert reader.read(old_ref) is None
+        assert reader.stats['unavailable'] == 1
+    finally:
+        restarted.close(unlink=False)
+    reader.close()
+
+
+def test_missing_ring_is_unavailable(ring_path):
+    reader = FrameRingReader(ring_path)
+    assert reader.read(RING_REF.pack(1, 0, 2)) is None
+    assert reader.stats['unavailable'] == 1
@@ -0,0 +1,114 @@
+# tests/test_frame_slot.py
+import asyncio
+
+import pytest
+
+import main
+from main import (
+    SWITCH_COOLDOWN_FRAMES,
+    UPGRADE_AFTER_FRAMES,
+    AdaptiveRendition,
+    ClientMetrics,
+    FramePayload,
+    LatestFrameSlot,
+)
+
+SLOW_MS = 100.0
+FAST_MS = 1.0
+
+
+def frame(n):
+    return FramePayload(b'{}', f'{{"n": {n}}}', memoryview(b'jpeg'))
+
+
+def heartbeat(n):
+    return FramePayload(b'{}', f'{{"n": {n}}}', None)
+
+
+@pytest.fixture
+def slot():
+    return LatestFrameSlot('full', ClientMetrics(1, 'test', 'json', 0, 0))
+
+
+def take(slot):
+    return asyncio.run(slot.get())
+
+
+def test_the_newest_frame_wins(slot):
+    slot.put(frame(1))
+    slot.put(frame(2))
+    assert take(slot).metadata_text == '{"n": 2}'
+    assert slot.dropped == 1
+
+
+def test_heartbeats_never_displace_an_unsent_frame(slot):
+    slot.put(frame(1))
+    slot.put(heartbeat(2))
+    assert take(slot).metadata_text == '{"n": 1}'
+    assert slot.dropped == 0
+
+
+def test_replacing_a_heartbeat_is_not_a_drop(slot):
+    slot.put(heartbeat(1))
+    slot.put(heartbeat(2))
+    slot.put(frame(3))
+    assert take(slot).metadata_text == '{"n": 3}'
+    slot.put(heartbeat(4))
+    slot.put(heartbeat(5))
+    assert take(slot).metadata_text == '{"n": 5}'
+    assert slot.dropped == 0
+
+
+def test_nothing_is_dropped_once_taken(slot):
+    slot.put(frame(1))
+    take(slot)
+    slot.put(frame(2))
+    assert slot.dropped == 0
+
+
+def feed(quality, count, send_ms=FAST_MS, dropped=0):
+    """Record ``count`` sends and return the renditions switched to."""
+    return [r for r in (quality.update(send_ms, dropped) for _ in range(count)) if r]
+
+
+def test_no_switch_during_the_cooldown():
+    quality = AdaptiveRendition('full')
+    assert feed(quality, SWITCH_COOLDOWN_FRAMES, SLOW_MS) == []
+    assert feed(quality, 1, SLOW_MS) == ['half']
+
+
+def test_slow_sends_degrade_one_step_at_a_time_down_to_the_cheapest():
+    quality = AdaptiveRendition('full')
+    switches = feed(quality, 5 * (SWITCH_COOLDOWN_FRAMES + 1), SLOW_MS)
+    assert switches == main.RENDITION_NAMES[1:]
+    assert quality.rendition == main.RENDITION_NAMES[-1]
+
+
+def test_repeated_drops_degrade_but_a_single_one_does_not():
+    quality = AdaptiveRendition('full')
+    assert feed(quality, 3 * SWITCH_COOLDOWN_FRAMES, dropped=1) == []
+    assert feed(quality, 1, dropped=2) == ['half']
+
+
+def test_recovers_after_a_run_of_fast_sends_but_not_past_the_requested_rendition():
+    quality = AdaptiveRendition('half')
+    feed(quality, SWITCH_COOLDOWN_FRAMES + 1, SLOW_MS)
+    assert quality.rendition == 'low'
+    # The slow sends take a while to decay out of the smoothed time
+    switches = feed(quality, SWITCH_COOLDOWN_FRAMES + UPGRADE_AFTER_FRAMES + 20)
+    assert switches == ['half']
+    assert feed(quality, 5 * UPGRADE_AFTER_FRAMES) == []
+    assert quality.rendition == 'half'
+
+
+def test_a_moderate_send_time_resets_the_fast_streak():
+    quality = AdaptiveRendition('full')
+    quality.level = 1
+    quality.cooldown = 0
+    assert feed(quality, UPGRADE_AFTER_FRAMES - 10) == []
+    # Between the two thresholds, neither degrades nor counts as fast
+    assert feed(quality, 30, 20.0) == []
+    assert quality.fast_streak == 0
+    # So the next upgrade needs a whole new run of fast sends
+    assert feed(quality, UPGRADE_AFTER_FRAMES - 1) == []
+    assert feed(quality, 10) == ['full']
@@ -0,0 +1,62 @@
+# tests/test_light_state.py
+import numpy as np
+
+from config import LIGHT_RED_HSV_RANGES
+from light_state import GREEN_LIGHT, RED_LIGHT, LightStateEstimator
+
+ZONE = np.array([[10, 10], [30, 10], [30, 30], [10, 30]], np.int32)
+RED = (255, 0, 0)
+GREEN = (0, 255, 0)
+
+
+def frame(color, at=(20, 20)):
+    """A dark RGB frame with one lit pixel."""
+    image = np.zeros((48, 64, 3), dtype=np.uint8)
+    image[at[1], at[0]] = color
+    return image
+
+
+def estimator(**kwargs):
+    return LightStateEstimator(LIGHT_RED_HSV_RANGES, **kwargs)
+
+
+def run(light, frames):
+    return [light.update(f, ZONE) for f in frames]
+
+
+def test_without_debounce_the_state_follows_every_reading():
+    light = estimator()
+    assert run(light, [frame(RED), frame(GREEN), frame(RED)]) == [RED_LIGHT, GREEN_LIGHT, RED_LIGHT]
+
+
+def test_flicker_shorter_than_the_debounce_is_ignored():
+    light = estimator(debounce_frames=3)
+    assert run(light, [frame(RED), frame(RED), frame(GREEN), frame(RED), frame(GREEN)]) == [GREEN_LIGHT] * 5
+    assert light.state == GREEN_LIGHT
+
+
+def test_state_changes_on_the_nth_consecutive_reading():
+    light = estimator(debounce_frames=3)
+    assert run(light, [frame(RED)] * 3) == [GREEN_LIGHT, GREEN_LIGHT, RED_LIGHT]
+    assert run(light, [frame(GREEN)] * 3) == [RED_LIGHT, RED_LIGHT, GREEN_LIGHT]
+
+
+def test_in_between_counts_keep_the_current_state():
+    light = estimator(on_pixels=2, off_pixels=0)
+    assert light.update(frame(RED), ZONE) == GREEN_LIGHT
+    two = frame(RED)
+    two[21, 21] = RED
+    assert light.update(two, ZONE) == RED_LIGHT
+    assert light.update(frame(RED), ZONE) == RED_LIGHT
+    assert light.update(frame(GREEN), ZONE) == GREEN_LIGHT
+
+
+def test_red_outside_the_zone_is_not_counted():
+    light = estimator()
+    assert light.update(frame(RED, at=(40, 20)), ZONE) == GREEN_LIGHT
+    assert light.pixel_count == 0
+
+
+def test_a_zone_outside_the_frame_keeps_the_state():
+    light = estimator()
+    assert light.update(frame(RED), ZONE + 100) == GREEN_LIGHT
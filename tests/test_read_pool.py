@@ -0,0 +1,94 @@
+# tests/test_read_pool.py
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from database_utils import ReadConnectionPool, init_schema
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = tmp_path / 'traffic.db'
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    init_schema(conn)
+    conn.execute("INSERT INTO vehicle_tracking (ts, vehicle_count, is_red_light_runner) VALUES (1700000000, 1, 0)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def insert_event(conn):
+    conn.execute("INSERT INTO vehicle_tracking (ts, vehicle_count, is_red_light_runner) VALUES (1700000001, 1, 1)")
+
+
+def test_pooled_connections_cannot_write(db_path):
+    pool = ReadConnectionPool(db_path, size=2)
+    try:
+        assert asyncio.run(pool.fetchall('SELECT COUNT(*) FROM vehicle_tracking')) == [(1,)]
+        assert asyncio.run(pool.fetchall('PRAGMA query_only')) == [(1,)]
+        with pytest.raises(sqlite3.OperationalError):
+            asyncio.run(pool.run(insert_event))
+
+        # Even with query_only turned off, the connection was opened mode=ro
+        def insert_without_query_only(conn):
+            conn.execute('PRAGMA query_only = OFF')
+            try:
+                insert_event(conn)
+            finally:
+                conn.execute('PRAGMA query_only = ON')
+
+        with pytest.raises(sqlite3.OperationalError):
+            asyncio.run(pool.run(insert_without_query_only))
+    finally:
+        pool.close()
+    conn = sqlite3.connect(db_path)
+    assert conn.execute('SELECT COUNT(*) FROM vehicle_tracking').fetchone() == (1,)
+    conn.close()
+
+
+def test_semaphore_limits_concurrent_queries(db_path):
+    pool = ReadConnectionPool(db_path, size=4, max_concurrency=2)
+    lock = threading.Lock()
+    running = 0
+    peak = 0
+
+    def slow_query(conn):
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        return conn.execute('SELECT COUNT(*) FROM vehicle_tracking').fetchone()[0]
+
+    async def run_all():
+        return await asyncio.gather(*(pool.run(slow_query, label='slow') for _ in range(6)))
+
+    try:
+        assert asyncio.run(run_all()) == [1] * 6
+    finally:
+        pool.close()
+    assert peak == 2
+    stats = pool.get_stats()['slow']
+    assert stats['count'] == 6
+    # Four of the six had to wait for a permit
+    assert stats['total_wait_ms'] > 0
+
+
+def test_queries_run_off_the_event_loop_thread(db_path):
+    pool = ReadConnectionPool(db_path, size=1)
+
+    async def run():
+        return await pool.run(lambda conn: threading.current_thread().name), threading.current_thread().name
+
+    try:
+        query_thread, loop_thread = asyncio.run(run())
+    finally:
+        pool.close()
+    assert query_thread.startswith('db-read')
+    assert query_thread != loop_thread
@@ -0,0 +1,151 @@
+# tests/test_retention.py
+import gzip
+import json
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+from database_utils import ROLLUP_TABLES, bucket_start, init_schema, list_partitions, rebuild_rollups
+from retention import RetentionPolicy, archive_partition, partition_old_events, restore_archive
+
+JAN = datetime(2024, 1, 15, 10, 30)
+FEB = datetime(2024, 2, 3, 17, 5)
+LEGACY_FEB = datetime(2024, 2, 10, 8, 30)
+MARCH_1 = int(datetime(2024, 3, 1).timestamp())
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(tmp_path / 'traffic.db')
+    init_schema(conn)
+    yield conn
+    conn.close()
+
+
+def add_event(conn, moment, is_runner=False, legacy=False):
+    ts = None if legacy else int(moment.timestamp())
+    conn.execute(
+        'INSERT INTO vehicle_tracking (ts, timestamp, vehicle_count, is_red_light_runner) VALUES (?, ?, 1, ?)',
+        (ts, moment.strftime('%Y-%m-%d %H:%M:%S'), is_runner),
+    )
+
+
+def rows(conn, table):
+    return conn.execute(f'SELECT id, timestamp, vehicle_count, is_red_light_runner, ts FROM {table} ORDER BY id').fetchall()
+
+
+def count(conn, table):
+    return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+
+def day_rollups(conn):
+    return dict(conn.execute(f"SELECT bucket_start, total_vehicles FROM {ROLLUP_TABLES['day']}").fetchall())
+
+
+@pytest.fixture
+def events(conn):
+    add_event(conn, JAN)
+    add_event(conn, JAN + timedelta(days=5), is_runner=True)
+    add_event(conn, FEB)
+    add_event(conn, LEGACY_FEB, legacy=True)
+    add_event(conn, datetime.now())
+    conn.commit()
+    return conn
+
+
+def test_old_events_move_into_monthly_partitions(events):
+    conn = events
+    assert partition_old_events(conn, MARCH_1, chunk_size=1) == 4
+    assert list_partitions(conn) == ['vehicle_tracking_2024_01', 'vehicle_tracking_2024_02']
+    assert count(conn, 'vehicle_tracking_2024_01') == 2
+    assert count(conn, 'vehicle_tracking_2024_02') == 2
+    assert count(conn, 'vehicle_tracking') == 1
+    # The legacy row was dated from its text and got its ts filled in
+    assert conn.execute(
+        'SELECT ts FROM vehicle_tracking_2024_02 WHERE timestamp = ?', (LEGACY_FEB.strftime('%Y-%m-%d %H:%M:%S'),)
+    ).fetchone() == (int(LEGACY_FEB.timestamp()),)
+    # Nothing left to move
+    assert partition_old_events(conn, MARCH_1) == 0
+
+
+def test_archive_and_restore_round_trip(events, tmp_path):
+    conn = events
+    partition_old_events(conn, MARCH_1)
+    before = rows(conn, 'vehicle_tracking_2024_01')
+
+    path = archive_partition(conn, 'vehicle_tracking_2024_01', tmp_path / 'archive')
+    assert path == tmp_path / 'archive' / 'vehicle_tracking_2024_01.ndjson.gz'
+    assert list_partitions(conn) == ['vehicle_tracking_2024_02']
+    assert not list((tmp_path / 'archive').glob('*.tmp'))
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        records = [json.loads(line) for line in archive]
+    assert [record['id'] for record in records] == [row[0] for row in before]
+
+    assert restore_archive(conn, path) == 'vehicle_tracking_2024_01'
+    assert rows(conn, 'vehicle_tracking_2024_01') == before
+    assert list_partitions(conn) == ['vehicle_tracking_2024_01', 'vehicle_tracking_2024_02']
+    # Restoring twice doesn't duplicate rows
+    restore_archive(conn, path)
+    assert rows(conn, 'vehicle_tracking_2024_01') == before
+
+
+def test_restore_rejects_other_files(conn, tmp_path):
+    path = tmp_path / 'violation_evidence.ndjson.gz'
+    with gzip.open(path, 'wt') as archive:
+        archive.write('{}\n')
+    with pytest.raises(ValueError):
+        restore_archive(conn, path)
+
+
+def test_rebuilding_rollups_keeps_archived_months(events, tmp_path):
+    conn = events
+    rebuild_rollups(conn)
+    conn.commit()
+    before = day_rollups(conn)
+    jan_day = bucket_start(JAN, 'day')
+    feb_day = bucket_start(FEB, 'day')
+    assert before[jan_day] == 1
+    assert before[feb_day] == 1
+
+    partition_old_events(conn, MARCH_1)
+    archive_partition(conn, 'vehicle_tracking_2024_01', tmp_path / 'archive')
+    rebuild_rollups(conn)
+    conn.commit()
+    assert day_rollups(conn) == before
+
+    # Months that still have raw events are recomputed from them
+    with conn:
+        conn.execute('DELETE FROM vehicle_tracking_2024_02 WHERE ts = ?', (int(FEB.timestamp()),))
+    rebuild_rollups(conn)
+    conn.commit()
+    after = day_rollups(conn)
+    assert feb_day not in after
+    assert after[jan_day] == 1
+    assert sum(after.values()) == sum(before.values()) - 1
+
+
+def test_policy_partitions_archives_and_restores(conn, tmp_path):
+    now = datetime.now()
+    add_event(conn, now - timedelta(days=400))
+    add_event(conn, now - timedelta(days=60))
+    add_event(conn, now - timedelta(days=60, hours=1), is_runner=True)
+    add_event(conn, now)
+    conn.commit()
+
+    policy = RetentionPolicy(raw_days=30, partition_months=12, archive_dir=tmp_path / 'archive')
+    summary = policy.run(conn)
+    assert summary['moved'] == 3
+    assert summary['partitions_archived'] == 1
+    assert count(conn, 'vehicle_tracking') == 1
+    assert sum(count(conn, table) for table in list_partitions(conn)) == 2
+
+    archives = list((tmp_path / 'archive').glob('*.ndjson.gz'))
+    assert len(archives) == 1
+    table = restore_archive(conn, archives[0])
+    assert count(conn, table) == 1
+    # A second pass has nothing to move, and archives the restored month again
+    summary = policy.run(conn)
+    assert summary['moved'] == 0
+    assert summary['partitions_archived'] == 1
+    assert table not in list_partitions(conn)
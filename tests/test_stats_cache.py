@@ -0,0 +1,98 @@
+# tests/test_stats_cache.py
+import sqlite3
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from database_utils import ROLLUP_TABLES, IngestWatermark, ReadConnectionPool, init_schema
+
+DAY = {'start_date': '2024-12-01', 'end_date': '2024-12-01', 'granularity': 'hour'}
+
+
+def test_lru_evicts_the_least_recently_used():
+    cache = main.StatsCache(max_entries=2)
+    cache.put('a', 1, 'A')
+    cache.put('b', 1, 'B')
+    assert cache.get('a', 1) == 'A'
+    cache.put('c', 1, 'C')
+    assert cache.get('b', 1) is None
+    assert cache.get('a', 1) == 'A'
+    assert cache.get('c', 1) == 'C'
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_entries_are_only_served_at_their_watermark():
+    cache = main.StatsCache()
+    cache.put('a', 1, 'old')
+    assert cache.get('a', 2) is None
+    cache.put('a', 2, 'new')
+    assert cache.get('a', 2) == 'new'
+    assert cache.get('a', 1) is None
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """The app against a tmp database, without the lifespan's frame consumer."""
+    db_path = tmp_path / 'traffic.db'
+    conn = sqlite3.connect(db_path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    init_schema(conn)
+    conn.close()
+    pool = ReadConnectionPool(db_path)
+    watermark = IngestWatermark(db_path)
+    monkeypatch.setattr(main, 'read_pool', pool)
+    monkeypatch.setattr(main, 'ingest_watermark', watermark)
+    monkeypatch.setattr(main, 'stats_cache', main.StatsCache(4))
+    yield TestClient(main.app), db_path, watermark
+    pool.close()
+
+
+def add_hour(db_path, moment, vehicles, runners=0):
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.execute(
+            f"INSERT INTO {ROLLUP_TABLES['hour']} (bucket_start, total_vehicles, red_light_runners) VALUES (?, ?, ?)",
+            (int(moment.timestamp()), vehicles, runners),
+        )
+    conn.close()
+
+
+def test_etag_revalidation_answers_304(api):
+    client, db_path, watermark = api
+    add_hour(db_path, datetime(2024, 12, 1, 9), 7, 1)
+    watermark.bump()
+
+    response = client.get('/stats', params=DAY)
+    assert response.status_code == 200
+    assert response.json()['summary'] == {'total_vehicles': 7, 'total_red_light_runners': 1}
+    etag = response.headers['etag']
+
+    response = client.get('/stats', params=DAY, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['etag'] == etag
+    assert response.content == b''
+    # Another range has its own tag
+    other = dict(DAY, granularity='day')
+    assert client.get('/stats', params=other, headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_a_moved_watermark_invalidates_the_etag_and_the_cache(api):
+    client, db_path, watermark = api
+    add_hour(db_path, datetime(2024, 12, 1, 9), 7)
+    watermark.bump()
+    first = client.get('/stats', params=DAY)
+    assert client.get('/stats', params=DAY).json() == first.json()
+    assert main.stats_cache.hits == 1
+
+    # Without a bump the cached result is served, even though the data changed
+    add_hour(db_path, datetime(2024, 12, 1, 10), 5)
+    assert client.get('/stats', params=DAY).json()['summary']['total_vehicles'] == 7
+
+    watermark.bump()
+    response = client.get('/stats', params=DAY, headers={'If-None-Match': first.headers['etag']})
+    assert response.status_code == 200
+    assert response.headers['etag'] != first.headers['etag']
+    assert response.json()['summary']['total_vehicles'] == 12
+    assert len(response.json()['hourly_stats']) == 2
@@ -0,0 +1,30 @@
+# tests/test_stream_overlay.py
+from types import SimpleNamespace
+
+import pytest
+
+# detection.py needs the GStreamer bindings and the Hailo runtime
+pytest.importorskip('gi')
+pytest.importorskip('hailo')
+
+import detection
+from frame_bus import RENDITIONS
+from hailo_rpi_common import JPEG_STREAM_PIPELINE
+
+
+def overlays_drawn(**state):
+    return detection.user_app_callback_class.overlays_drawn.fget(SimpleNamespace(**state))
+
+
+@pytest.mark.parametrize('overlay', [False, True])
+def test_native_mode_reports_what_the_encoded_branch_draws(overlay):
+    assert ('hailooverlay' in JPEG_STREAM_PIPELINE(RENDITIONS, overlay=overlay)) == overlay
+    assert overlays_drawn(stream_mode='native', stream_overlay=overlay) == overlay
+
+
+@pytest.mark.parametrize('clean', [False, True])
+def test_python_mode_follows_clean_frames(monkeypatch, clean):
+    monkeypatch.setattr(detection, 'STREAM_CLEAN_FRAMES', clean)
+    # --stream-overlay only affects the native branch
+    for overlay in (False, True):
+        assert overlays_drawn(stream_mode='python', stream_overlay=overlay) == (not clean)
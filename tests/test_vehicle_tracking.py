@@ -0,0 +1,158 @@
+# tests/test_vehicle_tracking.py
+import itertools
+
+import numpy as np
+import pytest
+
+import vehicle_tracking
+from benchmark_tracker import simulate
+from vehicle_tracking import VehicleTracker, assign_components, linear_assignment
+
+SHAPES = [(1, 1), (3, 3), (5, 5), (2, 5), (5, 2), (4, 6), (6, 4)]
+
+
+@pytest.fixture(params=['scipy', 'numpy'])
+def solver(request, monkeypatch):
+    if request.param == 'numpy':
+        monkeypatch.setattr(vehicle_tracking, 'linear_sum_assignment', None)
+    elif vehicle_tracking.linear_sum_assignment is None:
+        pytest.skip('scipy is not installed')
+    return request.param
+
+
+def brute_force(cost):
+    """Lowest total over every way of matching the smaller side completely."""
+    n, m = cost.shape
+    if n <= m:
+        return min(sum(cost[i, j] for i, j in enumerate(p)) for p in itertools.permutations(range(m), n))
+    return brute_force(cost.T)
+
+
+def brute_force_pairs(costs, shape):
+    """Most feasible matches, then the lowest cost, over every assignment."""
+    best = (0, 0.0)
+    rows, columns = shape
+    for p in itertools.permutations(list(range(columns)) + [None] * rows, rows):
+        pairs = [(i, j) for i, j in enumerate(p) if j is not None and (i, j) in costs]
+        best = max(best, (len(pairs), -sum(costs[pair] for pair in pairs)))
+    return best[0], -best[1]
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+def test_linear_assignment_matches_brute_force(solver, shape):
+    rng = np.random.default_rng(sum(shape))
+    for _ in range(20):
+        cost = rng.uniform(0, 100, size=shape)
+        rows, columns = linear_assignment(cost)
+        assert len(rows) == min(shape)
+        assert len(set(rows.tolist())) == len(set(columns.tolist())) == min(shape)
+        assert cost[rows, columns].sum() == pytest.approx(brute_force(cost))
+
+
+def test_linear_assignment_with_ties_and_empty_input(solver):
+    rows, columns = linear_assignment(np.full((3, 4), 7.0))
+    assert len(rows) == 3 and len(set(columns.tolist())) == 3
+    rows, columns = linear_assignment(np.zeros((0, 3)))
+    assert rows.size == columns.size == 0
+
+
+@pytest.mark.parametrize('shape', SHAPES)
+def test_assign_components_matches_brute_force(solver, shape):
+    rng = np.random.default_rng(len(SHAPES) + sum(shape))
+    for density in (0.2, 0.5, 0.9):
+        cost = rng.uniform(0, 50, size=shape)
+        feasible = rng.random(shape) < density
+        costs = {(i, j): cost[i, j] for i, j in zip(*np.nonzero(feasible))}
+        rows, columns = assign_components(costs, 50.0)
+        pairs = list(zip(rows, columns))
+        assert all(pair in costs for pair in pairs)
+        assert len(set(rows)) == len(set(columns)) == len(pairs)
+        count, total = brute_force_pairs(costs, shape)
+        assert len(pairs) == count
+        assert sum(costs[pair] for pair in pairs) == pytest.approx(total)
+
+
+def test_assign_components_with_nothing_feasible():
+    assert assign_components({}, 50.0) == ([], [])
+
+
+def test_assign_components_prefers_more_matches_over_lower_cost():
+    # Matching row 0 to its cheap column would leave row 1 without one
+    costs = {(0, 0): 1.0, (0, 1): 40.0, (1, 0): 40.0}
+    assert sorted(zip(*assign_components(costs, 50.0))) == [(0, 1), (1, 0)]
+
+
+def box(x, y, size=20):
+    return [x, y, x + size, y + size]
+
+
+def ids(tracker, frame):
+    """Track ids seen on ``frame``, keyed by their box."""
+    return {v.bbox: v.id for v in tracker.get_active_vehicles().values() if v.last_seen == frame}
+
+
+@pytest.mark.parametrize('metric', ['distance', 'iou'])
+def test_tracks_keep_their_ids_as_vehicles_move(metric):
+    tracker = VehicleTracker(metric=metric)
+    tracker.update_from_arrays(0, [box(100, 100), box(300, 100), box(500, 400)])
+    first = ids(tracker, 0)
+    # Listed in a different order, each box a few pixels further on
+    tracker.update_from_arrays(1, [box(503, 402), box(104, 101), box(302, 97)])
+    second = ids(tracker, 1)
+    assert sorted(second.values()) == sorted(first.values())
+    assert second[tuple(box(104, 101))] == first[tuple(box(100, 100))]
+    assert second[tuple(box(503, 402))] == first[tuple(box(500, 400))]
+    assert tracker.next_id == 3
+
+
+def test_crossing_vehicles_get_the_cheapest_overall_match():
+    tracker = VehicleTracker()
+    tracker.update_from_arrays(0, [box(100, 100), box(160, 100)])
+    before = ids(tracker, 0)
+    # Greedy would give the left track the box 40 px right of it, leaving the
+    # right track nothing in range and starting a new track
+    tracker.update_from_arrays(1, [box(140, 100), box(55, 100)])
+    after = ids(tracker, 1)
+    assert after[tuple(box(55, 100))] == before[tuple(box(100, 100))]
+    assert after[tuple(box(140, 100))] == before[tuple(box(160, 100))]
+    assert tracker.next_id == 2
+
+
+def test_pairs_beyond_the_distance_gate_are_never_matched():
+    tracker = VehicleTracker(distance_threshold=50)
+    tracker.update_from_arrays(0, [box(100, 100)])
+    tracker.update_from_arrays(1, [box(150, 100)])  # exactly 50 px away
+    assert sorted(v.id for v in tracker.get_active_vehicles().values()) == [0, 1]
+    assert tracker.get_active_vehicles()[0].last_seen == 0
+
+
+def test_pairs_under_the_iou_gate_are_never_matched():
+    tracker = VehicleTracker(metric='iou', iou_threshold=0.5)
+    tracker.update_from_arrays(0, [box(100, 100)])
+    tracker.update_from_arrays(1, [box(110, 100)])  # IoU 1/3
+    assert tracker.next_id == 2
+    tracker.update_from_arrays(2, [box(112, 101)])
+    assert tracker.next_id == 2
+    assert tracker.get_active_vehicles()[1].last_seen == 2
+
+
+def test_stale_tracks_are_dropped():
+    tracker = VehicleTracker(max_frames_to_track=5)
+    tracker.update_from_arrays(0, [box(100, 100)])
+    tracker.update_from_arrays(6, [box(100, 100)])
+    assert list(tracker.get_active_vehicles()) == [1]
+
+
+@pytest.mark.parametrize('metric', ['distance', 'iou'])
+def test_small_and_large_problem_paths_agree(monkeypatch, metric):
+    frames = list(simulate(6, 200, seed=3))
+    small = VehicleTracker(metric=metric)
+    for frame, boxes in enumerate(frames):
+        small.update_from_arrays(frame, boxes)
+    monkeypatch.setattr(vehicle_tracking, 'SMALL_PROBLEM_PAIRS', 0)
+    large = VehicleTracker(metric=metric)
+    for frame, boxes in enumerate(frames):
+        large.update_from_arrays(frame, boxes)
+    assert {i: v.bbox for i, v in small.get_active_vehicles().items()} == \
+        {i: v.bbox for i, v in large.get_active_vehicles().items()}
+    assert small.next_id == large.next_id
@@ -0,0 +1,61 @@
+# tests/test_zone_labels.py
+import numpy as np
+import pytest
+
+from config import DEFAULT_ZONES
+from zone_manager import ZoneManager
+
+WIDTH, HEIGHT = 640, 640
+
+
+@pytest.fixture
+def zones():
+    return ZoneManager(DEFAULT_ZONES, (WIDTH, HEIGHT))
+
+
+def polygon_test(manager, name, points):
+    """The per-point check the label map replaced."""
+    zone = manager.get_zone(name)
+    return np.array([ZoneManager.is_in_zone(zone, (int(x), int(y))) for x, y in points])
+
+
+def around(zone, margin=3):
+    """Every pixel in the zone's bounding box plus a margin outside it."""
+    xs, ys = zone[:, 0, 0], zone[:, 0, 1]
+    grid_y, grid_x = np.mgrid[ys.min() - margin:ys.max() + margin + 1, xs.min() - margin:xs.max() + margin + 1]
+    return np.stack([grid_x.ravel(), grid_y.ravel()], axis=1)
+
+
+@pytest.mark.parametrize('name', list(DEFAULT_ZONES))
+def test_label_map_matches_the_polygon_test(zones, name):
+    points = around(zones.get_zone(name))
+    expected = polygon_test(zones, name, points)
+    actual = (zones.labels_at(points) & zones.zone_mask(name)) != 0
+    # The box covers points inside, outside and along the slanted edges
+    assert expected.any() and not expected.all()
+    assert np.array_equal(actual, expected)
+
+
+@pytest.mark.parametrize('name', list(DEFAULT_ZONES))
+def test_vertices_count_as_inside(zones, name):
+    vertices = zones.get_zone(name).reshape(-1, 2)
+    assert polygon_test(zones, name, vertices).all()
+    assert (zones.labels_at(vertices) & zones.zone_mask(name)).all()
+
+
+def test_overlapping_zones_set_both_bits(zones):
+    inside = [[400, 500]]
+    assert zones.labels_at(inside)[0] == zones.zone_mask('green_zone', 'green_zone_2')
+
+
+def test_points_outside_the_frame_have_no_zone(zones):
+    assert zones.labels_at([[-1, 400], [WIDTH, 400], [100, HEIGHT]]).tolist() == [0, 0, 0]
+
+
+def test_label_map_follows_a_frame_size_change(zones):
+    corner = [[WIDTH + 10, HEIGHT + 10]]
+    zones.get_zone('red_zone')[:] = [[[WIDTH, HEIGHT]], [[WIDTH + 20, HEIGHT]], [[WIDTH + 20, HEIGHT + 20]], [[WIDTH, HEIGHT + 20]]]
+    zones._label_map = None
+    assert zones.labels_at(corner)[0] == 0
+    zones.set_frame_size(WIDTH + 40, HEIGHT + 40)
+    assert zones.labels_at(corner)[0] == zones.zone_mask('red_zone')
@@ -1,5 +1,61 @@
 import { FrameMetaData } from "./VideoFeed.interface";
 
+// Binary frame format offered by the API, see BINARY_SUBPROTOCOL in main.py
+export const BINARY_SUBPROTOCOL = "traffic-frames.v2";
+const BINARY_FRAME_VERSION = 2;
+const BINARY_HEADER_SIZE = 6;
+// Set on heartbeats: the scene hasn't changed and there is no JPEG
+const FLAG_METADATA_ONLY = 0x01;
+
+const textDecoder = new TextDecoder();
+
+interface DecodedFrame {
+    metadata: FrameMetaData;
+    frame: Blob | null;
+}
+
+// [version u8][flags u8][metadata length u32 BE][metadata JSON][JPEG bytes]
+const decodeBinaryFrame = (buffer: ArrayBuffer): DecodedFrame => {
+    const view = new DataView(buffer);
+    const version = view.getUint8(0);
+    if (version !== BINARY_FRAME_VERSION) {
+        throw new Error(`Unsupported frame version ${version}`);
+    }
+    const flags = view.getUint8(1);
+    const metadataLength = view.getUint32(2);
+    const metadataEnd = BINARY_HEADER_SIZE + metadataLength;
+    const metadata = JSON.parse(
+        textDecoder.decode(
+            new Uint8Array(buffer, BINARY_HEADER_SIZE, metadataLength)
+        )
+    );
+    if (flags & FLAG_METADATA_ONLY) {
+        return { metadata, frame: null };
+    }
+    const frame = new Blob([new Uint8Array(buffer, metadataEnd)], {
+        type: "image/jpeg",
+    });
+    return { metadata, frame };
+};
+
+const decodeJsonFrame = (text: string): DecodedFrame => {
+    const data = JSON.parse(text);
+    if (data.frame === null) {
+        return { metadata: data.metadata, frame: null };
+    }
+
+    const frameData = atob(data.frame);
+    const frameArray = new Uint8Array(frameData.length);
+    for (let i = 0; i < frameData.length; i++) {
+        frameArray[i] = frameData.charCodeAt(i);
+    }
+
+    return {
+        metadata: data.metadata,
+        frame: new Blob([frameArray], { type: "image/jpeg" }),
+    };
+};
+
 export const handleWebSocketMessage = (
     event: MessageEvent,
     previousObjectUrl: string | null,
@@ -7,17 +63,15 @@ export const handleWebSocketMessage = (
     setMetadata: (metadata: FrameMetaData) => void
 ) => {
     try {
-        const data = JSON.parse(event.data);
-        setMetadata(data.metadata);
-
-        const frameData = atob(data.frame);
-        const frameArray = new Uint8Array(frameData.length);
-        for (let i = 0; i < frameData.length; i++) {
-            frameArray[i] = frameData.charCodeAt(i);
-        }
+        const { metadata, frame } =
+            event.data instanceof ArrayBuffer
+                ? decodeBinaryFrame(event.data)
+                : decodeJsonFrame(event.data);
+        setMetadata(metadata);
+        // Heartbeat, keep showing the current image
+        if (!frame) return previousObjectUrl;
 
-        const imageBlob = new Blob([frameArray], { type: "image/jpeg" });
-        const objectUrl = URL.createObjectURL(imageBlob);
+        const objectUrl = URL.createObjectURL(frame);
 
         if (previousObjectUrl) {
             URL.revokeObjectURL(previousObjectUrl);
@@ -4,4 +4,17 @@ export interface FrameMetaData {
     total_vehicles: number;
     red_light_runners: number;
     run_rate: number;
+    captured_at: number;
+    // Overlay data, drawn client-side when overlays_drawn is false
+    overlays_drawn?: boolean;
+    frame_size?: [number, number];
+    detection_count?: number;
+    vehicles?: TrackedVehicle[];
+    zones?: Record<string, [number, number][]>;
+}
+
+export interface TrackedVehicle {
+    id: number;
+    bbox: [number, number, number, number];
+    runner: boolean;
 }
\ No newline at end of file
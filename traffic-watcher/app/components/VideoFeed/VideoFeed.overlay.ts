@@ -0,0 +1,72 @@
+import { FrameMetaData } from "./VideoFeed.interface";
+
+const ZONE_COLORS: Record<string, string> = {
+    red_zone: "#ff3b30",
+    green_zone: "#2cf000",
+    green_zone_2: "#2cf000",
+    traffic_zone: "#ffd60a",
+};
+const VEHICLE_COLOR = "#32b400";
+const RUNNER_COLOR = "#ff3b30";
+const TEXT_COLOR = "#37ffff";
+
+// Draws zones, tracked vehicles and stats from the frame metadata, matching
+// what the detector burns into the frame when clean frames are off
+export const drawOverlay = (
+    canvas: HTMLCanvasElement,
+    metadata: FrameMetaData | null
+) => {
+    const context = canvas.getContext("2d");
+    if (!context) return;
+    if (!metadata || metadata.overlays_drawn || !metadata.frame_size) {
+        context.clearRect(0, 0, canvas.width, canvas.height);
+        return;
+    }
+
+    // Canvas pixels match the frame, CSS stretches it over the image
+    const [width, height] = metadata.frame_size;
+    if (canvas.width !== width || canvas.height !== height) {
+        canvas.width = width;
+        canvas.height = height;
+    }
+    context.clearRect(0, 0, width, height);
+    context.lineWidth = 1;
+    context.font = "12px sans-serif";
+
+    for (const [name, polygon] of Object.entries(metadata.zones ?? {})) {
+        if (polygon.length === 0) continue;
+        context.strokeStyle = ZONE_COLORS[name] ?? TEXT_COLOR;
+        context.beginPath();
+        context.moveTo(polygon[0][0], polygon[0][1]);
+        for (const [x, y] of polygon.slice(1)) {
+            context.lineTo(x, y);
+        }
+        context.closePath();
+        context.stroke();
+    }
+
+    for (const vehicle of metadata.vehicles ?? []) {
+        const [x1, y1, x2, y2] = vehicle.bbox;
+        const color = vehicle.runner ? RUNNER_COLOR : VEHICLE_COLOR;
+        context.strokeStyle = color;
+        context.fillStyle = color;
+        context.strokeRect(x1, y1, x2 - x1, y2 - y1);
+        context.fillText(`ID: ${vehicle.id}`, x1, y1 - 20);
+        if (vehicle.runner) {
+            context.fillText("Red light runner", x1, y1 - 8);
+        }
+    }
+
+    context.fillStyle = TEXT_COLOR;
+    const stats = [
+        `Light Status: ${metadata.light_status}`,
+        `Vehicles seen: ${metadata.total_vehicles}`,
+        `Red light runner count: ${metadata.red_light_runners}`,
+        `Run rate: %${metadata.run_rate}`,
+    ];
+    stats.forEach((line, index) => context.fillText(line, 0, 100 + index * 20));
+    if (metadata.detection_count !== undefined) {
+        context.font = "24px sans-serif";
+        context.fillText(`Detections: ${metadata.detection_count}`, 10, 30);
+    }
+};
@@ -1,13 +1,19 @@
 "use client";
 
-import React, { useEffect, useState } from "react";
+import React, { useEffect, useRef, useState } from "react";
 import "./VideoFeed.global.scss";
 import { Emphasis } from "../Text/Text";
 import Spinner from "@/components/ui/spinner";
 import { useVideoFeed } from "./hooks";
+import { drawOverlay } from "./VideoFeed.overlay";
 
 const VideoFeed: React.FC = () => {
     const { imageSrc, metadata, isConnected } = useVideoFeed();
+    const overlayRef = useRef<HTMLCanvasElement>(null);
+
+    useEffect(() => {
+        if (overlayRef.current) drawOverlay(overlayRef.current, metadata);
+    }, [metadata]);
 
     return (
         <div className="relative w-full h-full">
@@ -20,11 +26,17 @@ const VideoFeed: React.FC = () => {
                 </div>
             )}
             {imageSrc && (
-                <img
-                    src={imageSrc}
-                    alt="Video Feed"
-                    className="w-full h-auto max-w-[640px]"
-                />
+                <div className="relative w-full max-w-[640px]">
+                    <img
+                        src={imageSrc}
+                        alt="Video Feed"
+                        className="w-full h-auto"
+                    />
+                    <canvas
+                        ref={overlayRef}
+                        className="absolute inset-0 w-full h-full pointer-events-none"
+                    />
+                </div>
             )}
 
             {!imageSrc && isConnected && (
@@ -1,6 +1,9 @@
 import { useState, useEffect } from "react";
 import { FrameMetaData } from "./VideoFeed.interface";
-import { handleWebSocketMessage } from "./VideoFeed.helpers";
+import {
+    BINARY_SUBPROTOCOL,
+    handleWebSocketMessage,
+} from "./VideoFeed.helpers";
 
 interface VideoFeedState {
     imageSrc: string | null;
@@ -18,22 +21,31 @@ export const useVideoFeed = (): VideoFeedState => {
         let isComponentMounted = true;
         let previousObjectUrl: string | null = null;
         let reconnectTimeout: NodeJS.Timeout | null = null;
+        // The browser fails the handshake if the server doesn't echo the
+        // subprotocol back, as older servers don't, so a connection that never
+        // opens is retried without it and gets JSON instead
+        let requestBinary = true;
 
         const connectWebSocket = () => {
             if (typeof window === "undefined") return;
 
+            const triedBinary = requestBinary;
+            let opened = false;
             socket = new WebSocket(
-                `wss://${process.env.NEXT_PUBLIC_BASE_DOMAIN_URL}/py/ws`
+                `wss://${process.env.NEXT_PUBLIC_BASE_DOMAIN_URL}/py/ws`,
+                triedBinary ? [BINARY_SUBPROTOCOL] : []
             );
+            socket.binaryType = "arraybuffer";
 
             socket.onopen = () => {
                 console.log("Connected to video feed");
+                opened = true;
                 setIsConnected(true);
             };
 
             socket.onmessage = (event: MessageEvent) => {
                 if (!isComponentMounted) return;
-                handleWebSocketMessage(
+                previousObjectUrl = handleWebSocketMessage(
                     event,
                     previousObjectUrl,
                     setImageSrc,
@@ -44,8 +56,13 @@ export const useVideoFeed = (): VideoFeedState => {
             socket.onclose = (event) => {
                 console.log("Connection closed with code:", event.code);
                 setIsConnected(false);
+                // After a session, binary is asked for again; after a failed
+                // handshake the other variant is tried, straight away if that
+                // means dropping the subprotocol
+                requestBinary = opened || !triedBinary;
                 if (isComponentMounted) {
-                    reconnectTimeout = setTimeout(connectWebSocket, 2000);
+                    const delay = !opened && triedBinary ? 0 : 2000;
+                    reconnectTimeout = setTimeout(connectWebSocket, delay);
                 }
             };
 